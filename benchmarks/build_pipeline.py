@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+"""@brief Time the pipenv2deb build pipeline on synthetic projects of several sizes.
+          Each project has a number of top level python files, package folders and a .venv
+          folder of a configurable size. The time taken by each build phase is read from the
+          build report (--report_jsonl) and may be saved as a baseline and compared with a
+          previous baseline. pipenv is replaced by a stub (and dpkg-deb by a fake if it is not
+          installed or --fake_dpkg is used) so that the benchmark runs offline."""
+
+import os
+import sys
+import json
+import stat
+import random
+import shutil
+import tempfile
+import statistics
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipenv2deb.__main__ import DebBuilder, UIO, getOptionParser
+
+# name: (python files, package folders, files per package folder, bytes per file, .venv MB)
+SCALES = {"small": (2, 2, 10, 2048, 5),
+          "medium": (5, 10, 50, 4096, 50),
+          "large": (10, 40, 100, 8192, 250)}
+TOTAL = "total"
+VENV_FILE_SIZE = 64 * 1024
+
+PIPENV_STUB = """#!/bin/sh
+# pipenv stub used by the pipenv2deb benchmark.
+exit 0
+"""
+
+FAKE_DPKG_DEB = """#!/bin/sh
+# A fake dpkg-deb used by the pipenv2deb benchmark. The build folder is archived with tar
+# and gzip which does a similar amount of work to dpkg-deb.
+if [ "$1" = "--version" ]; then
+    echo "Debian 'dpkg-deb' package archive backend version 1.21.22 (amd64)."
+    exit 0
+fi
+for arg in "$@"; do
+    buildFolder="$debFile"
+    debFile="$arg"
+done
+tar -czf "$debFile" -C "$buildFolder" .
+"""
+
+
+class QuietUIO(UIO):
+    """@brief Discards the build output so that it does not affect the timing."""
+
+    def info(self, line):
+        pass
+
+
+class BenchmarkDebBuilder(DebBuilder):
+    """@brief A DebBuilder that can be run by a non root user. Nothing is installed."""
+
+    def _ensureRootUser(self):
+        pass
+
+
+def writeFile(filename, size, content):
+    """@brief Write a file of a given size.
+       @param filename The file to write.
+       @param size The file size in bytes.
+       @param content The bytes that are repeated to fill the file."""
+    folder = os.path.dirname(filename)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    with open(filename, 'wb') as fd:
+        written = 0
+        while written < size:
+            block = content[:size - written]
+            fd.write(block)
+            written += len(block)
+
+
+def getSource(rand):
+    """@param rand A random.Random instance.
+       @return A line of python source (bytes)."""
+    return "value_{} = {}\n".format(rand.randint(0, 1000), rand.random()).encode()
+
+
+def createProject(projectFolder, scale, rootFS):
+    """@brief Create a synthetic pipenv2deb project.
+       @param projectFolder The folder to create the project in.
+       @param scale A tuple as held in SCALES.
+       @param rootFS If True add root-fs and init.d folders."""
+    pythonFiles, packageFolders, filesPerFolder, fileSize, venvMB = scale
+    rand = random.Random(0)
+    # Native libraries are represented by random (incompressible) bytes.
+    binaryContent = bytes(rand.getrandbits(8) for _ in range(VENV_FILE_SIZE))
+
+    with open(os.path.join(projectFolder, DebBuilder.PIP_FILE), 'w') as fd:
+        fd.write("[packages]\n\n[requires]\npython_version = \"3\"\n")
+    with open(os.path.join(projectFolder, DebBuilder.PIP_LOCK_FILE), 'w') as fd:
+        fd.write('{"_meta": {}, "default": {}, "develop": {}}\n')
+
+    os.makedirs(os.path.join(projectFolder, DebBuilder.DEBIAN_FOLDER))
+    with open(os.path.join(projectFolder, DebBuilder.DEBIAN_CONTROL_FILE), 'w') as fd:
+        fd.write("Package: python-benchmark\nVersion: 1.0\nSection: misc\nPriority: optional\n"
+                 "Architecture: amd64\nMaintainer: Benchmark <benchmark@localhost>\n"
+                 "Description: A synthetic pipenv2deb benchmark project.\n")
+
+    for index in range(pythonFiles):
+        with open(os.path.join(projectFolder, "command_{}.py".format(index)), 'w') as fd:
+            fd.write("#!/usr/bin/env python3\n\nif __name__ == '__main__':\n    print('command {}')\n".format(index))
+
+    for folderIndex in range(packageFolders):
+        for fileIndex in range(filesPerFolder):
+            filename = os.path.join(projectFolder, "package_{}".format(folderIndex), "module_{}.py".format(fileIndex))
+            writeFile(filename, fileSize, getSource(rand))
+
+    sitePackages = os.path.join(projectFolder, DebBuilder.VENV_FOLDER, "lib", "python3", "site-packages")
+    venvFiles = venvMB * 1024 * 1024 // VENV_FILE_SIZE
+    for index in range(venvFiles):
+        # Half the .venv files are python source and half are native libraries.
+        binary = index % 2 == 1
+        filename = os.path.join(sitePackages, "lib_{}".format(index // 20), "file_{}{}".format(index, ".so" if binary else ".py"))
+        writeFile(filename, VENV_FILE_SIZE, binaryContent if binary else getSource(rand))
+
+    if rootFS:
+        writeFile(os.path.join(projectFolder, DebBuilder.ROOT_FS_FOLDER, "etc", "benchmark", "config.txt"), fileSize, getSource(rand))
+        writeFile(os.path.join(projectFolder, DebBuilder.INITD_FOLDER, "benchmark"), 256, b"#!/bin/sh\nexit 0\n")
+
+
+def createStubs(binFolder, fakeDpkg):
+    """@brief Create the commands that replace those that pipenv2deb runs.
+       @param binFolder The folder to create the commands in. This is placed at the start of the PATH.
+       @param fakeDpkg If True create a fake dpkg-deb command."""
+    stubList = [("pipenv", PIPENV_STUB)]
+    if fakeDpkg:
+        stubList.append(("dpkg-deb", FAKE_DPKG_DEB))
+    for name, content in stubList:
+        stubFile = os.path.join(binFolder, name)
+        with open(stubFile, 'w') as fd:
+            fd.write(content)
+        os.chmod(stubFile, stat.S_IRWXU | stat.S_IRGRP | stat.S_IXGRP | stat.S_IROTH | stat.S_IXOTH)
+
+
+def runBuild(projectFolder, builderArgs):
+    """@brief Build the project.
+       @param projectFolder The project folder.
+       @param builderArgs The pipenv2deb command line arguments.
+       @return A dict of phase name: seconds. The TOTAL key holds the total build time."""
+    reportFile = os.path.join(projectFolder, "report.jsonl")
+    options, _ = getOptionParser().parse_args(builderArgs + ["--report_jsonl", reportFile])
+    cwd = os.getcwd()
+    os.chdir(projectFolder)
+    try:
+        BenchmarkDebBuilder(QuietUIO(), options).run()
+    finally:
+        os.chdir(cwd)
+
+    phaseTimes = {}
+    with open(reportFile) as fd:
+        lines = fd.readlines()
+    os.remove(reportFile)
+    for line in lines:
+        record = json.loads(line)
+        if record["event"] == "phase":
+            phaseTimes[record["name"]] = phaseTimes.get(record["name"], 0.0) + record["wall_time"]
+        elif record["event"] == "build":
+            phaseTimes[TOTAL] = record["wall_time"]
+    return phaseTimes
+
+
+def benchmarkScale(scaleName, builderArgs, runs, rootFS):
+    """@brief Time the build of a project several times.
+       @param scaleName The SCALES key.
+       @param builderArgs The pipenv2deb command line arguments.
+       @param runs The number of builds to time.
+       @param rootFS If True the project has root-fs and init.d folders.
+       @return A dict of phase name: median seconds."""
+    projectFolder = tempfile.mkdtemp(prefix="pipenv2deb_bench_{}_".format(scaleName))
+    try:
+        createProject(projectFolder, SCALES[scaleName], rootFS)
+        runList = []
+        # The first build is not timed as it loads the files into the page cache.
+        runBuild(projectFolder, builderArgs)
+        for _ in range(runs):
+            runList.append(runBuild(projectFolder, builderArgs))
+    finally:
+        shutil.rmtree(projectFolder)
+
+    medianTimes = {}
+    for phaseName in runList[0]:
+        medianTimes[phaseName] = statistics.median(phaseTimes.get(phaseName, 0.0) for phaseTimes in runList)
+    return medianTimes
+
+
+def showResults(results, baseline, threshold):
+    """@brief Show the results and compare them with a baseline.
+       @param results A dict of scale name: dict of phase name: seconds.
+       @param baseline A dict in the same format as results or None.
+       @param threshold The percentage increase over the baseline that is reported as a regression.
+       @return The number of regressions."""
+    regressions = 0
+    print("{:<8} {:<16} {:>10} {:>12} {:>8}".format("Scale", "Phase", "Seconds", "Baseline", "Change"))
+    for scaleName, phaseTimes in results.items():
+        for phaseName, seconds in phaseTimes.items():
+            line = "{:<8} {:<16} {:>10.3f}".format(scaleName, phaseName, seconds)
+            baseSeconds = None
+            if baseline:
+                baseSeconds = baseline.get(scaleName, {}).get(phaseName)
+            if baseSeconds:
+                change = (seconds - baseSeconds) * 100.0 / baseSeconds
+                line = "{} {:>12.3f} {:>+7.1f}%".format(line, baseSeconds, change)
+                # Only the total is checked as very short phases vary too much.
+                if phaseName == TOTAL and change > threshold:
+                    line = "{} REGRESSION".format(line)
+                    regressions += 1
+            print(line)
+    return regressions
+
+
+def main():
+    opts = OptionParser(usage="usage: %prog [options]\nTime the pipenv2deb build pipeline on synthetic projects.")
+    opts.add_option("--scales", help="A comma separated list of the project sizes to build ({}) (default=small,medium).".format(", ".join(SCALES.keys())), default="small,medium")
+    opts.add_option("--runs", help="The number of times each project is built (default=3).", type="int", default=3)
+    opts.add_option("--args", help="The pipenv2deb command line options to build with (default='--venv').", default="--venv")
+    opts.add_option("--root_fs", help="Add root-fs and init.d folders to the projects.", action="store_true", default=False)
+    opts.add_option("--fake_dpkg", help="Use a fake dpkg-deb command (this is always used if dpkg-deb is not installed).", action="store_true", default=False)
+    opts.add_option("--baseline", help="Compare the results with those in this baseline file.", default=None)
+    opts.add_option("--save_baseline", help="Save the results to this baseline file.", default=None)
+    opts.add_option("--threshold", help="The percentage increase in the total build time over the baseline that is reported as a regression (default=10).", type="float", default=10.0)
+    (options, args) = opts.parse_args()
+
+    for scaleName in options.scales.split(","):
+        if scaleName not in SCALES:
+            opts.error("{} is not a valid scale.".format(scaleName))
+
+    baseline = None
+    if options.baseline:
+        with open(options.baseline) as fd:
+            baseline = json.load(fd)
+
+    binFolder = tempfile.mkdtemp(prefix="pipenv2deb_bench_bin_")
+    path = os.environ.get("PATH", "")
+    try:
+        createStubs(binFolder, options.fake_dpkg or not shutil.which("dpkg-deb"))
+        os.environ["PATH"] = "{}{}{}".format(binFolder, os.pathsep, path)
+        results = {}
+        for scaleName in options.scales.split(","):
+            results[scaleName] = benchmarkScale(scaleName, options.args.split(), options.runs, options.root_fs)
+    finally:
+        os.environ["PATH"] = path
+        shutil.rmtree(binFolder)
+
+    regressions = showResults(results, baseline, options.threshold)
+
+    if options.save_baseline:
+        with open(options.save_baseline, 'w') as fd:
+            json.dump(results, fd, indent=2, sort_keys=True)
+        print("Saved {}".format(options.save_baseline))
+
+    if regressions > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""@brief Compare the start up time of the two styles of startup script that pipenv2deb creates.
+          The pipenv style runs 'pipenv run <python file>'. The fast style (--fast_launcher)
+          runs the python interpreter in the .venv folder directly."""
+
+import os
+import sys
+import stat
+import time
+import shutil
+import tempfile
+import statistics
+from optparse import OptionParser
+from subprocess import check_call, run, DEVNULL
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipenv2deb.__main__ import DebBuilder, getStartupScript
+
+PYTHON_FILE = "hello.py"
+
+
+def createProject(projectFolder):
+    """@brief Create a minimal installed pipenv2deb package folder containing a python file,
+              Pipfile and .venv folder.
+       @param projectFolder The folder to create the files in."""
+    pythonFile = os.path.join(projectFolder, PYTHON_FILE)
+    with open(pythonFile, 'w') as fd:
+        fd.write("#!/usr/bin/env python3\n")
+        fd.write("print('Hello World')\n")
+    os.chmod(pythonFile, DebBuilder.EXECUTABLE_MODE)
+
+    with open(os.path.join(projectFolder, DebBuilder.PIP_FILE), 'w') as fd:
+        fd.write("[packages]\n\n")
+        fd.write("[requires]\n")
+        fd.write('python_version = "{}.{}"\n'.format(sys.version_info.major, sys.version_info.minor))
+
+    check_call([sys.executable, "-m", "venv", os.path.join(projectFolder, DebBuilder.VENV_FOLDER)])
+
+
+def createLauncher(projectFolder, fastLauncher):
+    """@brief Create a startup script as pipenv2deb would.
+       @param projectFolder The folder holding the python file.
+       @param fastLauncher If True create a --fast_launcher startup script.
+       @return The startup script file."""
+    launcherFile = os.path.join(projectFolder, "launcher_fast" if fastLauncher else "launcher_pipenv")
+    with open(launcherFile, 'w') as fd:
+        fd.write(getStartupScript(projectFolder, PYTHON_FILE, fastLauncher))
+    os.chmod(launcherFile, stat.S_IRWXU | stat.S_IRGRP | stat.S_IXGRP | stat.S_IROTH | stat.S_IXOTH)
+    return launcherFile
+
+
+def timeLauncher(launcherFile, runs):
+    """@brief Time how long a startup script takes to run.
+       @param launcherFile The startup script.
+       @param runs The number of times to run it.
+       @return A list of the run times in milliseconds."""
+    # The first run is not timed as it loads the files into the page cache.
+    run([launcherFile], stdout=DEVNULL, check=True)
+    timeList = []
+    for _ in range(runs):
+        startTime = time.perf_counter()
+        run([launcherFile], stdout=DEVNULL, check=True)
+        timeList.append((time.perf_counter() - startTime) * 1000.0)
+    return timeList
+
+
+def main():
+    opts = OptionParser(usage="usage: %prog [options]\nCompare the start up time of pipenv2deb startup scripts.")
+    opts.add_option("--runs", help="The number of times each startup script is run (default=20).", type="int", default=20)
+    (options, args) = opts.parse_args()
+
+    projectFolder = tempfile.mkdtemp(prefix="pipenv2deb_launcher_")
+    try:
+        createProject(projectFolder)
+        launcherList = [("fast", createLauncher(projectFolder, True))]
+        if shutil.which("pipenv"):
+            launcherList.insert(0, ("pipenv", createLauncher(projectFolder, False)))
+        else:
+            print("pipenv is not installed. Only the fast startup script is timed.")
+
+        print("{:<8} {:>10} {:>10} {:>10}".format("Launcher", "Min ms", "Median ms", "Mean ms"))
+        for name, launcherFile in launcherList:
+            timeList = timeLauncher(launcherFile, options.runs)
+            print("{:<8} {:>10.1f} {:>10.1f} {:>10.1f}".format(name, min(timeList), statistics.median(timeList), statistics.mean(timeList)))
+
+    finally:
+        shutil.rmtree(projectFolder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+"""@brief Compare the time taken to import a package installed as files (with __pycache__ bytecode)
+          against the same package imported from the zip file created by the --zip_packages option."""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import statistics
+from optparse import OptionParser
+from subprocess import check_call, run, DEVNULL
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipenv2deb.__main__ import UIO
+from pipenv2deb.zip_bundler import ZipBundler
+
+PACKAGE_NAME = "bench_pkg"
+DROP_CACHES_FILE = "/proc/sys/vm/drop_caches"
+
+
+def createPackage(folder, subPackages, modules):
+    """@brief Create a package holding sub packages that each import all of their modules.
+       @param folder The folder to create the package in.
+       @param subPackages The number of sub packages.
+       @param modules The number of modules in each sub package.
+       @return The package folder."""
+    packageFolder = os.path.join(folder, PACKAGE_NAME)
+    importLines = []
+    for subIndex in range(subPackages):
+        subFolder = os.path.join(packageFolder, "sub{}".format(subIndex))
+        os.makedirs(subFolder)
+        with open(os.path.join(subFolder, "__init__.py"), 'w') as fd:
+            for moduleIndex in range(modules):
+                fd.write("from . import mod{}\n".format(moduleIndex))
+        for moduleIndex in range(modules):
+            with open(os.path.join(subFolder, "mod{}.py".format(moduleIndex)), 'w') as fd:
+                fd.write("VALUE = {}\n\n\ndef function(x):\n    return x * VALUE\n".format(moduleIndex))
+        importLines.append("from . import sub{}\n".format(subIndex))
+    with open(os.path.join(packageFolder, "__init__.py"), 'w') as fd:
+        fd.write("".join(importLines))
+    return packageFolder
+
+
+def dropCaches():
+    """@brief Remove the files from the page, dentry and inode caches (requires root) so that
+              the next import reads them from the disk as when an application is first started."""
+    check_call(["sync"])
+    with open(DROP_CACHES_FILE, 'w') as fd:
+        fd.write("3\n")
+
+
+def timeImport(pythonPath, runs, cold):
+    """@brief Time how long python takes to start and import the package.
+       @param pythonPath The folder or zip file holding the package.
+       @param runs The number of times to import the package.
+       @param cold If True the caches are dropped before each import.
+       @return A list of the run times in milliseconds."""
+    env = dict(os.environ, PYTHONPATH=pythonPath)
+    cmd = [sys.executable, "-c", "import {}".format(PACKAGE_NAME)]
+    # The first run is not timed as it loads the files into the page cache.
+    run(cmd, env=env, stdout=DEVNULL, check=True)
+    timeList = []
+    for _ in range(runs):
+        if cold:
+            dropCaches()
+        startTime = time.perf_counter()
+        run(cmd, env=env, stdout=DEVNULL, check=True)
+        timeList.append((time.perf_counter() - startTime) * 1000.0)
+    return timeList
+
+
+def main():
+    opts = OptionParser(usage="usage: %prog [options]\nCompare importing a package from files against importing it from a zip file.")
+    opts.add_option("--sub_packages", help="The number of sub packages (default=20).", type="int", default=20)
+    opts.add_option("--modules", help="The number of modules in each sub package (default=50).", type="int", default=50)
+    opts.add_option("--runs", help="The number of times the package is imported (default=20).", type="int", default=20)
+    opts.add_option("--cold", help="Drop the page, dentry and inode caches before each import (requires root).", action="store_true", default=False)
+    (options, args) = opts.parse_args()
+
+    workFolder = tempfile.mkdtemp(prefix="pipenv2deb_zip_import_")
+    try:
+        filesFolder = os.path.join(workFolder, "files")
+        packageFolder = createPackage(filesFolder, options.sub_packages, options.modules)
+        check_call([sys.executable, "-m", "compileall", "-q", packageFolder])
+        fileCount = sum(len(files) for _, _, files in os.walk(packageFolder))
+
+        zipFile = os.path.join(workFolder, ZipBundler.ZIP_FILENAME)
+        zipData = ZipBundler(UIO(), sys.executable).getZipData([(packageFolder, PACKAGE_NAME, None)], zipFile)
+        with open(zipFile, 'wb') as fd:
+            fd.write(zipData)
+
+        print("{:<6} {:>8} {:>10} {:>10} {:>10}".format("Layout", "Files", "Min ms", "Median ms", "Mean ms"))
+        for name, pythonPath, files in (("files", filesFolder, fileCount), ("zip", zipFile, 1)):
+            timeList = timeImport(pythonPath, options.runs, options.cold)
+            print("{:<6} {:>8} {:>10.1f} {:>10.1f} {:>10.1f}".format(name, files, min(timeList), statistics.median(timeList), statistics.mean(timeList)))
+
+    finally:
+        shutil.rmtree(workFolder)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,12 @@
 #!/bin/sh
 export PIPENV_VENV_IN_PROJECT=enabled
-pipenv --three install
+PIPENV2DEB_START=$(date +%s)
+(
+set -e
+pipenv sync
+)
+PIPENV2DEB_STATUS=$?
+PIPENV2DEB_MSG="pipenv2deb: dependency install in $(pwd) took $(($(date +%s) - PIPENV2DEB_START)) seconds (exit status $PIPENV2DEB_STATUS)"
+echo "$PIPENV2DEB_MSG"
+logger -t pipenv2deb "$PIPENV2DEB_MSG" 2>/dev/null || true
+[ "$PIPENV2DEB_STATUS" -eq 0 ] || exit "$PIPENV2DEB_STATUS"
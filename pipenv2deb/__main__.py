@@ -1,11 +1,35 @@
 #!/usr/bin/env python3
 
 import os
+import sys
+import copy
 import shutil
 import getpass
 import stat
-from optparse import OptionParser
-from subprocess import check_call
+import time
+import threading
+from optparse import OptionParser, Option
+from subprocess import check_call, check_output, call
+from concurrent.futures import ThreadPoolExecutor
+
+from pipenv2deb.stager import Stager, ManifestStager
+from pipenv2deb.deb_writer import DebWriter, GzipMemberCache
+from pipenv2deb.build_cache import BuildCache
+from pipenv2deb.tgz_writer import TgzWriter
+from pipenv2deb.wheelhouse import Wheelhouse
+from pipenv2deb.shell_script import getTimedCommandLines
+from pipenv2deb.venv_slimmer import VenvSlimmer
+from pipenv2deb.batch_builder import BatchBuilder
+from pipenv2deb.build_report import BuildReport
+from pipenv2deb.ignore_rules import IgnoreRules
+from pipenv2deb.deb_delta import DebDelta, DebReader, DebDeltaError
+from pipenv2deb.deps_package import DepsPackage
+from pipenv2deb.shared_store import SharedStore
+from pipenv2deb.file_watcher import FileWatcher
+from pipenv2deb.zip_bundler import ZipBundler, ZipBundlerError
+from pipenv2deb.venv_cache import VenvCache, VenvCacheError
+from pipenv2deb.venv_relocator import VenvRelocator, VenvRelocatorError
+from pipenv2deb.composition import PackageComposition
 
 class DebBuilderError(Exception):
     pass
@@ -32,10 +56,18 @@ class DebBuilder(object):
     PIP_LOCK_FILE = "Pipfile.lock"
     DEBIAN_FOLDER = "debian"
     BUILD_FOLDER = "build"
+    DEPS_BUILD_FOLDER = "build_deps"
     INITD_FOLDER = "init.d"
     ROOT_FS_FOLDER = "root-fs"
     GIT_FOLDER = ".git"
     PYCACHE_FOLDER = "__pycache__"
+    STATE_FOLDER = ".pipenv2deb"
+    STAGE_MANIFEST_FILE = os.path.join(STATE_FOLDER, "stage_manifest.json")
+    DEPS_STAGE_MANIFEST_FILE = os.path.join(STATE_FOLDER, "deps_stage_manifest.json")
+    BATCH_LOG_FILE = os.path.join(STATE_FOLDER, "build.log")
+    WHEELHOUSE_FOLDER = "wheelhouse"
+    WHEELHOUSE_DOWNLOAD_FOLDER = os.path.join(STATE_FOLDER, WHEELHOUSE_FOLDER)
+    INSTALL_WHEELHOUSE_FILENAME = "install_wheelhouse.sh"
     DEBIAN_CONTROL_FILE = os.path.join(DEBIAN_FOLDER, "control")
     DEBIAN_POST_INST_FILE = os.path.join(DEBIAN_FOLDER, "postinst")
     CREATE_PIPENV_FILENAME = "create_pip_env.sh"
@@ -45,22 +77,172 @@ class DebBuilder(object):
     TARGET_BIN_FOLDER = "/usr/local/bin"
     DEBIAN_POST_INST_FILE = os.path.join(DEBIAN_FOLDER, "postinst")
     BUILD_DEBIAN_FOLDER = os.path.join(BUILD_FOLDER, "DEBIAN")
+    DEPS_BUILD_DEBIAN_FOLDER = os.path.join(DEPS_BUILD_FOLDER, "DEBIAN")
     BUILD_INITD_FOLDER = os.path.join(BUILD_FOLDER, os.path.join("etc", INITD_FOLDER))
     BUILD_BIN_FOLDER = "{}{}".format(BUILD_FOLDER, TARGET_BIN_FOLDER)
+    EXECUTABLE_MODE = stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH
     VALID_DEBIAN_FOLDER_FILE_LIST = ["control", "preinst", "postinst", "prerm", "postrm"]
     USER_EXCLUDE_LIST = "exclude_folder_list.txt"
-    EXCLUDE_FOLDER_LIST = [DEBIAN_FOLDER, OUTPUT_FOLDER, BUILD_FOLDER, VENV_FOLDER, ROOT_FS_FOLDER, GIT_FOLDER, PYCACHE_FOLDER]
+    IGNORE_FILE = ".pipenv2debignore"
+    EXCLUDE_FOLDER_LIST = [DEBIAN_FOLDER, OUTPUT_FOLDER, BUILD_FOLDER, VENV_FOLDER, ROOT_FS_FOLDER, GIT_FOLDER, PYCACHE_FOLDER, STATE_FOLDER, DEPS_BUILD_FOLDER]
     BUILD_POST_INST_FILE = os.path.join(BUILD_DEBIAN_FOLDER, "postinst")
-
-    def __init__(self, uio, options):
+    BUILD_POST_RM_FILE = os.path.join(BUILD_DEBIAN_FOLDER, "postrm")
+    SHARED_STORE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), SharedStore.SCRIPT_NAME)
+    # The compression types supported by dpkg-deb and the range of compression levels for each.
+    COMPRESSION_LEVELS = {"gzip": (1, 9), "xz": (0, 9), "zstd": (1, 22), "none": None}
+    DEFAULT_COMPRESSION = "gzip"
+    # The first dpkg-deb version that supports the --threads-max argument.
+    DPKG_DEB_THREADS_VERSION = (1, 21, 9)
+    # The first dpkg-deb version that supports the --root-owner-group argument.
+    DPKG_DEB_ROOT_OWNER_VERSION = (1, 19, 0)
+    DEFAULT_CACHE_FOLDER = os.path.join(os.path.expanduser("~"), ".cache", "pipenv2deb")
+    # Builds of the same project folder share the build folders so they are run one at a time.
+    _projectLockDict = {}
+    # Guards _projectLockDict when builds in several threads start at the same time.
+    _projectLockDictLock = threading.Lock()
+
+    def __init__(self, uio, options, projectFolder=None, outputFolder=None):
         """@brief Constructor
            @param uio A UIO instance
-           @param options The command line options instance"""
+           @param options The command line options instance
+           @param projectFolder The folder holding the project to build. If None the current
+                  working directory is used.
+           @param outputFolder The folder that the packages are placed in. If None the packages
+                  folder in the project folder is used."""
 
         self._uio = uio
         self._options = options
+        if projectFolder is None:
+            projectFolder = os.getcwd()
+        self._projectFolder = os.path.abspath(projectFolder)
+        if outputFolder is None:
+            outputFolder = os.path.join(self._projectFolder, DebBuilder.OUTPUT_FOLDER)
+        self._outputFolder = os.path.abspath(outputFolder)
         self._packageName = None
         self._version = None
+        # A copy so that the folders excluded by one project do not change the folders excluded
+        # by another project built in the same process.
+        self._excludeFolderList = list(DebBuilder.EXCLUDE_FOLDER_LIST)
+        self._ignoreRules = IgnoreRules(self._uio, IgnoreRules.DEFAULT_PATTERNS)
+        self._stager = self._createStager(self._getPath(DebBuilder.BUILD_FOLDER), self._getPath(DebBuilder.STAGE_MANIFEST_FILE))
+        # Used to stage the dependencies package (--split_deps).
+        self._depsStager = self._createStager(self._getPath(DebBuilder.DEPS_BUILD_FOLDER), self._getPath(DebBuilder.DEPS_STAGE_MANIFEST_FILE))
+        self._depsPackage = None
+        self._stageDepsPackage = False
+        # The names of the package folders in the package (see _getPackageFolderList()).
+        self._stagedFolderNames = []
+        # The names of the package folders placed in the zip file (--zip_packages).
+        self._zippedFolderNames = []
+        # The .venv folder placed in the package (see _getVenvFolder()).
+        self._venvFolder = None
+        # Holds the virtual environment used by the build if --venv_cache is used.
+        self._venvCache = None
+        # The stager of each deb file built by the last build (used by --composition).
+        self._debStagers = {}
+        # True if the next build in watch mode must be a full build.
+        self._watchFullBuild = True
+        # Used to write the deb file again in watch mode (--stageless).
+        self._memberCache = None
+        self._outputFiles = []
+        self._report = BuildReport()
+
+    def _getPath(self, *nameList):
+        """@param nameList The names of the path elements relative to the project folder.
+           @return The path in the project folder."""
+        return os.path.join(self._projectFolder, *nameList)
+
+    def _createStager(self, buildFolder, manifestFile):
+        """@brief Create the object that places files into a build folder.
+           @param buildFolder The build folder.
+           @param manifestFile The file that holds the state of the last build if incremental staging is enabled.
+           @return A Stager or ManifestStager instance."""
+        if self._options.stageless:
+            return ManifestStager(self._uio, buildFolder)
+        if not self._isIncremental():
+            manifestFile = None
+        return Stager(self._uio, buildFolder, manifestFile, self._options.link)
+
+    def _isIncremental(self):
+        """@return True if the build folder is kept between builds so that only the files that
+                   have changed are copied. This is always the case in watch mode."""
+        return self._options.incremental or self._options.watch
+
+    def _getCompression(self):
+        """@brief Get the compression to be applied to the deb file payload.
+           @return A tuple containing the compression type and level. The level is None if
+                   the default level for the compression type should be used."""
+        compress = self._options.compress
+        level = None
+        if ":" in compress:
+            compress, level = compress.split(":", 1)
+            try:
+                level = int(level)
+            except ValueError:
+                raise DebBuilderError("{} is an invalid compression level.".format(level))
+
+        if compress not in DebBuilder.COMPRESSION_LEVELS:
+            raise DebBuilderError("{} is an invalid compression type. Valid types are {}.".format(
+                compress, ", ".join(DebBuilder.COMPRESSION_LEVELS.keys())))
+
+        levelRange = DebBuilder.COMPRESSION_LEVELS[compress]
+        if level is not None:
+            if levelRange is None:
+                raise DebBuilderError("A compression level cannot be set when the compression type is {}.".format(compress))
+            if level < levelRange[0] or level > levelRange[1]:
+                raise DebBuilderError("{} compression level must be in the range {} - {}.".format(
+                    compress, levelRange[0], levelRange[1]))
+
+        return (compress, level)
+
+    def _getThreads(self):
+        """@brief Get the number of threads to use when compressing.
+           @return The number of threads."""
+        if self._options.threads < 0:
+            raise DebBuilderError("The number of threads cannot be negative.")
+        if self._options.threads == 0:
+            return os.cpu_count() or 1
+        return self._options.threads
+
+    def _checkOptions(self):
+        """@brief Check the command line options are valid before starting the build."""
+        self._getCompression()
+        self._getThreads()
+        if self._options.fast_launcher and self._options.venv_oip:
+            self._uio.info("The .venv folder is outside the install path (--venv_oip) so the startup scripts will use pipenv.")
+        if self._options.slim and not self._options.venv:
+            self._uio.info("The .venv folder is not included in the package (--venv) so the --slim option has no effect.")
+        if self._options.wheelhouse and (self._options.venv or self._options.venv_oip):
+            raise DebBuilderError("The --wheelhouse option cannot be used with the --venv or --venv_oip options.")
+        if self._options.wheel_platform and not self._options.wheelhouse:
+            self._uio.info("The wheels are not included in the package (--wheelhouse) so the --wheel_platform option has no effect.")
+        if self._options.shared_store and (self._options.venv or self._options.venv_oip):
+            raise DebBuilderError("The --shared_store option cannot be used with the --venv or --venv_oip options.")
+        if self._options.split_deps and (self._options.venv_oip or self._options.tgz or self._options.rpm):
+            raise DebBuilderError("The --split_deps option cannot be used with the --venv_oip, --tgz or --rpm options.")
+        if self._options.venv_cache and not self._options.venv:
+            raise DebBuilderError("The --venv_cache option can only be used with the --venv option.")
+        if self._options.analyze and not os.path.isfile(self._options.analyze):
+            raise DebBuilderError("{} file not found.".format(self._options.analyze))
+        if self._options.size_budget is not None and self._options.size_budget <= 0:
+            raise DebBuilderError("The size budget must be greater than zero.")
+        if self._options.venv_cache_size <= 0:
+            raise DebBuilderError("The venv cache size must be greater than zero.")
+        if self._options.cache_size <= 0:
+            raise DebBuilderError("The build cache size must be greater than zero.")
+        if self._options.delta_from and not os.path.isfile(self._options.delta_from):
+            raise DebBuilderError("{} file not found.".format(self._options.delta_from))
+        if self._options.stageless:
+            if self._options.incremental or self._options.lbp or self._options.link != Stager.LINK_MODE_COPY or self._options.compile:
+                raise DebBuilderError("The --stageless option cannot be used with the --incremental, --lbp, --link or --compile options as no build folder is created.")
+
+    def _isRootUser(self):
+        """@return True if this process is running as the root user."""
+        return os.geteuid() == 0
+
+    def _getProjectLock(self):
+        """@return The lock that is held while the project folder is built."""
+        with DebBuilder._projectLockDictLock:
+            return DebBuilder._projectLockDict.setdefault(self._projectFolder, threading.Lock())
 
     def _ensureRootUser(self):
         """@brief Ensure this script is run as root """
@@ -73,33 +255,44 @@ class DebBuilder(object):
         """@brief Clean up files
            @param removePackagesFolder If True then remove the packages folder."""
 
-        localDir = DebBuilder.BUILD_FOLDER
-        if os.path.isdir(localDir):
-            shutil.rmtree(localDir)
-            self._uio.info("Removed %s path" % (localDir))
+        for localDir in (self._getPath(DebBuilder.BUILD_FOLDER), self._getPath(DebBuilder.DEPS_BUILD_FOLDER)):
+            if os.path.isdir(localDir):
+                shutil.rmtree(localDir)
+                self._uio.info("Removed %s path" % (localDir))
+
+        # The staging manifest describes the build folder so it must be removed with it.
+        for manifestFile in (self._getPath(DebBuilder.STAGE_MANIFEST_FILE), self._getPath(DebBuilder.DEPS_STAGE_MANIFEST_FILE)):
+            if os.path.isfile(manifestFile):
+                os.remove(manifestFile)
+
+        if os.path.isdir(self._outputFolder) and removeOutputFolder:
+            shutil.rmtree(self._outputFolder)
+            self._uio.info("Removed %s path" % (self._outputFolder))
 
-        if os.path.isdir(DebBuilder.OUTPUT_FOLDER) and removeOutputFolder:
-            shutil.rmtree(DebBuilder.OUTPUT_FOLDER)
-            self._uio.info("Removed %s path" % (DebBuilder.OUTPUT_FOLDER))
+        stateFolder = self._getPath(DebBuilder.STATE_FOLDER)
+        if os.path.isdir(stateFolder) and removeOutputFolder:
+            shutil.rmtree(stateFolder)
+            self._uio.info("Removed %s path" % (stateFolder))
 
     def _checkPipenvInstalled(self):
         """@brief Check pipenv is installed."""
         try:
-            check_call(["pipenv", "check"])
+            with self._report.command("pipenv"):
+                check_call(["pipenv", "check"], cwd=self._projectFolder)
         except OSError:
             raise DebBuilderError("pipenv not installed. Run 'pip3 install pipenv'")
 
     def _checkFS(self):
         """@brief Check the required files and folders exist."""
 
-        if not os.path.isfile(DebBuilder.PIP_FILE):
-            raise DebBuilderError("%s file not found in local path." % (DebBuilder.PIP_FILE))
+        if not os.path.isfile(self._getPath(DebBuilder.PIP_FILE)):
+            raise DebBuilderError("%s file not found in %s." % (DebBuilder.PIP_FILE, self._projectFolder))
 
-        if not os.path.isfile(DebBuilder.DEBIAN_CONTROL_FILE):
-            raise DebBuilderError("%s required file not found." % (DebBuilder.DEBIAN_CONTROL_FILE))
+        if not os.path.isfile(self._getPath(DebBuilder.DEBIAN_CONTROL_FILE)):
+            raise DebBuilderError("%s required file not found." % (self._getPath(DebBuilder.DEBIAN_CONTROL_FILE)))
 
         # Ensure only valid filenames exist in the debian folder
-        entryList = os.listdir(DebBuilder.DEBIAN_FOLDER)
+        entryList = os.listdir(self._getPath(DebBuilder.DEBIAN_FOLDER))
         for entry in entryList:
             if entry not in DebBuilder.VALID_DEBIAN_FOLDER_FILE_LIST:
                 raise DebBuilderError(
@@ -114,8 +307,9 @@ class DebBuilder(object):
             _getDebianFiles() must have been called previously."""
         packageName = None
         # Existance of DebBuilder.DEBIAN_CONTROL_FILE is checked in _checkFS()
-        if os.path.isfile(DebBuilder.DEBIAN_CONTROL_FILE):
-            fd = open(DebBuilder.DEBIAN_CONTROL_FILE)
+        controlFile = self._getPath(DebBuilder.DEBIAN_CONTROL_FILE)
+        if os.path.isfile(controlFile):
+            fd = open(controlFile)
             lines = fd.readlines()
             fd.close()
             for line in lines:
@@ -132,8 +326,8 @@ class DebBuilder(object):
 
     def _getPythonFiles(self):
         """@brief Get the python files that are to be installed.
-                  The python files should be in the folder where pipenv2deb is executed."""
-        pythonFolder = os.getcwd()
+                  The python files should be in the project folder."""
+        pythonFolder = self._projectFolder
         entryList = os.listdir(pythonFolder)
         pythonFileList = []
         for entry in entryList:
@@ -141,6 +335,8 @@ class DebBuilder(object):
                 continue
             if not entry.endswith(".py"):
                 continue
+            if self._ignoreRules.isIgnored(entry, False):
+                continue
             pythonFileList.append(os.path.join(pythonFolder, entry))
 
         self._checkPythonFiles(pythonFileList)
@@ -153,26 +349,25 @@ class DebBuilder(object):
         # Note _getPythonFiles() only loads the pythonFileList with files ending
         # *.py
         if len(pythonFileList) == 0:
-            raise DebBuilderError("No python files found to install in current folder.")
+            raise DebBuilderError("No python files found to install in {}.".format(self._projectFolder))
 
     def _getPackageFolderList(self):
         """@brief Get a list of the folders that should sit next to the Pipfile and .venv folders when installed.
                   These folders will be installed next to the top level python command files and so maybe python
                   modules that are imported, or may contain any other files type."""
         folderList = []
-        cwd = os.getcwd()
-        if os.path.isdir(cwd):
-            entryList = os.listdir(cwd)
+        if os.path.isdir(self._projectFolder):
+            entryList = os.listdir(self._projectFolder)
             for entry in entryList:
-                _entry = os.path.join(cwd, entry)
-                if os.path.isdir(_entry) and entry not in DebBuilder.EXCLUDE_FOLDER_LIST:
+                _entry = os.path.join(self._projectFolder, entry)
+                if os.path.isdir(_entry) and entry not in self._excludeFolderList and not self._ignoreRules.isIgnored(entry, True):
                     folderList.append(_entry)
 
         return folderList
 
     def _getPackageFolder(self):
         """@brief Get the package folder. This is the location that the virtual env is installed."""
-        return os.path.join(DebBuilder.BUILD_BIN_FOLDER, "{}.pipenvpkg".format(self._packageName))
+        return self._getPath(DebBuilder.BUILD_BIN_FOLDER, "{}.pipenvpkg".format(self._packageName))
 
     def _getTargetPackageFolder(self):
         """@brief Get the package folder when installed.
@@ -183,15 +378,19 @@ class DebBuilder(object):
         """@brief Create a script to rebuild the pipenv in the local folder.
                   This can be useful during development but is not used in the deb file.
            @return None"""
-        if not os.path.isfile(DebBuilder.CREATE_PIPENV_FILENAME):
-            fd = open(DebBuilder.CREATE_PIPENV_FILENAME, 'w')
-            fd.write("#!/bin/sh\n")
+        createPipenvFile = self._getPath(DebBuilder.CREATE_PIPENV_FILENAME)
+        if not os.path.isfile(createPipenvFile):
+            lines = ["#!/bin/sh"]
             #If the user does not want the .venv folder to be outside the install path
             if not self._options.venv_oip:
-                fd.write("export PIPENV_VENV_IN_PROJECT=enabled\n")
-            fd.write("pipenv --three install\n")
+                lines.append("export PIPENV_VENV_IN_PROJECT=enabled")
+            # pipenv sync installs exactly the packages in the Pipfile.lock file. Unlike
+            # pipenv install it never locks (resolves the dependencies) again.
+            lines += getTimedCommandLines("dependency install in $(pwd)", ["pipenv sync"], True)
+            fd = open(createPipenvFile, 'w')
+            fd.write("\n".join(lines) + "\n")
             fd.close()
-            self._setExecutable(DebBuilder.CREATE_PIPENV_FILENAME)
+            self._setExecutable(createPipenvFile)
             self._uio.info("Created {} file.".format(DebBuilder.CREATE_PIPENV_FILENAME))
         else:
             self._uio.info("Using existing {} file.".format(DebBuilder.CREATE_PIPENV_FILENAME))
@@ -199,258 +398,1122 @@ class DebBuilder(object):
     def _copyFiles(self):
         """@brief Copy Files into the local build area
            @return None"""
-        self._createLocalRebuildPipenvScript()
-
         # If the .venv folder is to be included in the output deb file
         if self._options.venv:
             # For the .venv folder we just check it exists
-            vEnvFolder = os.path.join(os.getcwd(), DebBuilder.VENV_FOLDER)
+            vEnvFolder = self._getVenvFolder()
             if not os.path.isdir(vEnvFolder):
                 raise DebBuilderError("{} (virtual environment) folder not found.".format(vEnvFolder))
 
-        if not os.path.isdir(DebBuilder.OUTPUT_FOLDER):
-            os.makedirs(DebBuilder.OUTPUT_FOLDER)
-            self._uio.info("Created %s" % (DebBuilder.OUTPUT_FOLDER))
+        if not os.path.isdir(self._outputFolder):
+            os.makedirs(self._outputFolder)
+            self._uio.info("Created %s" % (self._outputFolder))
 
         # If a local root-fs files exists copy these files and folders include
         # these in the files to be packaged.
-        if os.path.isdir(DebBuilder.ROOT_FS_FOLDER):
-            srcFolder = DebBuilder.ROOT_FS_FOLDER
-            destFolder = DebBuilder.BUILD_FOLDER
-            shutil.copytree(srcFolder, destFolder)
+        srcFolder = self._getPath(DebBuilder.ROOT_FS_FOLDER)
+        if os.path.isdir(srcFolder):
+            destFolder = self._getPath(DebBuilder.BUILD_FOLDER)
+            self._stager.copyTree(srcFolder, destFolder)
             self._uio.info("Copied %s to %s" % (srcFolder, destFolder))
 
-        shutil.copytree(DebBuilder.DEBIAN_FOLDER, DebBuilder.BUILD_DEBIAN_FOLDER)
-        self._uio.info("Created %s" % (DebBuilder.BUILD_DEBIAN_FOLDER))
+        buildDebianFolder = self._getPath(DebBuilder.BUILD_DEBIAN_FOLDER)
+        self._stager.copyTree(self._getPath(DebBuilder.DEBIAN_FOLDER), buildDebianFolder)
+        self._uio.info("Created %s" % (buildDebianFolder))
 
         packageFolder = self._getPackageFolder()
-        if not os.path.isdir(packageFolder):
-            os.makedirs(packageFolder)
+        if self._stager.makeFolder(packageFolder):
             self._uio.info("Created %s" % (packageFolder))
 
         # Copy any folders that are not part of the build system to the dest
         # packaging folder.
         packageFolderList = self._getPackageFolderList()
+        self._stagedFolderNames = [os.path.basename(_packageFolder) for _packageFolder in packageFolderList]
+        zipFolderList = []
         for _packageFolder in packageFolderList:
             destFolder = os.path.join(packageFolder, os.path.basename(_packageFolder))
-            shutil.copytree(_packageFolder, destFolder)
+            excludeFunc = self._ignoreRules.getExcludeFunc(_packageFolder, os.path.basename(_packageFolder))
+            if self._options.zip_packages and ZipBundler.isPureFolder(_packageFolder, excludeFunc):
+                zipFolderList.append((_packageFolder, os.path.basename(_packageFolder), excludeFunc))
+                continue
+            self._stager.copyTree(_packageFolder, destFolder, allowLink=True, excludeFunc=excludeFunc)
             self._uio.info("Copied {} to {}".format(_packageFolder, destFolder))
+        self._zippedFolderNames = [name for _, name, _ in zipFolderList]
+        if zipFolderList:
+            self._stageZipFile(zipFolderList, packageFolder)
+        self._ignoreRules.showSummary(self._options.verbose)
 
-        if os.path.isdir(DebBuilder.INITD_FOLDER):
-            shutil.copytree(DebBuilder.INITD_FOLDER, DebBuilder.BUILD_INITD_FOLDER)
-            self._uio.info("Copied init.d folder to {}".format(DebBuilder.BUILD_INITD_FOLDER))
-            self._setExecutableFiles(DebBuilder.BUILD_INITD_FOLDER)
+        if os.path.isdir(self._getPath(DebBuilder.INITD_FOLDER)):
+            buildInitdFolder = self._getPath(DebBuilder.BUILD_INITD_FOLDER)
+            self._stager.copyTree(self._getPath(DebBuilder.INITD_FOLDER), buildInitdFolder)
+            self._uio.info("Copied init.d folder to {}".format(buildInitdFolder))
+            self._setStagedExecutableFiles(buildInitdFolder)
 
         # The Pipfile must be present for the pipenv to work
-        shutil.copy(DebBuilder.PIP_FILE, packageFolder)
-        self._uio.info("Copied %s to %s" % (DebBuilder.PIP_FILE, packageFolder))
-        shutil.copy(DebBuilder.PIP_LOCK_FILE, packageFolder)
-        self._uio.info("Copied %s to %s" % (DebBuilder.PIP_LOCK_FILE, packageFolder))
-
-        shutil.copy(DebBuilder.CREATE_PIPENV_FILENAME, packageFolder)
-        self._uio.info("Copied %s to %s" % (DebBuilder.CREATE_PIPENV_FILENAME, packageFolder))
+        for _file in (DebBuilder.PIP_FILE, DebBuilder.PIP_LOCK_FILE, DebBuilder.CREATE_PIPENV_FILENAME):
+            self._stager.copyFile(self._getPath(_file), packageFolder)
+            self._uio.info("Copied %s to %s" % (_file, packageFolder))
 
         for pythonFile in self._pythonFiles:
             if os.path.isfile(pythonFile):
-                shutil.copy(pythonFile, packageFolder)
+                self._stager.copyFile(pythonFile, packageFolder)
                 self._uio.info("Copied %s to %s" % (pythonFile, packageFolder))
 
+        # If the dependencies are in a separate package
+        if self._options.split_deps:
+            self._linkDepsPackage(packageFolder)
         # If the .venv folder is not to be included in the output deb file
-        if self._options.venv:
+        elif self._options.venv:
             # Copy the .venv folder to the build folder
             destFolder = os.path.join(packageFolder, DebBuilder.VENV_FOLDER)
-            shutil.copytree(DebBuilder.VENV_FOLDER, destFolder)
+            if self._options.slim:
+                self._copySlimVenv(self._stager, self._getPath(DebBuilder.BUILD_FOLDER), destFolder)
+            else:
+                self._stager.copyTree(self._getVenvFolder(), destFolder, allowLink=True)
             self._uio.info("Copied virtual environment to {}".format(destFolder))
+            self._relocateVenv(self._stager, self._getPath(DebBuilder.BUILD_FOLDER), destFolder, self._getTargetPackageFolder())
         else:
+            if self._options.wheelhouse:
+                self._stageWheelhouse(self._stager, packageFolder)
+            if self._options.shared_store:
+                self._stageSharedStoreScript(self._stager, packageFolder)
+                self._updatePostRemoveScript()
             self._updatePostInstallScript()
 
         # It's not nessasary for the control file to be executable but the other
         # script files that maybe present (postinst etc) must be.
-        self._setExecutableFiles(DebBuilder.BUILD_DEBIAN_FOLDER)
+        self._setStagedExecutableFiles(buildDebianFolder)
+
+    def _stageZipFile(self, zipFolderList, packageFolder):
+        """@brief Place the python files in the package folders that hold no other files in a zip
+                  file in the package folder. The startup scripts add the zip file to the python path.
+           @param zipFolderList A list of tuples containing the source folder, the name of the folder
+                  and the exclude function for the folder.
+           @param packageFolder The package folder in the build folder."""
+        targetZipFile = os.path.join(self._getTargetPackageFolder(), ZipBundler.ZIP_FILENAME)
+        try:
+            zipData = ZipBundler(self._uio, self._getProjectPython()).getZipData(zipFolderList, targetZipFile)
+        except ZipBundlerError as ex:
+            raise DebBuilderError(str(ex))
+        self._stager.writeFile(os.path.join(packageFolder, ZipBundler.ZIP_FILENAME), zipData)
+
+    def _copySlimVenv(self, stager, buildFolder, destFolder):
+        """@brief Copy the .venv folder to the build folder without the files that are not required
+                  when the application runs and remove the debug symbols from the native libraries.
+           @param stager The Stager instance of the build folder.
+           @param buildFolder The build folder.
+           @param destFolder The .venv folder in the build folder."""
+        slimmer = VenvSlimmer(self._uio, self._getVenvFolder(), self._getPath(VenvSlimmer.USER_RULES_FILE))
+        stager.copyTree(self._getVenvFolder(), destFolder, allowLink=True, excludeFunc=slimmer.isExcluded)
+        with self._report.command("strip"):
+            slimmer.stripLibraries(stager, buildFolder, destFolder, self._getThreads())
+        slimmer.showSummary()
+
+    def _relocateVenv(self, stager, buildFolder, destFolder, targetFolder):
+        """@brief Change the paths of the .venv folder and the project folder on the build machine
+                  in the staged .venv folder to the folders they are installed into so that the
+                  scripts in the .venv folder run on the target machine.
+           @param stager The Stager instance of the build folder.
+           @param buildFolder The build folder.
+           @param destFolder The .venv folder in the build folder.
+           @param targetFolder The folder that holds the .venv folder when installed."""
+        # Paths in the project folder (E.G an editable install) refer to the package folder
+        # as it holds the files in the project folder.
+        pathList = [(self._getVenvFolder(), os.path.join(targetFolder, DebBuilder.VENV_FOLDER)),
+                    (self._projectFolder, self._getTargetPackageFolder())]
+        try:
+            VenvRelocator(self._uio, pathList).relocate(stager, buildFolder, destFolder)
+        except VenvRelocatorError as ex:
+            raise DebBuilderError(str(ex))
+
+    def _loadDepsPackage(self):
+        """@brief Get the details of the dependencies package from the Pipfile.lock file and the options
+                  that change how the dependencies are packaged."""
+        inputFileList = [self._getPath(DebBuilder.PIP_LOCK_FILE)]
+        if self._options.venv:
+            # Holds the version of the python interpreter that the .venv folder was created with.
+            inputFileList.append(os.path.join(self._getVenvFolder(), "pyvenv.cfg"))
+            if self._options.slim:
+                inputFileList.append(self._getPath(VenvSlimmer.USER_RULES_FILE))
+        optionDict = {"venv": self._options.venv,
+                      "slim": self._options.slim,
+                      "compile": self._options.compile,
+                      "wheelhouse": self._options.wheelhouse,
+                      "wheel_platform": self._options.wheel_platform,
+                      "shared_store": self._options.shared_store,
+                      # The paths in the .venv folder are changed to the dependencies package folder.
+                      "relocated_venv": self._options.venv}
+        self._depsPackage = DepsPackage(self._getPath(DebBuilder.DEBIAN_CONTROL_FILE), inputFileList, optionDict, self._projectFolder)
+        self._uio.info("Dependencies package: {}".format(self._depsPackage.getName()))
+
+    def _getDepsPackageFolder(self):
+        """@brief Get the folder in the dependencies package build folder that the dependencies are placed in."""
+        return self._getPath(DebBuilder.DEPS_BUILD_FOLDER) + self._depsPackage.getTargetFolder(DebBuilder.TARGET_BIN_FOLDER)
+
+    def _linkDepsPackage(self, packageFolder):
+        """@brief Make the application package depend on the dependencies package and place a link
+                  to the .venv folder in the dependencies package in the package folder.
+           @param packageFolder The package folder in the build folder."""
+        targetVenvFolder = os.path.join(self._depsPackage.getTargetFolder(DebBuilder.TARGET_BIN_FOLDER), DebBuilder.VENV_FOLDER)
+        venvLink = os.path.join(packageFolder, DebBuilder.VENV_FOLDER)
+        self._stager.makeSymlink(targetVenvFolder, venvLink)
+        self._uio.info("Linked {} to {}".format(venvLink, targetVenvFolder))
+        self._stager.writeFile(self._getPath(DebBuilder.BUILD_DEBIAN_FOLDER, "control"), self._depsPackage.getAppControl())
+
+    def _copyDepsFiles(self):
+        """@brief Place the files in the dependencies package build folder. This is not required if
+                  the dependencies package was created by an earlier build as it's name changes
+                  when the Pipfile.lock file changes."""
+        depsPackage = os.path.join(self._outputFolder, self._depsPackage.getDebFilename())
+        if os.path.isfile(depsPackage):
+            self._uio.info("Using existing {} as {} has not changed.".format(depsPackage, DebBuilder.PIP_LOCK_FILE))
+            return
+
+        self._stageDepsPackage = True
+        stager = self._depsStager
+        stager.begin()
+        depsDebianFolder = self._getPath(DebBuilder.DEPS_BUILD_DEBIAN_FOLDER)
+        stager.writeFile(os.path.join(depsDebianFolder, "control"), self._depsPackage.getControl())
+        targetDepsFolder = self._depsPackage.getTargetFolder(DebBuilder.TARGET_BIN_FOLDER)
+        removeCommand = None
+        if self._options.shared_store:
+            removeCommand = self._getPostRemoveCommand(targetDepsFolder, self._depsPackage.getName())
+        stager.writeFile(os.path.join(depsDebianFolder, "postrm"), self._depsPackage.getPostRemoveScript(DebBuilder.TARGET_BIN_FOLDER, removeCommand))
+
+        depsFolder = self._getDepsPackageFolder()
+        stager.makeFolder(depsFolder)
+        for _file in (DebBuilder.PIP_FILE, DebBuilder.PIP_LOCK_FILE, DebBuilder.CREATE_PIPENV_FILENAME):
+            stager.copyFile(self._getPath(_file), depsFolder)
+            self._uio.info("Copied {} to {}".format(_file, depsFolder))
+
+        if self._options.venv:
+            destFolder = os.path.join(depsFolder, DebBuilder.VENV_FOLDER)
+            if self._options.slim:
+                self._copySlimVenv(stager, self._getPath(DebBuilder.DEPS_BUILD_FOLDER), destFolder)
+            else:
+                stager.copyTree(self._getVenvFolder(), destFolder, allowLink=True)
+            self._uio.info("Copied virtual environment to {}".format(destFolder))
+            self._relocateVenv(stager, self._getPath(DebBuilder.DEPS_BUILD_FOLDER), destFolder, targetDepsFolder)
+        else:
+            if self._options.wheelhouse:
+                self._stageWheelhouse(stager, depsFolder)
+            if self._options.shared_store:
+                self._stageSharedStoreScript(stager, depsFolder)
+            postInstFile = os.path.join(depsDebianFolder, "postinst")
+            stager.writeFile(postInstFile, "#!/bin/sh\n" + self._getPostInstallCommand(targetDepsFolder, self._depsPackage.getName()))
+
+        self._setStagedExecutableFiles(depsDebianFolder, stager)
+
+    def _stageWheelhouse(self, stager, packageFolder):
+        """@brief Download the wheels for the packages in the Pipfile.lock file and place them in the
+                  package folder along with a script to install them when the package is installed.
+           @param stager The Stager instance of the build folder.
+           @param packageFolder The package folder in the build folder."""
+        wheelhouse = Wheelhouse(self._uio, self._getPath(DebBuilder.PIP_LOCK_FILE), self._getPath(DebBuilder.WHEELHOUSE_DOWNLOAD_FOLDER), self._getProjectPython(), self._options.wheel_platform)
+        with self._report.command("pip"):
+            wheelList = wheelhouse.download()
+
+        wheelhouseFolder = os.path.join(packageFolder, DebBuilder.WHEELHOUSE_FOLDER)
+        stager.makeFolder(wheelhouseFolder)
+        for wheelFile in wheelList:
+            stager.copyFile(wheelFile, wheelhouseFolder, allowLink=True)
+        stager.writeFile(os.path.join(wheelhouseFolder, Wheelhouse.SHA256SUMS_FILE), wheelhouse.getSHA256Sums(wheelList))
+        stager.writeFile(os.path.join(wheelhouseFolder, Wheelhouse.REQUIREMENTS_FILE), wheelhouse.getRequirements())
+        self._uio.info("Copied {} wheels to {}".format(len(wheelList), wheelhouseFolder))
+
+        installScript = os.path.join(packageFolder, DebBuilder.INSTALL_WHEELHOUSE_FILENAME)
+        stager.writeFile(installScript, wheelhouse.getInstallScript(DebBuilder.WHEELHOUSE_FOLDER, DebBuilder.VENV_FOLDER))
+        self._setStagedExecutable(installScript, stager)
+
+    def _stageSharedStoreScript(self, stager, packageFolder):
+        """@brief Place the script that creates the .venv folder from the shared store in the package folder.
+           @param stager The Stager instance of the build folder.
+           @param packageFolder The package folder in the build folder."""
+        scriptFile = os.path.join(packageFolder, SharedStore.SCRIPT_NAME)
+        stager.copyFile(DebBuilder.SHARED_STORE_SCRIPT, scriptFile)
+        self._setStagedExecutable(scriptFile, stager)
 
     def _setExecutable(self, exeFile):
         """@brief Set a file as executable.
            @param  exeFile The file to be mde executablke."""
-        os.chmod(exeFile, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+        os.chmod(exeFile, DebBuilder.EXECUTABLE_MODE)
+        self._uio.info("Set executable attribute: {}".format(exeFile))
+
+    def _setStagedExecutable(self, exeFile, stager=None):
+        """@brief Set a file in the build folder as executable.
+           @param  exeFile The file to be made executable.
+           @param stager The Stager instance of the build folder. If None the application package stager is used."""
+        if stager is None:
+            stager = self._stager
+        stager.setMode(exeFile, DebBuilder.EXECUTABLE_MODE)
         self._uio.info("Set executable attribute: {}".format(exeFile))
 
-    def _setExecutableFiles(self, folder):
-        """@brief Set all files in a foilder as executable."""
-        entryList = os.listdir(folder)
+    def _setStagedExecutableFiles(self, folder, stager=None):
+        """@brief Set all files in a build folder as executable.
+           @param folder The folder in the build folder.
+           @param stager The Stager instance of the build folder. If None the application package stager is used."""
+        if stager is None:
+            stager = self._stager
+        entryList = stager.listFolder(folder)
         for entry in entryList:
             _file = os.path.join(folder, entry)
-            self._setExecutable(_file)
+            self._setStagedExecutable(_file, stager)
 
     def _createStartupFilepythonFile(self, pythonFile):
         """@brief Create a startup file for the python file.
            @param pythonFile The python file to startup."""
         startupScriptFilename = pythonFile.replace(".py", "")
-        startupScriptFile = os.path.join(DebBuilder.BUILD_BIN_FOLDER, startupScriptFilename)
+        startupScriptFile = self._getPath(DebBuilder.BUILD_BIN_FOLDER, startupScriptFilename)
         targetPackageFolder = self._getTargetPackageFolder()
-        pipFile = os.path.join(targetPackageFolder, DebBuilder.PIP_FILE)
-        targetStartupFile = os.path.join(targetPackageFolder, pythonFile)
 
         # The python file that is executed from the targetStartupFile must be executable.
         # Ensure the python file is executable under the build folder.
-        buildFolder = DebBuilder.BUILD_FOLDER + targetPackageFolder
+        buildFolder = self._getPath(DebBuilder.BUILD_FOLDER) + targetPackageFolder
         buildFolderPythonFile = os.path.join(buildFolder, pythonFile)
-        if os.path.isfile(buildFolderPythonFile):
-            self._setExecutable(buildFolderPythonFile)
+        if self._stager.isFile(buildFolderPythonFile):
+            self._setStagedExecutable(buildFolderPythonFile)
         else:
             raise Exception("{} file not found.".format(buildFolderPythonFile))
-        
-        fileLines = []
-        fileLines.append("#!/bin/sh\n")
-        execLine = ""
-        #If the user does not want the .venv folder to be outside the install path
-        if not self._options.venv_oip:
-            execLine = "PIPENV_VENV_IN_PROJECT=enabled " # This tells pipenv that the .venv folder is in the project folder.
-        execLine = "{}{}".format(execLine, "PIPENV_PIPFILE={} pipenv run {} $@\n".format(pipFile, targetStartupFile))
-        fileLines.append(execLine)
-        
+
         #Write the startup script file.
-        fd = open(startupScriptFile, 'w')
-        for line in fileLines:
-            fd.write(line)
-        fd.close()
+        startupScript = getStartupScript(targetPackageFolder, pythonFile, self._options.fast_launcher, self._options.venv_oip, bool(self._zippedFolderNames))
+        self._stager.writeFile(startupScriptFile, startupScript)
 
         self._uio.info("Created: {}".format(startupScriptFile))
-        self._setExecutable(startupScriptFile)
+        self._setStagedExecutable(startupScriptFile)
+
+    def _getVenvFolder(self):
+        """@brief Get the .venv folder that is placed in the package (--venv). If the --venv_cache
+                  option is used this is the virtual environment in the venv cache for the
+                  Pipfile.lock file (created if not present) rather than the local .venv folder.
+           @return The .venv folder."""
+        if self._venvFolder is None:
+            if self._options.venv_cache:
+                self._venvCache = VenvCache(self._uio, self._options.cache_folder, self._options.venv_cache_size * 1024 * 1024)
+                try:
+                    with self._report.command("venv_cache"):
+                        # The interpreter used when the project has no .venv folder (see _getProjectPython()).
+                        self._venvFolder = self._venvCache.getVenv(self._getPath(DebBuilder.PIP_LOCK_FILE), "python3")
+                except VenvCacheError as ex:
+                    raise DebBuilderError(str(ex))
+            else:
+                self._venvFolder = self._getPath(DebBuilder.VENV_FOLDER)
+        return self._venvFolder
+
+    def _getProjectPython(self):
+        """@brief Get the python interpreter used to compile python files and run pip. This is the
+                  interpreter in the local .venv folder (or the venv cache if --venv_cache is used)
+                  if present as this is the interpreter that the installed .venv folder is created with.
+           @return The python interpreter."""
+        if self._options.venv_cache:
+            return os.path.join(self._getVenvFolder(), "bin", "python")
+        venvPython = self._getPath(DebBuilder.VENV_FOLDER, "bin", "python")
+        if os.path.isfile(venvPython):
+            return venvPython
+        return "python3"
+
+    def _registerCompiledFiles(self, stager, folder):
+        """@brief Record the compiled python files in the build folder with the stager. Compiled
+                  files whose python file is no longer staged are removed.
+           @param stager The Stager instance of the build folder.
+           @param folder The build folder to search."""
+        for root, dirs, files in os.walk(folder):
+            if os.path.basename(root) != DebBuilder.PYCACHE_FOLDER:
+                continue
+            for _file in files:
+                pycFile = os.path.join(root, _file)
+                # E.G __pycache__/module.cpython-311.pyc is compiled from module.py
+                pythonFile = os.path.join(os.path.dirname(root), "{}.py".format(_file.split(".")[0]))
+                if stager.isStaged(pythonFile):
+                    stager.addGenerated(pycFile)
+                else:
+                    os.remove(pycFile)
+            if not os.listdir(root):
+                os.rmdir(root)
+
+    def _compilePythonFiles(self):
+        """@brief Compile all the python files in the package folder (including the .venv folder if present)
+                  so that the installed application does not have to compile them when it starts."""
+        compileList = [(self._stager, self._getPackageFolder(), self._getTargetPackageFolder())]
+        if self._stageDepsPackage:
+            compileList.append((self._depsStager, self._getDepsPackageFolder(), self._depsPackage.getTargetFolder(DebBuilder.TARGET_BIN_FOLDER)))
+
+        startTime = time.time()
+        for stager, folder, targetFolder in compileList:
+            compileCmd = [self._getProjectPython(), "-m", "compileall", "-q",
+                          "-j", str(self._getThreads()),
+                          "-d", targetFolder,
+                          folder]
+            self._uio.info("Executing: {}".format(" ".join(compileCmd)))
+            try:
+                with self._report.command("compileall"):
+                    returnCode = call(compileCmd)
+            except OSError:
+                raise DebBuilderError("Failed to compile python files.")
+            # Files that fail to compile (E.G test data in the .venv folder) are left as python files.
+            if returnCode != 0:
+                self._uio.info("Some python files could not be compiled.")
+            self._registerCompiledFiles(stager, folder)
+        self._uio.info("Compiled python files in {:.2f} seconds.".format(time.time() - startTime))
 
     def _createStartupFiles(self):
         """@brief Create startup files for each of the python files in the current working directory (where pipenv2deb is executed)."""
         for pythonFile in self._pythonFiles:
             self._createStartupFilepythonFile(os.path.basename(pythonFile))
 
-    def _updatePostInstallScript(self):
-        """@brief Ensure that the .venv folder is built when the package is installed."""
-        self._uio.info("Creating %s" % (DebBuilder.BUILD_POST_INST_FILE))
-        if os.path.isfile(DebBuilder.BUILD_POST_INST_FILE):
-            fd = open(DebBuilder.BUILD_POST_INST_FILE, 'r')
-            lines = fd.readlines()
-            fd.close()
-            if len(lines) > 0:
-                if not lines[0].startswith("#!"):
-                    # Note the DebBuilder.BUILD_POST_INST_FILE file is copied to DebBuilder.DEBIAN_POST_INST_FILE
-                    raise Exception(
-                        "The first line in the {} file must start with #!".format(DebBuilder.DEBIAN_POST_INST_FILE))
-            else:
-                lines.append("#!/bin/sh\n")
-
-        else:
-            lines = []
+    def _insertScriptCommand(self, buildScriptFile, command):
+        """@brief Insert a command at the start of a script in the build DEBIAN folder. The script
+                  is created from the script in the debian folder (or an empty script if the
+                  debian folder does not hold it) rather than the script left in the build folder
+                  by an earlier (E.G --incremental or --watch) build so that the command is only
+                  inserted once.
+           @param buildScriptFile The script in the build DEBIAN folder.
+           @param command The command lines to insert."""
+        self._uio.info("Creating %s" % (buildScriptFile))
+        srcScriptFile = self._getPath(DebBuilder.DEBIAN_FOLDER, os.path.basename(buildScriptFile))
+        lines = []
+        if os.path.isfile(srcScriptFile):
+            with open(srcScriptFile) as fd:
+                lines = fd.read().splitlines(True)
+            if len(lines) > 0 and not lines[0].startswith("#!"):
+                raise Exception(
+                    "The first line in the {} file must start with #!".format(os.path.join(DebBuilder.DEBIAN_FOLDER, os.path.basename(buildScriptFile))))
+        if len(lines) == 0:
             lines.append("#!/bin/sh\n")
 
-        targetPackageFolder = self._getTargetPackageFolder()
+        # We insert the command at the start of the script file so that if
+        # a script file used any commands are shown at the end of the process.
+        lines.insert(1, command)
+
+        self._stager.writeFile(buildScriptFile, "".join(lines))
+        self._setStagedExecutable(buildScriptFile)
+
+    def _updatePostInstallScript(self):
+        """@brief Ensure that the .venv folder is built when the package is installed."""
+        self._insertScriptCommand(self._getPath(DebBuilder.BUILD_POST_INST_FILE), self._getPostInstallCommand(self._getTargetPackageFolder(), self._packageName))
+
+    def _updatePostRemoveScript(self):
+        """@brief Ensure that the .venv folder is removed and the shared store packages are released when the package is removed."""
+        self._insertScriptCommand(self._getPath(DebBuilder.BUILD_POST_RM_FILE), self._getPostRemoveCommand(self._getTargetPackageFolder(), self._packageName))
+
+    def _getPostRemoveCommand(self, targetPackageFolder, packageName):
+        """@brief Get the post remove script command that releases the packages in the shared store.
+                  The shared store script is run from the store as the package no longer holds it.
+           @param targetPackageFolder The folder that held the .venv folder when installed.
+           @param packageName The name of the debian package.
+           @return The command lines."""
+        storeScript = os.path.join(SharedStore.DEFAULT_STORE_FOLDER, SharedStore.SCRIPT_NAME)
+        lines = ['if [ "$1" = "remove" ] || [ "$1" = "purge" ]; then',
+                 "    [ ! -f {} ] || python3 {} release --owner {} --venv {} || true".format(
+                     storeScript, storeScript, packageName, os.path.join(targetPackageFolder, DebBuilder.VENV_FOLDER)),
+                 # dpkg cannot remove the folder while the .venv folder is present.
+                 "    rmdir {} 2>/dev/null || true".format(targetPackageFolder),
+                 "fi"]
+        return "\n".join(lines) + "\n"
+
+    def _getPostInstallCommand(self, targetPackageFolder, packageName):
+        """@brief Get the post install script command that creates the .venv folder.
+           @param targetPackageFolder The folder that holds the Pipfile when installed.
+           @param packageName The name of the debian package.
+           @return The command lines."""
         #If the user wants the .venv folder outside the install path
         if self._options.venv_oip:
-            orgUser = os.environ['SUDO_USER']
-            if orgUser and len(orgUser) > 0:
+            orgUser = os.environ.get('SUDO_USER')
+            if orgUser:
                 #We need to create the virtual env as non root user so that the out of install path
                 #virtual environment folder is created with and ownership of the install user.
                 #This folder will typically be under ~/.local/share/virtualenvs
-                postInstCmd = 'cd {} && /usr/bin/sudo -u {} pipenv install\n'.format(targetPackageFolder, orgUser)
+                timedLines = getTimedCommandLines("dependency install in {}".format(targetPackageFolder),
+                                                  ["cd {}".format(targetPackageFolder),
+                                                   "/usr/bin/sudo -u {} pipenv sync".format(orgUser)],
+                                                  False)
+                postInstCmd = "\n".join(timedLines) + "\n"
 
             else:
-                raise Exception("Install failed: SUDO_USER environmental variable not found.")
+                raise DebBuilderError("The SUDO_USER environment variable is not set. It holds the user that creates the .venv folder when the package is installed (--venv_oip) so pipenv2deb must be run using sudo.")
+
+        elif self._options.shared_store:
+            installCmd = "python3 ./{} install --owner {} --lock {} --venv {}".format(
+                SharedStore.SCRIPT_NAME, packageName, DebBuilder.PIP_LOCK_FILE, DebBuilder.VENV_FOLDER)
+            if self._options.wheelhouse:
+                installCmd = "{} --wheelhouse {}".format(installCmd, DebBuilder.WHEELHOUSE_FOLDER)
+            timedLines = getTimedCommandLines("shared store dependency install in {}".format(targetPackageFolder),
+                                              ["cd {}".format(targetPackageFolder), installCmd],
+                                              True)
+            postInstCmd = "\n".join(timedLines) + "\n"
+
+        elif self._options.wheelhouse:
+            postInstCmd = "cd {} && ./{}\n".format(targetPackageFolder, DebBuilder.INSTALL_WHEELHOUSE_FILENAME)
 
         else:
             postInstCmd = "cd {} && ./{}\n".format(targetPackageFolder, DebBuilder.CREATE_PIPENV_FILENAME)
 
-        # We insert the post install command at the start of the script file so that if
-        # a postinst file used any commands are shown at the end of the installation process.
-        lines.insert(1, postInstCmd)
-
-        fd = open(DebBuilder.BUILD_POST_INST_FILE, 'w')
-        for line in lines:
-            fd.write(line)
-        fd.close()
-        self._setExecutable(DebBuilder.BUILD_POST_INST_FILE)
+        return postInstCmd
 
     def _getDebFilename(self):
         """@brief Get the name of the deb output file."""
         return '{}-{}-{}.deb'.format(self._packageName, self._version, self._architecture)
 
+    def _getDpkgDebVersion(self):
+        """@brief Get the version of the installed dpkg-deb command.
+           @return The version as a tuple of ints or None if unknown."""
+        try:
+            with self._report.command("dpkg-deb"):
+                firstLine = check_output(["dpkg-deb", "--version"]).decode().splitlines()[0]
+        except (OSError, IndexError):
+            return None
+        # E.G Debian 'dpkg-deb' package archive backend version 1.21.22 (amd64).
+        elems = firstLine.split()
+        if "version" in elems and elems.index("version") + 1 < len(elems):
+            version = []
+            for elem in elems[elems.index("version") + 1].split("."):
+                if not elem.isdigit():
+                    break
+                version.append(int(elem))
+            return tuple(version)
+        return None
+
+    def _showCompressionSummary(self, debPackage, uncompressedSize, duration):
+        """@brief Show the size of the deb file against the size of the files it contains.
+           @param debPackage The deb file.
+           @param uncompressedSize The size of the files in the deb file in bytes.
+           @param duration The time taken to build the deb file in seconds."""
+        compressedSize = os.path.getsize(debPackage)
+        ratio = 0.0
+        if compressedSize > 0:
+            ratio = float(uncompressedSize) / compressedSize
+        compress, level = self._getCompression()
+        if level is None:
+            level = "default"
+        self._uio.info("Compression: {} (level {}, {} threads), {} bytes -> {} bytes, ratio {:.2f}, took {:.2f} seconds.".format(
+            compress, level, self._getThreads(), uncompressedSize, compressedSize, ratio, duration))
+
     def _build(self):
-        """@brief Build the deb, rpm and tgz packages"""
-        debFile = self._getDebFilename()
-        debBuildCmd = "dpkg-deb -Zgzip -b {} {}".format(DebBuilder.BUILD_FOLDER,
-                                                        os.path.join(DebBuilder.OUTPUT_FOLDER, debFile))
+        """@brief Build the deb package."""
+        debPackage = os.path.join(self._outputFolder, self._getDebFilename())
+        self._buildDeb(self._stager, self._getPath(DebBuilder.BUILD_FOLDER), debPackage)
+
+    def _buildDepsDeb(self):
+        """@brief Build the dependencies package unless it was built by an earlier build."""
+        depsPackage = os.path.join(self._outputFolder, self._depsPackage.getDebFilename())
+        if self._stageDepsPackage:
+            self._buildDeb(self._depsStager, self._getPath(DebBuilder.DEPS_BUILD_FOLDER), depsPackage)
+        else:
+            self._outputFiles.append(depsPackage)
+
+    def _buildDeb(self, stager, buildFolder, debPackage):
+        """@brief Build a deb package from a build folder.
+           @param stager The Stager instance of the build folder.
+           @param buildFolder The build folder.
+           @param debPackage The deb file to create."""
+        self._debStagers[debPackage] = stager
+        # The existing file may be linked to a file in the build cache so it must not be written over.
+        if os.path.isfile(debPackage):
+            os.remove(debPackage)
+
+        # Without root the files in the build folder are not owned by root so the deb file is
+        # written with the ownership of all files set to root.
+        if self._options.stageless or not self._isRootUser():
+            self._writeDeb(stager, debPackage)
+            return
+
+        compress, level = self._getCompression()
+        debBuildCmd = "dpkg-deb -Z{}".format(compress)
+        if level is not None:
+            debBuildCmd = "{} -z{}".format(debBuildCmd, level)
+        dpkgDebVersion = self._getDpkgDebVersion()
+        if dpkgDebVersion and dpkgDebVersion >= DebBuilder.DPKG_DEB_THREADS_VERSION:
+            debBuildCmd = "{} --threads-max={}".format(debBuildCmd, self._getThreads())
+        # Linked files keep the owner of the source file so ensure all files are installed as owned by root.
+        if dpkgDebVersion and dpkgDebVersion >= DebBuilder.DPKG_DEB_ROOT_OWNER_VERSION:
+            debBuildCmd = "{} --root-owner-group".format(debBuildCmd)
+        debBuildCmd = "{} -b {} {}".format(debBuildCmd, buildFolder, debPackage)
+
+        uncompressedSize = stager.getSize()
         self._uio.info("Executing: {}".format(debBuildCmd))
+        startTime = time.time()
         try:
-            check_call(debBuildCmd.split())
+            with self._report.command("dpkg-deb"):
+                check_call(debBuildCmd.split())
         except OSError:
             raise DebBuilderError("Failed to build deb file.")
-
-    def _createPackagesFromDeb(self):
-        """@brief Create other packages from the deb file which must be built prior to calling this method."""
+        self._outputFiles.append(debPackage)
+        self._showCompressionSummary(debPackage, uncompressedSize, time.time() - startTime)
+
+    def _writeDeb(self, stager, debPackage):
+        """@brief Write the deb file straight from the staged entries rather than running dpkg-deb.
+                  All files are recorded as owned by root with the staged modes.
+           @param stager The Stager or ManifestStager instance holding the staged entries.
+           @param debPackage The deb file to create."""
+        compress, level = self._getCompression()
+        self._uio.info("Writing {}".format(debPackage))
+        startTime = time.time()
+        # The members are only kept for the application package as this is written on each change.
+        memberCache = None
+        if stager is self._stager:
+            memberCache = self._memberCache
+        DebWriter(compress, level, self._getThreads(), memberCache).write(debPackage, stager.getEntries())
+        self._outputFiles.append(debPackage)
+        if memberCache and compress == "gzip":
+            self._uio.info("Compressed {} and reused {} gzip members.".format(*memberCache.getMemberCounts()))
+        self._showCompressionSummary(debPackage, stager.getSize(), time.time() - startTime)
+
+    def _getTgzFilename(self):
+        """@brief Get the name of the tgz output file."""
+        return '{}-{}.tgz'.format(self._packageName, self._version)
+
+    def _createRpmFromDeb(self):
+        """@brief Create an rpm package from the deb file which must be built prior to calling this method."""
         debFile = self._getDebFilename()
-        debPackage = os.path.join(DebBuilder.OUTPUT_FOLDER, debFile)
+        debPackage = os.path.join(self._outputFolder, debFile)
         if os.path.isfile(debPackage):
-            cwd = os.getcwd()
+            existingFiles = os.listdir(self._outputFolder)
+
+            buildCmd = "sudo alien --to-rpm --scripts %s" % (debFile)
+            self._uio.info("Executing: {}".format(buildCmd))
+            try:
+                with self._report.command("alien"):
+                    check_call(buildCmd.split(), cwd=self._outputFolder)
+            except OSError:
+                raise DebBuilderError("Failed to build rpm from deb file.")
+            self._uio.info("Created rpm file from deb")
+
+            # Record the file that alien created.
+            for entry in os.listdir(self._outputFolder):
+                if entry not in existingFiles and entry.endswith(".rpm"):
+                    self._outputFiles.append(os.path.join(self._outputFolder, entry))
+
+    def _createRpm(self):
+        """@brief Create the rpm package from the deb file."""
+        with self._report.phase("rpm"):
+            self._createRpmFromDeb()
+
+    def _createTgz(self):
+        """@brief Create a tgz package from the build folder."""
+        tgzPackage = os.path.join(self._outputFolder, self._getTgzFilename())
+        startTime = time.time()
+        with self._report.phase("tgz"):
+            TgzWriter(self._stager.getEntries()).write(tgzPackage)
+        self._outputFiles.append(tgzPackage)
+        self._uio.info("Created {} in {:.2f} seconds.".format(tgzPackage, time.time() - startTime))
+
+    def _createDelta(self):
+        """@brief Create a delta file holding the changes from the previous deb file to the deb file."""
+        debPackage = os.path.join(self._outputFolder, self._getDebFilename())
+        try:
+            previousVersion = DebReader(self._options.delta_from).getControl().get("Version")
+            deltaFile = DebDelta.getDeltaFilename(debPackage, previousVersion)
+            # The existing file may be linked to a file in the build cache so it must not be written over.
+            if os.path.isfile(deltaFile):
+                os.remove(deltaFile)
+            DebDelta(self._uio).create(self._options.delta_from, debPackage, deltaFile)
+        except DebDeltaError as ex:
+            raise DebBuilderError(str(ex))
+        self._outputFiles.append(deltaFile)
+
+    def _buildPackages(self):
+        """@brief Build the deb package and the rpm and tgz packages if required.
+                  The tgz package is written from the build folder at the same time as the deb
+                  package is built. alien converts the deb file to the rpm package so the rpm
+                  package cannot be started until the deb file is built. It is then built at the
+                  same time as the delta file and the tgz package."""
+        debPackage = os.path.join(self._outputFolder, self._getDebFilename())
+        if self._options.delta_from and os.path.realpath(self._options.delta_from) == os.path.realpath(debPackage):
+            raise DebBuilderError("The previous deb file ({}) would be replaced by the deb file being built.".format(self._options.delta_from))
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futureList = []
+            if self._options.tgz:
+                futureList.append(executor.submit(self._createTgz))
 
+            if self._options.split_deps:
+                with self._report.phase("deps_deb"):
+                    self._buildDepsDeb()
+            with self._report.phase("deb"):
+                self._build()
             if self._options.rpm:
-                os.chdir(DebBuilder.OUTPUT_FOLDER)
-                buildCmd = "sudo alien --to-rpm --scripts %s" % (debFile)
-                self._uio.info("Executing: {}".format(buildCmd))
-                try:
-                    check_call(buildCmd.split())
-                except OSError:
-                    raise DebBuilderError("Failed to build rpm from deb file.")
-                self._uio.info("Created rpm file from deb")
+                futureList.append(executor.submit(self._createRpm))
+            if self._options.delta_from:
+                with self._report.phase("delta"):
+                    self._createDelta()
 
-            if self._options.tgz:
-                buildCmd = "sudo alien --to-tgz --scripts %s" % (debFile)
-                self._uio.info("Executing: {}".format(buildCmd))
-                try:
-                    check_call(buildCmd.split())
-                except OSError:
-                    raise DebBuilderError("Failed to build tgz from deb file.")
-                self._uio.info("Created tgz file from deb")
-
-            os.chdir(cwd)
+            for future in futureList:
+                future.result()
 
     def _addExcludedFolders(self):
-        """@brief Add to the list of excluded folders"""
-        if os.path.isfile(DebBuilder.USER_EXCLUDE_LIST):
-            fd = open(DebBuilder.USER_EXCLUDE_LIST)
+        """@brief Add to the list of excluded folders and load the ignore patterns."""
+        self._excludeFolderList = list(DebBuilder.EXCLUDE_FOLDER_LIST)
+        self._ignoreRules = IgnoreRules.load(self._uio, self._getPath(DebBuilder.IGNORE_FILE))
+        userExcludeList = self._getPath(DebBuilder.USER_EXCLUDE_LIST)
+        if os.path.isfile(userExcludeList):
+            fd = open(userExcludeList)
             lines = fd.readlines()
             fd.close()
             for line in lines:
                 line=line.rstrip("\r\n")
                 #Add top the list of folders to be excluded
-                DebBuilder.EXCLUDE_FOLDER_LIST.append(line)
+                self._excludeFolderList.append(line)
+
+    def _getBuildCache(self):
+        """@brief Get the build cache.
+           @return A BuildCache instance."""
+        return BuildCache(self._uio, self._options.cache_folder, self._options.cache_size * 1024 * 1024)
+
+    def _getBuildDigest(self):
+        """@brief Get the digest of all the inputs to the build.
+           @return The hex digest string."""
+        fileList = [self._getPath(DebBuilder.PIP_FILE),
+                    self._getPath(DebBuilder.PIP_LOCK_FILE),
+                    self._getPath(DebBuilder.CREATE_PIPENV_FILENAME),
+                    self._getPath(DebBuilder.USER_EXCLUDE_LIST),
+                    self._getPath(DebBuilder.IGNORE_FILE),
+                    self._getPath(VenvSlimmer.USER_RULES_FILE)] + self._pythonFiles
+        folderList = [self._getPath(DebBuilder.DEBIAN_FOLDER),
+                      self._getPath(DebBuilder.ROOT_FS_FOLDER),
+                      self._getPath(DebBuilder.INITD_FOLDER)] + self._getPackageFolderList()
+        if self._options.venv:
+            folderList.append(self._getVenvFolder())
+        if self._options.delta_from:
+            fileList.append(self._options.delta_from)
+
+        options = {}
+        for key in getCacheKeyOptions():
+            options[key] = getattr(self._options, key)
+        # The user that ran sudo is placed in the postinst script.
+        if self._options.venv_oip:
+            options["sudo_user"] = os.environ.get('SUDO_USER')
+
+        return self._getBuildCache().getDigest(fileList, folderList, options, self._projectFolder)
+
+    def _restoreFromCache(self, digest):
+        """@brief Restore the packages from the build cache.
+           @param digest The digest of the build inputs.
+           @return True if the packages were restored."""
+        restoredList = self._getBuildCache().restore(digest, self._outputFolder)
+        if restoredList is None:
+            self._uio.info("Build cache miss ({})".format(digest[:12]))
+            return False
+
+        for restoredFile in restoredList:
+            self._uio.info("Build cache hit ({}): restored {}".format(digest[:12], restoredFile))
+        self._outputFiles = restoredList
+        return True
+
+    def _getCopyCounts(self):
+        """@return A tuple containing the number of files and bytes copied into the build folder."""
+        return (self._stager.getFilesCopied() + self._depsStager.getFilesCopied(),
+                self._stager.getBytesCopied() + self._depsStager.getBytesCopied())
+
+    def _getReportFilename(self):
+        """@brief Get the name of the build report file. This sits next to the deb file."""
+        return '{}-{}-{}.build.json'.format(self._packageName, self._version, self._architecture)
+
+    def _writeReport(self):
+        """@brief Write the build report if required."""
+        if not self._options.report and not self._options.report_jsonl:
+            return
+
+        reportFile = None
+        if self._options.report:
+            if not os.path.isdir(self._outputFolder):
+                os.makedirs(self._outputFolder)
+            reportFile = os.path.join(self._outputFolder, self._getReportFilename())
+
+        attrDict = {"package": self._packageName,
+                    "package_version": self._version,
+                    "architecture": self._architecture,
+                    "project_folder": self._projectFolder,
+                    "options": vars(self._options),
+                    "output_files": self._outputFiles}
+        self._report.write(reportFile, attrDict)
+        if reportFile:
+            self._uio.info("Created {}".format(reportFile))
+
+    def _isCompositionEnabled(self):
+        """@return True if the composition of the deb files is reported."""
+        return self._options.composition or self._options.size_budget is not None or self._options.max_growth is not None
+
+    def _writeComposition(self, debFile, stager=None, baselineFile=None):
+        """@brief Show and save the composition report of a deb file and compare it with the report
+                  of an earlier build.
+           @param debFile The deb file.
+           @param stager If not None the Stager instance holding the files in the deb file. If None
+                  the files are read from the deb file.
+           @param baselineFile The composition report to compare with. If None the report saved
+                  by the last build of the deb file is used.
+           @return A list of the size budget errors."""
+        composition = PackageComposition(DebBuilder.TARGET_BIN_FOLDER)
+        if stager:
+            composition.addStagedEntries(stager.getEntries())
+        else:
+            composition.addDeb(debFile)
+        report = composition.getReport(debFile)
+
+        reportFile = os.path.splitext(debFile)[0] + ".composition.json"
+        if baselineFile is None:
+            baselineFile = reportFile
+        baseline = PackageComposition.load(baselineFile)
+        self._uio.info("Composition of {} ({} bytes){}".format(
+            debFile, report["deb_size"], " compared with {}".format(baselineFile) if baseline else ""))
+        for line in PackageComposition.getTableLines(report, baseline):
+            self._uio.info(line)
+
+        errorList = []
+        if self._options.size_budget is not None and report["deb_size"] > self._options.size_budget * 1024 * 1024:
+            errorList.append("{} ({} bytes) is larger than the size budget ({} MB).".format(debFile, report["deb_size"], self._options.size_budget))
+        if self._options.max_growth is not None:
+            if baseline:
+                baselineSize = baseline["total"]["compressed_bytes"]
+                growth = (report["total"]["compressed_bytes"] - baselineSize) * 100.0 / max(baselineSize, 1)
+                if growth > self._options.max_growth:
+                    errorList.append("The estimated compressed size of {} has increased by {:.1f}% (more than {}%).".format(debFile, growth, self._options.max_growth))
+            else:
+                self._uio.info("No composition report found in {} so the growth of {} was not checked (--max_growth).".format(baselineFile, debFile))
+
+        # The report of a deb file that fails the checks must not become the baseline of the next
+        # build or the next build (E.G a CI job run again) would pass.
+        if errorList:
+            reportFile = os.path.splitext(debFile)[0] + ".composition.failed.json"
+        PackageComposition.save(report, reportFile)
+        self._uio.info("Created {}".format(reportFile))
+        return errorList
+
+    def _writeCompositions(self):
+        """@brief Write the composition report of each deb file created by the build if required."""
+        if not self._isCompositionEnabled():
+            return
+        errorList = []
+        for outputFile in self._outputFiles:
+            if not outputFile.endswith(".deb"):
+                continue
+            baselineFile = None
+            if os.path.basename(outputFile) == self._getDebFilename():
+                baselineFile = self._options.composition_baseline
+            errorList += self._writeComposition(outputFile, self._debStagers.get(outputFile), baselineFile)
+        if errorList:
+            raise DebBuilderError(" ".join(errorList))
+
+    def _analyze(self):
+        """@brief Write the composition report of an existing deb file."""
+        errorList = self._writeComposition(self._options.analyze, None, self._options.composition_baseline)
+        if errorList:
+            raise DebBuilderError(" ".join(errorList))
+
+    def getOutputFiles(self):
+        """@return A list of the package files created by the last run."""
+        return self._outputFiles
+
+    def _runBuild(self):
+        """@brief Build the packages. The virtual environment in the venv cache (--venv_cache) used
+                  by the build is released when the build ends."""
+        try:
+            self._runBuildSteps()
+        finally:
+            self._releaseVenv()
+
+    def _releaseVenv(self):
+        """@brief Release the virtual environment in the venv cache used by the build (if any) so
+                  that it may be removed from the cache."""
+        if self._venvCache:
+            self._venvCache.release()
+            self._venvCache = None
+
+    def _runBuildSteps(self):
+        """@brief Run the steps that build the packages."""
+        self._report = BuildReport(self._options.report_jsonl, self._getCopyCounts)
+        self._outputFiles = []
+        self._debStagers = {}
+        self._stageDepsPackage = False
+        # The Pipfile.lock file may have changed since the last build in watch mode.
+        self._venvFolder = None
+        with self._report.phase("prepare"):
+            self._addExcludedFolders()
+            if self._options.check:
+                self._checkPipenvInstalled()
+            self._checkFS()
+            self._loadPackageAttr()
+            if self._options.split_deps:
+                self._loadDepsPackage()
+            self._createLocalRebuildPipenvScript()
+
+        digest = None
+        if self._options.cache:
+            with self._report.phase("cache_restore"):
+                digest = self._getBuildDigest()
+                restored = self._restoreFromCache(digest)
+            if restored:
+                with self._report.phase("composition"):
+                    self._writeCompositions()
+                self._writeReport()
+                return
+
+        # An incremental build updates the build folder left by the last build.
+        if not self._isIncremental():
+            with self._report.phase("clean"):
+                self._clean(False)
+        self._stager.begin()
+        with self._report.phase("copy_files"):
+            self._copyFiles()
+        if self._options.split_deps:
+            with self._report.phase("deps_files"):
+                self._copyDepsFiles()
+        with self._report.phase("startup_files"):
+            self._createStartupFiles()
+        if self._options.compile:
+            with self._report.phase("compile"):
+                self._compilePythonFiles()
+        with self._report.phase("finish_staging"):
+            self._stager.finish()
+            if self._stageDepsPackage:
+                self._depsStager.finish()
+        self._buildPackages()
+        # The staged files are read so this must be done before the build folder is removed.
+        with self._report.phase("composition"):
+            self._writeCompositions()
+
+        if digest:
+            with self._report.phase("cache_store"):
+                self._getBuildCache().store(digest, self._outputFiles)
+
+        if not self._options.lbp and not self._isIncremental():
+            with self._report.phase("clean"):
+                self._clean(False)
+        self._writeReport()
+
+    def _isWatchExcluded(self, relPath, isFolder):
+        """@brief Determine if a path in the project folder is not watched for changes in watch mode.
+           @param relPath The path relative to the project folder.
+           @param isFolder True if the path is a folder.
+           @return True if changes to the path do not change the packages."""
+        nameList = relPath.split(os.sep)
+        if nameList[0] in (DebBuilder.DEBIAN_FOLDER, DebBuilder.ROOT_FS_FOLDER, DebBuilder.INITD_FOLDER):
+            return False
+        # All the files in the project folder are watched as they may be build inputs (E.G Pipfile.lock).
+        if len(nameList) == 1 and not isFolder:
+            return False
+        if nameList[0] in self._excludeFolderList:
+            return True
+        return self._ignoreRules.isIgnored(relPath, isFolder)
+
+    def _isIgnoredPath(self, relPath):
+        """@param relPath The path of a file relative to the project folder.
+           @return True if the file or a folder above it is not placed in the package."""
+        if self._ignoreRules.isIgnored(relPath, False):
+            return True
+        folder = os.path.dirname(relPath)
+        while folder:
+            if self._ignoreRules.isIgnored(folder, True):
+                return True
+            folder = os.path.dirname(folder)
+        return False
+
+    def _getChangedCodeFiles(self, changedList):
+        """@brief Get the staged files that must be updated when the project files change. This is
+                  only possible if the changes are limited to python files and the files in the
+                  package folders.
+           @param changedList A list of the paths (relative to the project folder) that have changed.
+           @return A list of tuples containing the source file, the staged file and True if the
+                   file may be linked (see Stager.copyFile()). If the source file does not
+                   exist the staged file is to be removed. None is returned if the packages must
+                   be built again (E.G the debian control file or the Pipfile.lock file changed)."""
+        packageFolder = self._getPackageFolder()
+        codeFileList = []
+        for relPath in changedList:
+            if relPath == os.curdir:
+                return None
+            srcFile = self._getPath(relPath)
+            nameList = relPath.split(os.sep)
+            if len(nameList) == 1:
+                if relPath in self._stagedFolderNames or os.path.isdir(srcFile):
+                    # A package folder was added or removed.
+                    return None
+                if not relPath.endswith(".py") or relPath == DebBuilder.PIPENV2DEB_PY:
+                    # Build inputs such as the Pipfile.lock file are staged by a full build.
+                    if relPath in (DebBuilder.PIP_FILE,
+                                   DebBuilder.PIP_LOCK_FILE,
+                                   DebBuilder.CREATE_PIPENV_FILENAME,
+                                   DebBuilder.USER_EXCLUDE_LIST,
+                                   DebBuilder.IGNORE_FILE,
+                                   VenvSlimmer.USER_RULES_FILE):
+                        return None
+                    continue
+                if self._ignoreRules.isIgnored(relPath, False):
+                    continue
+                # A startup script is created for each python file so adding or removing one requires a full build.
+                if srcFile not in self._pythonFiles or not os.path.isfile(srcFile):
+                    return None
+                codeFileList.append((srcFile, os.path.join(packageFolder, relPath), False))
+
+            elif nameList[0] in self._zippedFolderNames:
+                # The zip file must be created again.
+                return None
+
+            elif nameList[0] in self._stagedFolderNames:
+                if self._isIgnoredPath(relPath):
+                    continue
+                destFile = os.path.join(packageFolder, relPath)
+                if os.path.isdir(srcFile):
+                    return None
+                # A removed folder must be removed from the package by a full build.
+                if not os.path.isfile(srcFile) and not self._stager.isFile(destFile):
+                    return None
+                codeFileList.append((srcFile, destFile, True))
+
+            elif not self._isWatchExcluded(relPath, os.path.isdir(srcFile)):
+                # The debian, root-fs or init.d folders changed.
+                return None
+
+        return codeFileList
+
+    def _updateCodeFiles(self, codeFileList):
+        """@brief Update the files that have changed in the build folder left by the last build and
+                  build the packages again. The other build steps are not repeated.
+           @param codeFileList The list returned by _getChangedCodeFiles()."""
+        self._report = BuildReport(self._options.report_jsonl, self._getCopyCounts)
+        self._outputFiles = []
+        self._debStagers = {}
+        # The dependencies package is not changed by the python files.
+        self._stageDepsPackage = False
+        # The python interpreter in the venv cache (--venv_cache) may be used to compile the python
+        # files so the virtual environment must be held again (see _watchBuild()).
+        self._venvFolder = None
+        self._stager.resume()
+        with self._report.phase("copy_files"):
+            for srcFile, destFile, allowLink in codeFileList:
+                if os.path.isfile(srcFile):
+                    self._stager.copyFile(srcFile, destFile, allowLink=allowLink)
+                    self._uio.info("Copied {} to {}".format(srcFile, destFile))
+                else:
+                    self._stager.unstageFile(destFile)
+                    self._uio.info("Removed {}".format(destFile))
+        with self._report.phase("startup_files"):
+            # As in a full build the python files that the startup scripts run must be executable.
+            for srcFile, destFile, allowLink in codeFileList:
+                if srcFile in self._pythonFiles:
+                    self._createStartupFilepythonFile(os.path.basename(srcFile))
+        if self._options.compile:
+            with self._report.phase("compile"):
+                self._compilePythonFiles()
+        with self._report.phase("finish_staging"):
+            self._stager.finish()
+        self._buildPackages()
+        with self._report.phase("composition"):
+            self._writeCompositions()
+        self._writeReport()
+
+    def _watchBuild(self, watcher, changedList):
+        """@brief Build the packages in watch mode. Errors are shown rather than ending watch mode.
+           @param watcher The FileWatcher instance.
+           @param changedList A list of the paths (relative to the project folder) that have changed
+                  or None if this is the first build."""
+        startTime = time.time()
+        codeFileList = None
+        try:
+            if changedList is not None and not self._watchFullBuild:
+                codeFileList = self._getChangedCodeFiles(changedList)
+            if codeFileList is None:
+                # If the build fails the state of the build folder is unknown.
+                self._watchFullBuild = True
+                self._runBuild()
+            elif codeFileList:
+                self._updateCodeFiles(codeFileList)
+            else:
+                return
+            self._watchFullBuild = False
+            self._uio.info("Built {} in {:.2f} seconds.".format(", ".join(self._outputFiles), time.time() - startTime))
+
+        except Exception as ex:
+            if self._options.debug:
+                raise
+            self._uio.error(str(ex))
+
+        finally:
+            self._releaseVenv()
+            # The folders that are excluded may have changed.
+            if codeFileList is None:
+                watcher.rescan()
+
+        self._uio.info("Waiting for changes...")
+
+    def _watch(self):
+        """@brief Build the packages and then build them again each time the project files change.
+                  This runs until CTRL C is pressed."""
+        if self._options.stageless:
+            self._memberCache = GzipMemberCache()
+        # The watcher is started first so that changes made during the first build are not missed.
+        watcher = FileWatcher(self._uio, self._projectFolder, self._isWatchExcluded)
+        watcher.start()
+        try:
+            self._watchBuild(watcher, None)
+            while True:
+                changedList = watcher.waitForChanges()
+                self._uio.info("Changed: {}".format(", ".join(changedList)))
+                self._watchBuild(watcher, changedList)
+        finally:
+            watcher.close()
 
     def run(self):
         """@brief Run the build process."""
 
-        self._ensureRootUser()
+        # Reading a deb file does not require root.
+        if not self._options.analyze:
+            self._ensureRootUser()
+        self._checkOptions()
 
-        if self._options.clean:
+        if self._options.analyze:
+
+            self._analyze()
+
+        elif self._options.clean:
 
             self._clean(True)
 
+        elif self._options.watch:
+
+            self._watch()
+
         else:
-            self._addExcludedFolders()
-            if self._options.check:
-                self._checkPipenvInstalled()
-            self._checkFS()
-            self._loadPackageAttr()
-            self._clean(False)
-            self._copyFiles()
-            self._createStartupFiles()
-            self._build()
-            if self._options.rpm or self._options.tgz:
-                self._createPackagesFromDeb()
 
-            if not self._options.lbp:
-                self._clean(False)
+            self._runBuild()
 
+    def build(self):
+        """@brief Build the packages of the project. Unlike run() this does not require root and
+                  does not use the current working directory so several DebBuilder instances
+                  may build different projects in different threads at the same time.
+           @return A list of the package files created."""
+        self._checkOptions()
+        if self._options.clean or self._options.watch or self._options.analyze:
+            raise DebBuilderError("The --clean, --watch and --analyze options cannot be used when building through the python API.")
+        # alien is run using sudo to build the rpm package.
+        if self._options.rpm and not self._isRootUser():
+            raise DebBuilderError("The --rpm option requires root when building through the python API as the rpm package is built by sudo alien.")
+
+        with self._getProjectLock():
+            self._runBuild()
+        return self.getOutputFiles()
 
-def main():
-    uio = UIO()
 
-    opts = OptionParser(usage='usage: %prog [options]\n'
+def _checkPath(option, opt, value):
+    """@brief The value of an option of type path is the path given on the command line."""
+    return value
+
+
+class BuildOption(Option):
+    """@brief A command line option with a cache_key attribute that is True if the option changes
+              the packages built and so is part of the build cache digest. Every option must set
+              cache_key (see getOptionParser()). Options that hold the path of a file or folder
+              have the path type so that they can be made absolute (see getAbsolutePathOptions())."""
+
+    ATTRS = Option.ATTRS + ["cache_key"]
+    TYPES = Option.TYPES + ("path",)
+    TYPE_CHECKER = dict(Option.TYPE_CHECKER, path=_checkPath)
+
+
+def getOptionParser():
+    """@brief Get the command line option parser.
+       @return An OptionParser instance."""
+    opts = OptionParser(option_class=BuildOption,
+                        usage='usage: %prog [options] [project folder ...]\n'
                               '\nBuild deb Linux install packages from a python pipenv environment.\n\n'
                               'This command must be executed in a folder containing.\n'
                               'Pipfile       The pipenv Pilefile (required).\n'
@@ -482,27 +1545,193 @@ def main():
         DebBuilder.OUTPUT_FOLDER)
 
                         )
-    opts.add_option("--debug", help="Enable debugging.", action="store_true", default=False)
+    opts.add_option("--debug", help="Enable debugging.", action="store_true", default=False, cache_key=False)
+    opts.add_option("--verbose", help="Show more detail in the build output. The number of bytes in the files and folders excluded by the ignore patterns is shown (this reads every excluded folder).", action="store_true", default=False, cache_key=False)
     opts.add_option("--venv",
                     help="Include the .venv folder from the output deb file. This increases the size output deb file but ensures the virtual environment is copied rather than rebuilt on the target machine.",
-                    action="store_true", default=False)
+                    action="store_true", default=False, cache_key=True)
     opts.add_option("--clean", help="Remove the %s output folder containing the deb installer files." % (DebBuilder.OUTPUT_FOLDER), action="store_true",
-                    default=False)
+                    default=False, cache_key=False)
     opts.add_option("--lbp",
                     help="Leave build path. A debugging option to allow the 'build' folder to be examined after the build has completed. This 'build' folder is normally removed when the build is complete.",
-                    action="store_true", default=False)
-    opts.add_option("--rpm", help="Produce an RPM installer as well as the debian installer.", action="store_true",
-                    default=False)
-    opts.add_option("--tgz", help="Produce a TGZ installer as well as the debian installer.", action="store_true",
-                    default=False)
-    opts.add_option("--check", help="Perform a 'pipenv check' before building the installer.", action="store_true", default=False)
-    opts.add_option("--venv_oip", help="If this option is used the .venv folder is not placed in the install path. The default is for the .venv foldler to be placed in the install path under /usr/local/bin/<app folder name>. If this option is used then the default pipenv location is used which is typically under ~/.local/share/virtualenvs", action="store_true", default=False)
+                    action="store_true", default=False, cache_key=False)
+    opts.add_option("--rpm", help="Produce an RPM installer as well as the debian installer. The RPM installer is converted from the debian installer by alien so it is started when the debian installer has been built. It is then built at the same time as the TGZ installer and the delta file (--delta_from).", action="store_true",
+                    default=False, cache_key=True)
+    opts.add_option("--tgz", help="Produce a TGZ installer as well as the debian installer. The TGZ installer is written from the staged files at the same time as the debian installer is built.", action="store_true",
+                    default=False, cache_key=True)
+    opts.add_option("--check", help="Perform a 'pipenv check' before building the installer.", action="store_true", default=False, cache_key=False)
+    opts.add_option("--venv_oip", help="If this option is used the .venv folder is not placed in the install path. The default is for the .venv foldler to be placed in the install path under /usr/local/bin/<app folder name>. If this option is used then the default pipenv location is used which is typically under ~/.local/share/virtualenvs", action="store_true", default=False, cache_key=True)
+    opts.add_option("--incremental", help="Keep the 'build' folder between builds and only copy files that have changed since the last build. A manifest of the staged files is kept in the {} folder.".format(DebBuilder.STATE_FOLDER), action="store_true", default=False, cache_key=False)
+    opts.add_option("--compress", help="The compression applied to the deb file payload. This may be gzip, xz, zstd or none optionally followed by :<level> (E.G xz:6). xz and zstd compression use multiple threads (default={}).".format(DebBuilder.DEFAULT_COMPRESSION), default=DebBuilder.DEFAULT_COMPRESSION, cache_key=True)
+    opts.add_option("--threads", help="The number of threads used to compress the deb file payload. 0 = use all CPU cores (default=0).", type="int", default=0, cache_key=False)
+    opts.add_option("--link", help="How the package folders and the .venv folder are placed in the build folder. copy = copy the files, hardlink = hard link the files, reflink = create copy on write clones of the files (btrfs, xfs), auto = reflink if possible, else hard link. Files are copied if they cannot be linked, E.G if the build folder is on a different filesystem (default=copy).", type="choice", choices=Stager.LINK_MODES, default=Stager.LINK_MODE_COPY, cache_key=False)
+    opts.add_option("--stageless", help="Do not create a 'build' folder. The deb file is written straight from the project files without running dpkg-deb.", action="store_true", default=False, cache_key=False)
+    opts.add_option("--fast_launcher", help="Create startup scripts that run the python interpreter in the .venv folder directly rather than using 'pipenv run'. This reduces the start up time of each command. Not used with --venv_oip as the .venv folder is then outside the install path.", action="store_true", default=False, cache_key=True)
+    opts.add_option("--compile", help="Compile the python files in the package (including the .venv folder if --venv is used) so that they are not compiled each time the application starts. The python interpreter in the local .venv folder (or python3 if not present) is used.", action="store_true", default=False, cache_key=True)
+    opts.add_option("--zip_packages", help="Place the package folders that only hold python files in a single {} file (with the bytecode compiled by the python interpreter in the local .venv folder, or python3 if not present) rather than installing each file. The startup scripts add the zip file to the python path so the modules are imported from it. Folders holding other files (E.G data files or native extensions) are installed as files.".format(ZipBundler.ZIP_FILENAME), action="store_true", default=False, cache_key=True)
+    opts.add_option("--wheelhouse", help="Download the wheels for the packages in the Pipfile.lock file when the package is built and include them in the package. When the package is installed the virtual environment is created from these wheels without accessing a package index. Cannot be used with --venv or --venv_oip.", action="store_true", default=False, cache_key=True)
+    opts.add_option("--wheel_platform", help="The pip platform tag of the target machine (E.G manylinux2014_aarch64) that the wheels are downloaded for (--wheelhouse). This option may be used more than once. If not used the wheels are downloaded for the platform of the build machine so the build machine must have the same CPU architecture as the target machine and a C library that is not newer. The wheels are for the python version required by the Pipfile (E.G python_version = \"3.11\").", action="append", default=None, cache_key=True)
+    opts.add_option("--slim", help="Reduce the size of the .venv folder in the package (--venv). Type stubs, docs, pip, python files compiled for other python versions and the test and doc folders at the top of each distribution that are not python packages are not included and the debug symbols are removed from native libraries. Additional gitignore style patterns (relative to the .venv folder) may be added to a {} file, one per line. Patterns starting with ! select files that must be kept.".format(VenvSlimmer.USER_RULES_FILE), action="store_true", default=False, cache_key=True)
+    opts.add_option("--shared_store", help="Create the .venv folder when the package is installed from python packages held in a store ({}) that is shared by all the applications installed by pipenv2deb packages. Each package version is installed in the store once and the .venv folder of each application holds links to the files in the store. Packages that are no longer used are removed from the store when an application is removed. The packages are downloaded from the package index or taken from the package if --wheelhouse is used. Cannot be used with --venv or --venv_oip.".format(SharedStore.DEFAULT_STORE_FOLDER), action="store_true", default=False, cache_key=True)
+    opts.add_option("--split_deps", help="Place the python dependencies (the .venv folder if --venv is used, else the files required to create it) in a separate package named after a digest of the {} file. The application package depends on this package and is much smaller. The dependencies package is only built again (and installed again) when the {} file changes. Cannot be used with --venv_oip, --tgz or --rpm.".format(DebBuilder.PIP_LOCK_FILE, DebBuilder.PIP_LOCK_FILE), action="store_true", default=False, cache_key=True)
+    opts.add_option("--delta_from", help="A previous version of the deb file. A delta file holding the changes from this deb file is created next to the deb file. On the target machine 'python3 -m pipenv2deb.deb_delta <previous deb file> <delta file>' rebuilds the deb file from the previous deb file and the delta file.", type="path", default=None, cache_key=True)
+    opts.add_option("--watch", help="Build the packages and then build them again each time the project files change until CTRL C is pressed. The python files, package folders and the debian, root-fs and init.d folders are watched. When only the python files or the files in the package folders change just these files are staged again. The build folder is kept between builds as with --incremental.", action="store_true", default=False, cache_key=False)
+    opts.add_option("--composition", help="Show the number of files, bytes and estimated compressed bytes in each area of each deb file built (the launchers, the application files, each package folder, each distribution in the .venv folder, init.d and root-fs) and the change since the last build. The report is saved in a .composition.json file next to the deb file.", action="store_true", default=False, cache_key=False)
+    opts.add_option("--composition_baseline", help="The .composition.json file to compare the composition of the deb file with (default=the report saved by the last build).", type="path", default=None, cache_key=False)
+    opts.add_option("--size_budget", help="Fail if a deb file is larger than this number of MB. The composition of the deb file is reported.", type="int", default=None, cache_key=False)
+    opts.add_option("--max_growth", help="Fail if the estimated compressed size of a deb file has increased by more than this percentage since the composition baseline. The composition of the deb file is reported.", type="float", default=None, cache_key=False)
+    opts.add_option("--analyze", help="Report the composition of an existing deb file rather than building a package (see --composition). This does not need to be run as root.", type="path", default=None, cache_key=False)
+    opts.add_option("--report", help="Write a JSON report of the time taken by each phase of the build (wall and CPU time, files and bytes copied and the time taken by external commands) next to the deb file.", action="store_true", default=False, cache_key=False)
+    opts.add_option("--report_jsonl", help="Append a JSON object to this file (one per line) as each phase of the build completes and when the build completes. - = stdout.", type="path", default=None, cache_key=False)
+    opts.add_option("--jobs", help="The number of projects built at the same time when project folders are given on the command line. Each project is built in a separate process and the output of each build is written to {} in the project folder. 0 = the number of CPU cores (default=0).".format(DebBuilder.BATCH_LOG_FILE), type="int", default=0, cache_key=False)
+    opts.add_option("--cache", help="Reuse the packages from an earlier build if none of the build inputs or options have changed. Packages are held in a cache folder under a digest of the build inputs.", action="store_true", default=False, cache_key=False)
+    opts.add_option("--cache_folder", help="The build cache folder (default={}).".format(DebBuilder.DEFAULT_CACHE_FOLDER), type="path", default=DebBuilder.DEFAULT_CACHE_FOLDER, cache_key=False)
+    opts.add_option("--cache_size", help="The maximum size of the packages in the build cache in MB (default=2048). The packages of the least recently used builds are removed when it is larger.", type="int", default=2048, cache_key=False)
+    opts.add_option("--venv_cache", help="Use the .venv folder for the Pipfile.lock file from the {} folder in the build cache folder rather than the local .venv folder. If the cache does not hold it, a virtual environment is created (using python3) and the packages in the Pipfile.lock file are installed into it. The virtual environments are held under a digest of the Pipfile.lock file and the python version. Only used with --venv.".format(VenvCache.VENVS_FOLDER), action="store_true", default=False, cache_key=True)
+    opts.add_option("--venv_cache_size", help="The maximum size of the virtual environments in the venv cache in MB (default=4096). The least recently used virtual environments are removed when it is larger.", type="int", default=4096, cache_key=False)
+
+    # An option that does not say if it changes the packages would be silently added to or left
+    # out of the build cache digest.
+    for option in opts.option_list:
+        if option.dest and option.cache_key is None:
+            raise DebBuilderError("The --{} option does not set cache_key.".format(option.dest))
+
+    return opts
+
+
+def getCacheKeyOptions():
+    """@brief Get the options that change the packages built and so are part of the build cache digest.
+       @return A list of the option names."""
+    return [option.dest for option in getOptionParser().option_list if option.cache_key]
+
+
+def getBuildOptions(**optionDict):
+    """@brief Get the options for a build through the python API.
+       @param optionDict The options that differ from the command line defaults. Each name is
+              the name of a command line option (E.G compress='xz', split_deps=True).
+       @return An options instance."""
+    options = getOptionParser().get_default_values()
+    for name, value in optionDict.items():
+        if not hasattr(options, name):
+            raise DebBuilderError("{} is not a valid build option.".format(name))
+        setattr(options, name, value)
+    return options
+
+
+def getStartupScript(targetPackageFolder, pythonFile, fastLauncher=False, venvOip=False, zipPackages=False):
+    """@brief Get the contents of the startup script for a python file.
+       @param targetPackageFolder The folder the package is installed into.
+       @param pythonFile The python file to startup.
+       @param fastLauncher If True the python interpreter in the .venv folder is run directly (--fast_launcher).
+       @param venvOip If True the .venv folder is outside the install path (--venv_oip).
+       @param zipPackages If True package folders are imported from the zip file in the package folder (--zip_packages).
+       @return The startup script contents."""
+    pipFile = os.path.join(targetPackageFolder, DebBuilder.PIP_FILE)
+    targetStartupFile = os.path.join(targetPackageFolder, pythonFile)
+
+    fileLines = []
+    fileLines.append("#!/bin/sh\n")
+    if zipPackages:
+        # The package folders in the zip file are imported from it.
+        zipFile = os.path.join(targetPackageFolder, ZipBundler.ZIP_FILENAME)
+        fileLines.append("PYTHONPATH={}${{PYTHONPATH:+:$PYTHONPATH}}\n".format(zipFile))
+        fileLines.append("export PYTHONPATH\n")
+    # If the .venv folder is in the install path the python interpreter in it can be run
+    # directly, avoiding the time taken for pipenv to start and read the Pipfile.
+    if fastLauncher and not venvOip:
+        venvPython = os.path.join(targetPackageFolder, DebBuilder.VENV_FOLDER, "bin", "python")
+        fileLines.append('exec {} {} "$@"\n'.format(venvPython, targetStartupFile))
+        return "".join(fileLines)
+
+    execLine = ""
+    #If the user does not want the .venv folder to be outside the install path
+    if not venvOip:
+        execLine = "PIPENV_VENV_IN_PROJECT=enabled " # This tells pipenv that the .venv folder is in the project folder.
+    execLine = "{}{}".format(execLine, "PIPENV_PIPFILE={} pipenv run {} $@\n".format(pipFile, targetStartupFile))
+    fileLines.append(execLine)
+    return "".join(fileLines)
+
+
+def buildPackage(projectFolder, outputFolder=None, options=None, uio=None):
+    """@brief Build the packages of a project without requiring root or changing the current
+              working directory. This is safe to call from several threads at the same time.
+       @param projectFolder The project folder.
+       @param outputFolder The folder to place the packages in. If None the packages folder
+              in the project folder is used.
+       @param options The options instance as returned by getBuildOptions(). If None the
+              default options are used.
+       @param uio A UIO instance. If None messages are printed.
+       @return A list of the package files created."""
+    if not os.path.isdir(projectFolder):
+        raise DebBuilderError("{} project folder not found.".format(projectFolder))
+    if options is None:
+        options = getBuildOptions()
+    if uio is None:
+        uio = UIO()
+    return DebBuilder(uio, options, projectFolder, outputFolder).build()
+
+
+def buildProject(options):
+    """@brief Build the project in the current working directory.
+       @param options The command line options instance.
+       @return A list of the package files created."""
+    debBuilder = DebBuilder(UIO(), options)
+    debBuilder.run()
+    return debBuilder.getOutputFiles()
+
+
+def getAbsolutePathOptions(options):
+    """@brief Get a copy of the options with the relative paths of files and folders changed to
+              absolute paths so that they do not depend on the current working directory.
+       @param options The command line options instance.
+       @return The options instance."""
+    options = copy.copy(options)
+    for option in getOptionParser().option_list:
+        value = getattr(options, option.dest) if option.dest else None
+        # - selects stdout rather than a file (--report_jsonl).
+        if option.type == "path" and value and value != "-":
+            setattr(options, option.dest, os.path.abspath(value))
+    return options
+
+
+def buildProjects(uio, options, projectFolderList):
+    """@brief Build several projects at the same time.
+       @param uio A UIO instance
+       @param options The command line options instance.
+       @param projectFolderList The list of project folders."""
+    for projectFolder in projectFolderList:
+        if not os.path.isdir(projectFolder):
+            raise DebBuilderError("{} project folder not found.".format(projectFolder))
+    if options.watch:
+        raise DebBuilderError("The --watch option cannot be used when project folders are given.")
+    if options.jobs < 0:
+        raise DebBuilderError("The number of jobs cannot be negative.")
+    jobs = options.jobs
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    # Each project is built in its own project folder.
+    options = getAbsolutePathOptions(options)
+    batchBuilder = BatchBuilder(uio, buildProject, options, projectFolderList, jobs, DebBuilder.BATCH_LOG_FILE)
+    resultList = batchBuilder.run()
+    failed = len([result for result in resultList if not result.ok])
+    if failed > 0:
+        raise DebBuilderError("{} of {} projects failed to build.".format(failed, len(resultList)))
+
+
+def main():
+    uio = UIO()
+
+    opts = getOptionParser()
 
     try:
         (options, args) = opts.parse_args()
 
-        debBuilder = DebBuilder(uio, options)
-        debBuilder.run()
+        if args:
+            buildProjects(uio, options, args)
+        else:
+            debBuilder = DebBuilder(uio, options)
+            debBuilder.run()
 
     # If the program throws a system exit exception
     except SystemExit:
@@ -516,6 +1745,8 @@ def main():
 
         else:
             uio.error(str(ex))
+            # A non zero exit status allows CI jobs to fail on errors (E.G a size budget check).
+            sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+
+class ProjectResult(object):
+    """@brief The result of building one project."""
+
+    def __init__(self, projectFolder, ok, duration, outputFiles, error):
+        """@brief Constructor
+           @param projectFolder The project folder.
+           @param ok True if the project was built.
+           @param duration The time taken to build the project in seconds.
+           @param outputFiles A list of the package files created.
+           @param error The error message if the build failed, else None."""
+        self.projectFolder = projectFolder
+        self.ok = ok
+        self.duration = duration
+        self.outputFiles = outputFiles
+        self.error = error
+
+
+def _buildProject(buildFunc, options, projectFolder, logFile):
+    """@brief Build a project in a worker process. The worker changes to the project folder so
+              the build folder and output folder are in the project folder and writes all output
+              (including the output of the commands that are run) to a log file in the project.
+              The working directory and the stdout and stderr file descriptors are restored
+              afterwards as the worker process may build another project.
+       @param buildFunc The function that builds the project in the current working directory.
+              This is called with the options and returns the list of package files created.
+       @param options The command line options instance. Paths in the options must be absolute.
+       @param projectFolder The project folder.
+       @param logFile The log file (relative to the project folder).
+       @return A ProjectResult instance."""
+    startTime = time.time()
+    outputFiles = []
+    error = None
+    cwd = os.getcwd()
+    try:
+        logFile = os.path.join(projectFolder, logFile)
+        logFolder = os.path.dirname(logFile)
+        if not os.path.isdir(logFolder):
+            os.makedirs(logFolder)
+        with open(logFile, 'w') as logFd:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            savedFdList = [os.dup(sys.stdout.fileno()), os.dup(sys.stderr.fileno())]
+            try:
+                # Redirect the file descriptors so that the output of child processes is also logged.
+                os.dup2(logFd.fileno(), sys.stdout.fileno())
+                os.dup2(logFd.fileno(), sys.stderr.fileno())
+                os.chdir(projectFolder)
+                outputFiles = buildFunc(options)
+            except Exception as ex:
+                error = str(ex) or ex.__class__.__name__
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os.dup2(savedFdList[0], sys.stdout.fileno())
+                os.dup2(savedFdList[1], sys.stderr.fileno())
+                for savedFd in savedFdList:
+                    os.close(savedFd)
+                os.chdir(cwd)
+    except OSError as ex:
+        error = str(ex)
+
+    return ProjectResult(projectFolder, error is None, time.time() - startTime, outputFiles, error)
+
+
+class BatchBuilder(object):
+    """@brief Responsible for building several projects at the same time. Each project is built
+              in a separate process in it's own project folder so that each has an isolated
+              build folder."""
+
+    def __init__(self, uio, buildFunc, options, projectFolderList, jobs, logFile):
+        """@brief Constructor
+           @param uio A UIO instance
+           @param buildFunc A module level function that builds the project in the current
+                  working directory. This is called with the options in a worker process and
+                  returns the list of package files created.
+           @param options The command line options instance.
+           @param projectFolderList The list of project folders to build.
+           @param jobs The number of projects to build at the same time.
+           @param logFile The log file that the output of each build is written to (relative
+                  to the project folder)."""
+        self._uio = uio
+        self._buildFunc = buildFunc
+        self._options = options
+        self._projectFolderList = []
+        for projectFolder in projectFolderList:
+            projectFolder = os.path.realpath(projectFolder)
+            if projectFolder not in self._projectFolderList:
+                self._projectFolderList.append(projectFolder)
+        self._jobs = jobs
+        self._logFile = logFile
+
+    def run(self):
+        """@brief Build all the projects.
+           @return A list of ProjectResult instances in the order that the projects were given."""
+        self._uio.info("Building {} projects using {} processes.".format(len(self._projectFolderList), self._jobs))
+        startTime = time.time()
+        futureList = []
+        with ProcessPoolExecutor(max_workers=self._jobs) as executor:
+            for projectFolder in self._projectFolderList:
+                futureList.append(executor.submit(_buildProject, self._buildFunc, self._options, projectFolder, self._logFile))
+
+            resultList = []
+            for future in futureList:
+                result = future.result()
+                status = "built" if result.ok else "failed"
+                self._uio.info("{} {} in {:.2f} seconds.".format(result.projectFolder, status, result.duration))
+                resultList.append(result)
+
+        self._showSummary(resultList, time.time() - startTime)
+        return resultList
+
+    def _showSummary(self, resultList, duration):
+        """@brief Show a table of the build time and status of each project.
+           @param resultList A list of ProjectResult instances.
+           @param duration The total time taken in seconds."""
+        rowList = [("PROJECT", "STATUS", "SECONDS", "DETAIL")]
+        for result in resultList:
+            if result.ok:
+                detail = ", ".join(os.path.basename(outputFile) for outputFile in result.outputFiles)
+            else:
+                detail = "{} (see {})".format(result.error, os.path.join(result.projectFolder, self._logFile))
+            rowList.append((result.projectFolder,
+                            "OK" if result.ok else "FAILED",
+                            "{:.2f}".format(result.duration),
+                            detail))
+
+        widthList = [max(len(row[col]) for row in rowList) for col in range(3)]
+        for row in rowList:
+            self._uio.info("{:<{}}  {:<{}}  {:>{}}  {}".format(row[0], widthList[0], row[1], widthList[1], row[2], widthList[2], row[3]))
+
+        failed = len([result for result in resultList if not result.ok])
+        self._uio.info("{} projects built, {} failed in {:.2f} seconds.".format(len(resultList) - failed, failed, duration))
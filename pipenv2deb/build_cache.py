@@ -0,0 +1,205 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+from importlib import metadata
+
+from pipenv2deb.stager import fileSHA256
+
+
+class BuildCache(object):
+    """@brief Responsible for caching the packages produced by a build.
+              Packages are stored under a digest of all the build inputs (files and options)
+              so that a build whose inputs have not changed can reuse the packages of an
+              earlier build rather than building them again. The packages of the least recently
+              used builds are removed when the cache is larger than it's maximum size."""
+
+    CACHE_FORMAT = "pipenv2deb-build-cache-2"
+    BUILDS_FOLDER = "builds"
+    OUTPUTS_FILE = "outputs.json"
+    TMP_EXTENSION = ".tmp"
+    # The version returned by getToolVersion() (the pipenv2deb files do not change while it runs).
+    _toolVersion = None
+
+    def __init__(self, uio, cacheFolder, maxSize):
+        """@brief Constructor
+           @param uio A UIO instance
+           @param cacheFolder The folder that holds the cache.
+           @param maxSize The maximum size of the packages in the cache in bytes."""
+        self._uio = uio
+        self._buildsFolder = os.path.join(cacheFolder, BuildCache.BUILDS_FOLDER)
+        self._maxSize = maxSize
+
+    @staticmethod
+    def getToolVersion():
+        """@brief Get the version of pipenv2deb. This holds the version of the installed distribution
+                  (if installed) and a digest of the python files in the pipenv2deb package so that
+                  it changes when pipenv2deb is upgraded or run from a changed source folder.
+           @return The version string."""
+        if BuildCache._toolVersion is None:
+            try:
+                version = metadata.version("pipenv2deb")
+            except metadata.PackageNotFoundError:
+                version = "unknown"
+            sha256 = hashlib.sha256()
+            packageFolder = os.path.dirname(os.path.abspath(__file__))
+            for filename in sorted(os.listdir(packageFolder)):
+                if filename.endswith(".py"):
+                    sha256.update("\0{}\0{}".format(filename, fileSHA256(os.path.join(packageFolder, filename))).encode())
+            BuildCache._toolVersion = "{}-{}".format(version, sha256.hexdigest())
+        return BuildCache._toolVersion
+
+    def _getInputEntries(self, fileList, folderList, baseFolder=None):
+        """@brief Get all the files that make up the build inputs.
+           @param fileList A list of files. Files that do not exist are ignored.
+           @param folderList A list of folders. All files in each folder are included.
+                  Folders that do not exist are ignored.
+           @param baseFolder The folder that the names are relative to. If None the cwd is used.
+           @return A sorted list of (name, path) tuples. The name is the path relative to the baseFolder."""
+        entryList = []
+        for _file in fileList:
+            if os.path.isfile(_file):
+                entryList.append((os.path.relpath(_file, baseFolder), _file))
+
+        for folder in folderList:
+            if not os.path.isdir(folder):
+                continue
+            for root, dirs, files in os.walk(folder, followlinks=True):
+                for _file in files:
+                    _file = os.path.join(root, _file)
+                    entryList.append((os.path.relpath(_file, baseFolder), _file))
+
+        entryList.sort()
+        return entryList
+
+    def getDigest(self, fileList, folderList, options, baseFolder=None):
+        """@brief Get the digest of the build inputs.
+           @param fileList A list of input files.
+           @param folderList A list of input folders.
+           @param options A dict of the build options that affect the output packages.
+           @param baseFolder The project folder. Input files are named relative to this folder
+                  so that the digest does not depend on where the project is. If None the cwd is used.
+           @return The hex digest string."""
+        sha256 = hashlib.sha256()
+        sha256.update(BuildCache.CACHE_FORMAT.encode())
+        # A different version of pipenv2deb may build different packages from the same inputs.
+        sha256.update(BuildCache.getToolVersion().encode())
+        sha256.update(json.dumps(options, sort_keys=True).encode())
+        for name, path in self._getInputEntries(fileList, folderList, baseFolder):
+            # The executable bit of a file may be carried into the package.
+            executable = os.access(path, os.X_OK)
+            sha256.update("\0{}\0{}\0{}".format(name, executable, fileSHA256(path)).encode())
+        return sha256.hexdigest()
+
+    def restore(self, digest, outputFolder):
+        """@brief Copy the packages for a digest from the cache.
+           @param digest The digest of the build inputs.
+           @param outputFolder The folder to place the packages in.
+           @return A list of the restored package files or None if the cache does not hold
+                   the packages for the digest."""
+        entryFolder = os.path.join(self._buildsFolder, digest)
+        outputsFile = os.path.join(entryFolder, BuildCache.OUTPUTS_FILE)
+        if not os.path.isfile(outputsFile):
+            return None
+
+        with open(outputsFile) as fd:
+            outputList = json.load(fd)
+
+        for filename in outputList:
+            if not os.path.isfile(os.path.join(entryFolder, filename)):
+                return None
+
+        if not os.path.isdir(outputFolder):
+            os.makedirs(outputFolder)
+
+        restoredList = []
+        try:
+            for filename in outputList:
+                destFile = os.path.join(outputFolder, filename)
+                self._linkOrCopy(os.path.join(entryFolder, filename), destFile)
+                restoredList.append(destFile)
+            # The modification time of the outputs file records when the entry was last used.
+            os.utime(outputsFile)
+        except FileNotFoundError:
+            # The entry was removed by another build (see _evict()).
+            return None
+        return restoredList
+
+    def store(self, digest, packageFileList):
+        """@brief Add the packages produced by a build to the cache.
+           @param digest The digest of the build inputs.
+           @param packageFileList A list of the package files produced by the build.
+           @return None"""
+        entryFolder = os.path.join(self._buildsFolder, digest)
+        tmpFolder = "{}{}{}.{}".format(entryFolder, BuildCache.TMP_EXTENSION, os.getpid(), threading.get_ident())
+        if os.path.isdir(tmpFolder):
+            shutil.rmtree(tmpFolder)
+        os.makedirs(tmpFolder)
+
+        outputList = []
+        for packageFile in packageFileList:
+            filename = os.path.basename(packageFile)
+            # Copy rather than link so that a later build writing to the output folder
+            # cannot change the cached file.
+            shutil.copy2(packageFile, os.path.join(tmpFolder, filename))
+            outputList.append(filename)
+
+        with open(os.path.join(tmpFolder, BuildCache.OUTPUTS_FILE), 'w') as fd:
+            json.dump(outputList, fd)
+
+        # Replace any previous (possibly incomplete) entry in one step.
+        if os.path.isdir(entryFolder):
+            shutil.rmtree(entryFolder)
+        os.rename(tmpFolder, entryFolder)
+        self._uio.info("Stored {} package file/s in the build cache ({})".format(len(outputList), digest[:12]))
+        self._evict(digest)
+
+    def getEntries(self):
+        """@brief Get the builds in the cache.
+           @return A list of (last used time, size, digest) tuples sorted with the least recently used first."""
+        entryList = []
+        if not os.path.isdir(self._buildsFolder):
+            return entryList
+        for digest in os.listdir(self._buildsFolder):
+            entryFolder = os.path.join(self._buildsFolder, digest)
+            # Entries that are being stored are not complete.
+            if BuildCache.TMP_EXTENSION in digest:
+                continue
+            try:
+                lastUsed = os.stat(os.path.join(entryFolder, BuildCache.OUTPUTS_FILE)).st_mtime
+                size = sum([os.path.getsize(os.path.join(entryFolder, filename)) for filename in os.listdir(entryFolder)])
+            except OSError:
+                continue
+            entryList.append((lastUsed, size, digest))
+        entryList.sort()
+        return entryList
+
+    def _evict(self, keepDigest):
+        """@brief Remove the least recently used builds until the cache is no larger than it's
+                  maximum size. A build that is removed while its packages are restored is a
+                  cache miss (see restore()).
+           @param keepDigest The digest of the build just stored. This is never removed."""
+        entryList = self.getEntries()
+        totalSize = sum([size for _, size, _ in entryList])
+        for _, size, digest in entryList:
+            if totalSize <= self._maxSize:
+                break
+            if digest == keepDigest:
+                continue
+            shutil.rmtree(os.path.join(self._buildsFolder, digest), ignore_errors=True)
+            totalSize -= size
+            self._uio.info("Removed the least recently used build ({}, {} bytes) from the build cache.".format(digest[:12], size))
+
+    def _linkOrCopy(self, srcFile, destFile):
+        """@brief Hard link a file if possible, else copy it. Builds remove an existing
+                  package file before writing it so a linked file in the output folder
+                  is never written through to the cache.
+           @param srcFile The source file.
+           @param destFile The destination file. This is replaced if it exists."""
+        if os.path.lexists(destFile):
+            os.remove(destFile)
+        try:
+            os.link(srcFile, destFile)
+        except OSError:
+            shutil.copy2(srcFile, destFile)
@@ -0,0 +1,132 @@
+import json
+import time
+import resource
+import threading
+from contextlib import contextmanager
+
+
+class BuildReport(object):
+    """@brief Responsible for recording the time taken by each phase of a build along with the
+              CPU time used, the files and bytes copied and the time spent running external
+              commands (dpkg-deb, alien, pipenv etc). Phases may run at the same time (E.G the
+              tgz file is written while the deb file is built) so the start time of each phase
+              is recorded. The CPU time of a phase includes that used by other threads and by
+              the commands that completed during the phase."""
+
+    VERSION = 1
+
+    def __init__(self, jsonLinesFile=None, counterFunc=None):
+        """@brief Constructor
+           @param jsonLinesFile If not None a file that a JSON object is appended to (one per line)
+                  as each phase completes and when the build completes. If - then the lines are
+                  written to stdout.
+           @param counterFunc If not None a function that returns a tuple containing the number of
+                  files and bytes copied so far. This is called at the start and end of each phase."""
+        self._jsonLinesFile = jsonLinesFile
+        self._counterFunc = counterFunc
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._startTime = time.time()
+        self._startCounter = time.perf_counter()
+        self._phaseList = []
+        self._commandTimes = {}
+
+    def _getCPUTime(self):
+        """@return The CPU time used by this process and the child processes that have completed in seconds."""
+        cpuTime = 0.0
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+            usage = resource.getrusage(who)
+            cpuTime += usage.ru_utime + usage.ru_stime
+        return cpuTime
+
+    def _getCounts(self):
+        """@return A tuple containing the number of files and bytes copied so far."""
+        if self._counterFunc:
+            return self._counterFunc()
+        return (0, 0)
+
+    def _emit(self, record):
+        """@brief Write a record to the JSON lines file if required.
+           @param record The dict to write."""
+        if not self._jsonLinesFile:
+            return
+        line = json.dumps(record, sort_keys=True)
+        if self._jsonLinesFile == "-":
+            print(line, flush=True)
+        else:
+            with open(self._jsonLinesFile, 'a') as fd:
+                fd.write(line + "\n")
+
+    @contextmanager
+    def phase(self, name):
+        """@brief A context manager that records a build phase.
+           @param name The name of the phase."""
+        phase = {"name": name,
+                 "start": time.perf_counter() - self._startCounter,
+                 "subprocess_time": 0.0,
+                 "status": "ok"}
+        startCounter = time.perf_counter()
+        startCPUTime = self._getCPUTime()
+        startFiles, startBytes = self._getCounts()
+        previousPhase = getattr(self._local, "phase", None)
+        self._local.phase = phase
+        try:
+            yield
+        except BaseException:
+            phase["status"] = "failed"
+            raise
+        finally:
+            self._local.phase = previousPhase
+            endFiles, endBytes = self._getCounts()
+            phase["wall_time"] = time.perf_counter() - startCounter
+            phase["cpu_time"] = self._getCPUTime() - startCPUTime
+            phase["files_copied"] = endFiles - startFiles
+            phase["bytes_copied"] = endBytes - startBytes
+            with self._lock:
+                self._phaseList.append(phase)
+            record = dict(phase)
+            record["event"] = "phase"
+            self._emit(record)
+
+    @contextmanager
+    def command(self, name):
+        """@brief A context manager that records the time taken to run an external command.
+                  The time is added to the current phase and to the total for the command.
+           @param name The name of the command (E.G dpkg-deb)."""
+        startCounter = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - startCounter
+            phase = getattr(self._local, "phase", None)
+            if phase is not None:
+                phase["subprocess_time"] += duration
+            with self._lock:
+                self._commandTimes[name] = self._commandTimes.get(name, 0.0) + duration
+
+    def getReport(self, attrDict=None):
+        """@brief Get the report.
+           @param attrDict A dict of extra attributes (E.G the package name) to include.
+           @return The report as a dict."""
+        with self._lock:
+            phaseList = sorted(self._phaseList, key=lambda phase: phase["start"])
+            report = {"version": BuildReport.VERSION,
+                      "start_time": self._startTime,
+                      "wall_time": time.perf_counter() - self._startCounter,
+                      "phases": phaseList,
+                      "subprocess_times": dict(self._commandTimes)}
+        if attrDict:
+            report.update(attrDict)
+        return report
+
+    def write(self, reportFile, attrDict=None):
+        """@brief Write the report to a JSON file and append the build record to the JSON lines file.
+           @param reportFile The file to write or None if only the JSON lines file is required.
+           @param attrDict A dict of extra attributes (E.G the package name) to include."""
+        report = self.getReport(attrDict)
+        if reportFile:
+            with open(reportFile, 'w') as fd:
+                json.dump(report, fd, indent=2, sort_keys=True)
+        record = dict(report)
+        record["event"] = "build"
+        self._emit(record)
@@ -0,0 +1,223 @@
+import os
+import csv
+import json
+import zlib
+
+from pipenv2deb.stager import StageEntry
+from pipenv2deb.deb_delta import DebReader
+
+
+class PackageComposition(object):
+    """@brief Responsible for breaking down the files in a package by area (the launchers, the
+              application files, each package folder, each distribution in the .venv
+              site-packages folder, init.d and root-fs) so that the areas that make a package
+              large can be seen. The files are read from the staged entries of a build or from
+              an existing deb file. The compressed size of each file is estimated by compressing
+              it on it's own with zlib."""
+
+    VERSION = 1
+    PACKAGE_FOLDER_EXTENSIONS = (".pipenvpkg", ".pipenvdeps")
+    VENV_FOLDER = ".venv"
+    SITE_PACKAGES = "site-packages"
+    PYCACHE_FOLDER = "__pycache__"
+    DIST_INFO_EXTENSION = ".dist-info"
+    RECORD_FILE = "RECORD"
+    DEBIAN_FOLDER = "DEBIAN"
+    INITD_FOLDER = os.path.join("etc", "init.d")
+    COMPRESS_LEVEL = 6
+    LAUNCHERS_AREA = "launchers"
+    APP_AREA = "app files"
+    VENV_AREA_PREFIX = "venv/"
+    VENV_OTHER_AREA = "venv (other)"
+    PACKAGE_AREA_PREFIX = "package/"
+    INITD_AREA = "init.d"
+    ROOT_FS_AREA = "root-fs"
+    TOTAL_NAME = "total"
+
+    def __init__(self, targetBinFolder):
+        """@brief Constructor
+           @param targetBinFolder The folder that the launchers and package folders are installed into (E.G /usr/local/bin)."""
+        self._binNameList = targetBinFolder.strip("/").split("/")
+        # A list of (path, size, estimated compressed size) tuples.
+        self._fileList = []
+        # The contents of the RECORD file in each dist-info folder keyed by the dist-info folder.
+        self._recordDict = {}
+
+    def addFile(self, path, data):
+        """@brief Add a file in the package.
+           @param path The path of the file relative to the root of the package.
+           @param data The contents of the file (bytes)."""
+        path = os.path.normpath(path)
+        if path.split(os.sep)[0] == PackageComposition.DEBIAN_FOLDER:
+            # The control files are not installed.
+            return
+        compressedSize = len(zlib.compress(data, PackageComposition.COMPRESS_LEVEL))
+        self._fileList.append((path, len(data), compressedSize))
+        folder = os.path.dirname(path)
+        if os.path.basename(path) == PackageComposition.RECORD_FILE and folder.endswith(PackageComposition.DIST_INFO_EXTENSION):
+            self._recordDict[folder] = data
+
+    def addStagedEntries(self, entryList):
+        """@brief Add the files staged by a build.
+           @param entryList A list of StageEntry instances (see Stager.getEntries())."""
+        for entry in entryList:
+            if entry.entryType == StageEntry.FILE:
+                self.addFile(entry.path, entry.read())
+
+    def addDeb(self, debFile):
+        """@brief Add the files in a deb file.
+           @param debFile The deb file."""
+        with DebReader(debFile).openDataTar() as tar:
+            for member in tar:
+                if member.isfile():
+                    self.addFile(member.name, tar.extractfile(member).read())
+
+    def _getDistributions(self):
+        """@brief Get the distribution that installed each file in the site-packages folders from
+                  the RECORD file in each dist-info folder.
+           @return A tuple containing a dict of distribution names keyed by file path and a dict
+                   of distribution names keyed by the path of each top level entry in a
+                   site-packages folder."""
+        fileDict = {}
+        topLevelDict = {}
+        for distInfoFolder, data in self._recordDict.items():
+            # E.G six-1.16.0.dist-info
+            distName = os.path.basename(distInfoFolder).split("-")[0]
+            sitePackagesFolder = os.path.dirname(distInfoFolder)
+            for row in csv.reader(data.decode(errors="replace").splitlines()):
+                if not row:
+                    continue
+                path = os.path.normpath(os.path.join(sitePackagesFolder, row[0]))
+                fileDict[path] = distName
+                relPath = os.path.relpath(path, sitePackagesFolder)
+                if not relPath.startswith(os.pardir):
+                    topLevelDict[os.path.join(sitePackagesFolder, relPath.split(os.sep)[0])] = distName
+        return fileDict, topLevelDict
+
+    def _getVenvArea(self, path, fileDict, topLevelDict):
+        """@param path The path of a file in a .venv folder that is not in a RECORD file.
+           @param fileDict The distribution names keyed by file path.
+           @param topLevelDict The distribution names keyed by top level site-packages entry.
+           @return The area name."""
+        nameList = path.split(os.sep)
+        if PackageComposition.SITE_PACKAGES not in nameList[:-1]:
+            return PackageComposition.VENV_OTHER_AREA
+        # Bytecode compiled by the build (--compile) is not in the RECORD file.
+        if nameList[-2] == PackageComposition.PYCACHE_FOLDER:
+            sourceFile = os.path.join(os.path.dirname(os.path.dirname(path)), "{}.py".format(nameList[-1].split(".")[0]))
+            if sourceFile in fileDict:
+                return PackageComposition.VENV_AREA_PREFIX + fileDict[sourceFile]
+        index = nameList.index(PackageComposition.SITE_PACKAGES) + 1
+        topLevelPath = os.sep.join(nameList[:index + 1])
+        if topLevelPath in topLevelDict:
+            return PackageComposition.VENV_AREA_PREFIX + topLevelDict[topLevelPath]
+        # E.G a package installed without a dist-info folder.
+        name = nameList[index]
+        if name.endswith(PackageComposition.DIST_INFO_EXTENSION):
+            name = name.split("-")[0]
+        elif name.endswith(".py"):
+            name = name[:-3]
+        return PackageComposition.VENV_AREA_PREFIX + name
+
+    def _getArea(self, path, fileDict, topLevelDict):
+        """@param path The path of a file relative to the root of the package.
+           @param fileDict The distribution names keyed by file path.
+           @param topLevelDict The distribution names keyed by top level site-packages entry.
+           @return The name of the area that holds the file."""
+        if path in fileDict:
+            return PackageComposition.VENV_AREA_PREFIX + fileDict[path]
+        nameList = path.split(os.sep)
+        binCount = len(self._binNameList)
+        if nameList[:binCount] == self._binNameList and len(nameList) > binCount:
+            nameList = nameList[binCount:]
+            if len(nameList) == 1:
+                return PackageComposition.LAUNCHERS_AREA
+            if nameList[0].endswith(PackageComposition.PACKAGE_FOLDER_EXTENSIONS):
+                if len(nameList) == 2:
+                    return PackageComposition.APP_AREA
+                if nameList[1] == PackageComposition.VENV_FOLDER:
+                    return self._getVenvArea(path, fileDict, topLevelDict)
+                return PackageComposition.PACKAGE_AREA_PREFIX + nameList[1]
+        if path.startswith(PackageComposition.INITD_FOLDER + os.sep):
+            return PackageComposition.INITD_AREA
+        return PackageComposition.ROOT_FS_AREA
+
+    def getReport(self, debFile):
+        """@brief Get the composition report.
+           @param debFile The deb file that holds the files.
+           @return A dict holding the deb file name and size, the totals and the totals of each area."""
+        fileDict, topLevelDict = self._getDistributions()
+        areaDict = {}
+        total = {"files": 0, "bytes": 0, "compressed_bytes": 0}
+        for path, size, compressedSize in self._fileList:
+            area = self._getArea(path, fileDict, topLevelDict)
+            areaTotal = areaDict.setdefault(area, {"files": 0, "bytes": 0, "compressed_bytes": 0})
+            for _total in (areaTotal, total):
+                _total["files"] += 1
+                _total["bytes"] += size
+                _total["compressed_bytes"] += compressedSize
+        return {"version": PackageComposition.VERSION,
+                "deb_file": os.path.basename(debFile),
+                "deb_size": os.path.getsize(debFile),
+                "total": total,
+                "areas": areaDict}
+
+    @staticmethod
+    def load(reportFile):
+        """@brief Load a composition report.
+           @param reportFile The JSON file written by save().
+           @return The report dict or None if the file does not exist or is not valid."""
+        try:
+            with open(reportFile) as fd:
+                report = json.load(fd)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(report, dict) or report.get("version") != PackageComposition.VERSION:
+            return None
+        return report
+
+    @staticmethod
+    def save(report, reportFile):
+        """@brief Save a composition report.
+           @param report The dict returned by getReport().
+           @param reportFile The JSON file to write."""
+        with open(reportFile, 'w') as fd:
+            json.dump(report, fd, indent=2, sort_keys=True)
+
+    @staticmethod
+    def _formatChange(value, baselineValue):
+        """@return The change from the baseline value with a + or - sign."""
+        return "{:+d}".format(value - baselineValue)
+
+    @staticmethod
+    def getTableLines(report, baseline=None):
+        """@brief Get the composition report as a table. The areas are sorted by their estimated
+                  compressed size (largest first).
+           @param report The dict returned by getReport().
+           @param baseline If not None the report of an earlier build. The change in each
+                  value is shown and areas that are no longer in the package are included.
+           @return A list of lines."""
+        empty = {"files": 0, "bytes": 0, "compressed_bytes": 0}
+        areaDict = report["areas"]
+        baselineDict = {}
+        if baseline:
+            baselineDict = baseline["areas"]
+        nameList = sorted(set(areaDict) | set(baselineDict),
+                          key=lambda name: (-areaDict.get(name, empty)["compressed_bytes"], name))
+        rowList = [(name, areaDict.get(name, empty), baselineDict.get(name, empty)) for name in nameList]
+        rowList.append((PackageComposition.TOTAL_NAME, report["total"], baseline["total"] if baseline else empty))
+
+        nameWidth = max([len(name) for name, _, _ in rowList] + [len("Area")])
+        header = "{:<{}} {:>8} {:>12} {:>12}".format("Area", nameWidth, "Files", "Bytes", "Est. gz")
+        if baseline:
+            header = "{} {:>8} {:>12} {:>12}".format(header, "+Files", "+Bytes", "+Est. gz")
+        lines = [header]
+        for name, values, baselineValues in rowList:
+            line = "{:<{}} {:>8} {:>12} {:>12}".format(name, nameWidth, values["files"], values["bytes"], values["compressed_bytes"])
+            if baseline:
+                line = "{} {:>8} {:>12} {:>12}".format(line,
+                                                       PackageComposition._formatChange(values["files"], baselineValues["files"]),
+                                                       PackageComposition._formatChange(values["bytes"], baselineValues["bytes"]),
+                                                       PackageComposition._formatChange(values["compressed_bytes"], baselineValues["compressed_bytes"]))
+            lines.append(line)
+        return lines
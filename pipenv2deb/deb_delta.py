@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+
+import os
+import io
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import tarfile
+import tempfile
+import subprocess
+import threading
+from contextlib import contextmanager
+from optparse import OptionParser
+
+from pipenv2deb.stager import StageEntry, fileSHA256
+from pipenv2deb.deb_writer import DebWriter
+
+
+class DebDeltaError(Exception):
+    pass
+
+
+class ArMemberFile(object):
+    """@brief A read only file object that reads one member of an ar (deb) file."""
+
+    def __init__(self, fd, offset, size):
+        """@brief Constructor
+           @param fd The open deb file.
+           @param offset The offset of the member data in the deb file.
+           @param size The size of the member data in bytes."""
+        self._fd = fd
+        self._fd.seek(offset)
+        self._remaining = size
+
+    def read(self, size=-1):
+        """@brief Read from the member.
+           @param size The maximum number of bytes to read or -1 to read to the end of the member.
+           @return The bytes read."""
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._fd.read(size)
+        self._remaining -= len(data)
+        return data
+
+
+class DebReader(object):
+    """@brief Responsible for reading the control file and the data archive of a deb file."""
+
+    COMPRESSIONS = {".gz": "gzip", ".xz": "xz", ".zst": "zstd", "": "none"}
+
+    def __init__(self, debFile):
+        """@brief Constructor
+           @param debFile The deb file."""
+        self._debFile = debFile
+        self._memberList = self._readMembers()
+
+    def _readMembers(self):
+        """@brief Read the member headers of the deb (ar) file.
+           @return A list of tuples containing the name, offset and size of each member."""
+        memberList = []
+        with open(self._debFile, 'rb') as fd:
+            if fd.read(len(DebWriter.AR_MAGIC)) != DebWriter.AR_MAGIC:
+                raise DebDeltaError("{} is not a deb file.".format(self._debFile))
+            while True:
+                header = fd.read(DebWriter.AR_HEADER_SIZE)
+                if len(header) < DebWriter.AR_HEADER_SIZE:
+                    break
+                name = header[0:16].decode().strip().rstrip("/")
+                size = int(header[48:58].decode().strip())
+                memberList.append((name, fd.tell(), size))
+                fd.seek(size + size % 2, os.SEEK_CUR)
+        return memberList
+
+    def _getMember(self, prefix):
+        """@param prefix The start of the member name (E.G control.tar).
+           @return A tuple containing the name, offset and size of the member."""
+        for member in self._memberList:
+            if member[0].startswith(prefix):
+                return member
+        raise DebDeltaError("{} has no {} member.".format(self._debFile, prefix))
+
+    def getCompression(self, member):
+        """@param member A member name (E.G data.tar.xz).
+           @return The compression type (gzip, xz, zstd or none) of the member."""
+        extension = member.split(".tar", 1)[1]
+        if extension not in DebReader.COMPRESSIONS:
+            raise DebDeltaError("{} in {} uses an unsupported compression type.".format(member, self._debFile))
+        return DebReader.COMPRESSIONS[extension]
+
+    def readControlMember(self):
+        """@return A tuple containing the name and contents (bytes) of the control archive member."""
+        name, offset, size = self._getMember("control.tar")
+        with open(self._debFile, 'rb') as fd:
+            return (name, ArMemberFile(fd, offset, size).read())
+
+    def getDataMemberName(self):
+        """@return The name of the data archive member (E.G data.tar.xz)."""
+        return self._getMember("data.tar")[0]
+
+    def getControl(self):
+        """@return A dict of the fields in the control file."""
+        name, data = self.readControlMember()
+        if self.getCompression(name) == "zstd":
+            data = subprocess.run(["zstd", "-q", "-d", "-c"], input=data, stdout=subprocess.PIPE, check=True).stdout
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as tar:
+            for member in tar.getmembers():
+                if os.path.normpath(member.name) == "control":
+                    content = tar.extractfile(member).read().decode()
+                    break
+            else:
+                raise DebDeltaError("No control file in {}.".format(self._debFile))
+
+        fieldDict = {}
+        for line in content.splitlines():
+            if ":" in line and not line.startswith((" ", "\t")):
+                key, value = line.split(":", 1)
+                fieldDict[key.strip()] = value.strip()
+        return fieldDict
+
+    @contextmanager
+    def openDataTar(self):
+        """@brief A context manager that opens the data archive to be read as a stream.
+           @return A tarfile.TarFile instance."""
+        name, offset, size = self._getMember("data.tar")
+        with open(self._debFile, 'rb') as fd:
+            memberFile = ArMemberFile(fd, offset, size)
+            compression = self.getCompression(name)
+            if compression == "gzip":
+                # A deb file written with a GzipMemberCache (--stageless --watch) holds several gzip
+                # members. tarfile only reads the first member of a gzip stream but GzipFile reads them all.
+                with gzip.GzipFile(fileobj=memberFile, mode='rb') as gzipFd, tarfile.open(fileobj=gzipFd, mode="r|") as tar:
+                    yield tar
+                return
+            if compression != "zstd":
+                with tarfile.open(fileobj=memberFile, mode="r|*") as tar:
+                    yield tar
+                return
+
+            # python cannot decompress zstd so the member is decompressed by the zstd command.
+            with tempfile.TemporaryFile() as tmpFd:
+                shutil.copyfileobj(memberFile, tmpFd)
+                tmpFd.seek(0)
+                proc = subprocess.Popen(["zstd", "-q", "-d", "-c"], stdin=tmpFd, stdout=subprocess.PIPE)
+                try:
+                    # A truncated archive (E.G if zstd fails) raises a tarfile.ReadError.
+                    with tarfile.open(fileobj=proc.stdout, mode="r|") as tar:
+                        yield tar
+                finally:
+                    proc.stdout.close()
+                    proc.wait()
+
+
+class DebDelta(object):
+    """@brief Responsible for creating a delta file holding the differences between two versions
+              of a deb file and for rebuilding the new deb file from the previous deb file and
+              the delta file. The delta file holds the control archive of the new deb file, the
+              contents of the files that are not in the previous deb file and a list of all the
+              files in the new deb file. Files that are in the previous deb file (at any path) are
+              referenced by their SHA256 digest. The rebuilt deb file installs the same files as
+              the new deb file (each file is checked against its digest) but it is not byte for
+              byte the same as the deb file archives are compressed again."""
+
+    FORMAT_VERSION = 1
+    METADATA_FILE = "delta.json"
+    CONTROL_FOLDER = "control"
+    FILES_FOLDER = "files"
+    EXTENSION = ".delta"
+    BLOCK_SIZE = 1024*1024
+
+    def __init__(self, uio):
+        """@brief Constructor
+           @param uio A UIO instance"""
+        self._uio = uio
+
+    @staticmethod
+    def getDeltaFilename(newDeb, previousVersion):
+        """@param newDeb The new deb file.
+           @param previousVersion The version of the previous deb file.
+           @return The name of the delta file that holds the changes from the previous version."""
+        base = newDeb[:-len(".deb")] if newDeb.endswith(".deb") else newDeb
+        return "{}.from-{}{}".format(base, previousVersion, DebDelta.EXTENSION)
+
+    @staticmethod
+    def getNewDebFilename(deltaFile):
+        """@brief Get the name of the deb file that a delta file rebuilds. Only the name of the
+                  file is used so that a delta file cannot place the deb file in another folder.
+           @param deltaFile The delta file.
+           @return The name of the deb file."""
+        try:
+            with tarfile.open(deltaFile, "r:xz") as deltaTar:
+                metadata = json.load(deltaTar.extractfile(DebDelta.METADATA_FILE))
+            filename = os.path.basename(metadata["new"]["filename"])
+        except (OSError, tarfile.TarError, ValueError, KeyError, TypeError, AttributeError):
+            raise DebDeltaError("{} is not a valid delta file.".format(deltaFile))
+        if not filename.endswith(".deb") or filename == ".deb":
+            raise DebDeltaError("{} holds an invalid deb file name ({}).".format(deltaFile, filename))
+        return filename
+
+    def _spoolMember(self, tar, member, tmpFd):
+        """@brief Copy the contents of a file in a tar archive to a temporary file.
+           @param tar The tarfile.TarFile instance.
+           @param member The tarfile.TarInfo instance of the file.
+           @param tmpFd The temporary file. This is truncated first.
+           @return The hex SHA256 digest of the contents."""
+        sha256 = hashlib.sha256()
+        tmpFd.seek(0)
+        tmpFd.truncate()
+        srcFd = tar.extractfile(member)
+        while True:
+            block = srcFd.read(DebDelta.BLOCK_SIZE)
+            if not block:
+                break
+            sha256.update(block)
+            tmpFd.write(block)
+        tmpFd.flush()
+        tmpFd.seek(0)
+        return sha256.hexdigest()
+
+    def _getPreviousDigests(self, previousDeb):
+        """@param previousDeb The previous deb file.
+           @return A set of the SHA256 digests of the files in the previous deb file."""
+        digestSet = set()
+        with DebReader(previousDeb).openDataTar() as tar:
+            for member in tar:
+                if member.isreg():
+                    sha256 = hashlib.sha256()
+                    srcFd = tar.extractfile(member)
+                    while True:
+                        block = srcFd.read(DebDelta.BLOCK_SIZE)
+                        if not block:
+                            break
+                        sha256.update(block)
+                    digestSet.add(sha256.hexdigest())
+        return digestSet
+
+    def create(self, previousDeb, newDeb, deltaFile):
+        """@brief Create a delta file.
+           @param previousDeb The previous version of the deb file.
+           @param newDeb The new version of the deb file.
+           @param deltaFile The delta file to create."""
+        previousDigests = self._getPreviousDigests(previousDeb)
+        newReader = DebReader(newDeb)
+        previousReader = DebReader(previousDeb)
+        controlName, controlData = newReader.readControlMember()
+        dataName = newReader.getDataMemberName()
+
+        entryList = []
+        addedDigests = set()
+        digestDict = {}
+        tmpFile = "{}.tmp{}.{}".format(deltaFile, os.getpid(), threading.get_ident())
+        try:
+            with tarfile.open(tmpFile, "w:xz", format=tarfile.GNU_FORMAT) as deltaTar:
+                controlInfo = tarfile.TarInfo("{}/{}".format(DebDelta.CONTROL_FOLDER, controlName))
+                controlInfo.size = len(controlData)
+                deltaTar.addfile(controlInfo, io.BytesIO(controlData))
+
+                with newReader.openDataTar() as tar, tempfile.TemporaryFile() as tmpFd:
+                    for member in tar:
+                        path = os.path.normpath(member.name)
+                        if path == os.curdir:
+                            continue
+                        entry = {"path": path, "mode": member.mode, "mtime": member.mtime}
+                        if member.isdir():
+                            entry["type"] = StageEntry.FOLDER
+                        elif member.issym():
+                            entry["type"] = StageEntry.SYMLINK
+                            entry["link"] = member.linkname
+                        elif member.islnk():
+                            # A hard link is stored as a copy of the file it links to.
+                            entry["type"] = StageEntry.FILE
+                            entry["sha256"] = digestDict[os.path.normpath(member.linkname)]
+                        elif member.isreg():
+                            sha256 = self._spoolMember(tar, member, tmpFd)
+                            digestDict[path] = sha256
+                            entry["type"] = StageEntry.FILE
+                            entry["sha256"] = sha256
+                            if sha256 not in previousDigests and sha256 not in addedDigests:
+                                fileInfo = tarfile.TarInfo("{}/{}".format(DebDelta.FILES_FOLDER, sha256))
+                                fileInfo.size = member.size
+                                deltaTar.addfile(fileInfo, tmpFd)
+                                addedDigests.add(sha256)
+                        else:
+                            raise DebDeltaError("{} in {} is not a file, folder or link.".format(member.name, newDeb))
+                        entryList.append(entry)
+
+                previousControl = previousReader.getControl()
+                newControl = newReader.getControl()
+                metadata = {"version": DebDelta.FORMAT_VERSION,
+                            "previous": {"sha256": fileSHA256(previousDeb),
+                                         "package": previousControl.get("Package"),
+                                         "version": previousControl.get("Version")},
+                            "new": {"sha256": fileSHA256(newDeb),
+                                    "package": newControl.get("Package"),
+                                    "version": newControl.get("Version"),
+                                    "filename": os.path.basename(newDeb),
+                                    "control_member": controlName,
+                                    "compression": newReader.getCompression(dataName)},
+                            "entries": entryList}
+                metadataBytes = json.dumps(metadata).encode()
+                metadataInfo = tarfile.TarInfo(DebDelta.METADATA_FILE)
+                metadataInfo.size = len(metadataBytes)
+                deltaTar.addfile(metadataInfo, io.BytesIO(metadataBytes))
+            os.rename(tmpFile, deltaFile)
+        finally:
+            if os.path.isfile(tmpFile):
+                os.remove(tmpFile)
+
+        fullSize = os.path.getsize(newDeb)
+        deltaSize = os.path.getsize(deltaFile)
+        self._uio.info("Created {}: {} of {} files changed, full deb {} bytes, delta {} bytes ({:.1f}% of the full deb).".format(
+            deltaFile, len(addedDigests), len(digestDict), fullSize, deltaSize, deltaSize * 100.0 / max(fullSize, 1)))
+
+    def apply(self, previousDeb, deltaFile, newDeb, threads=1):
+        """@brief Rebuild the new deb file from the previous deb file and a delta file.
+           @param previousDeb The previous version of the deb file.
+           @param deltaFile The delta file.
+           @param newDeb The deb file to create.
+           @param threads The number of threads used to compress the data archive."""
+        tmpFolder = tempfile.mkdtemp(prefix="pipenv2deb_delta_")
+        try:
+            with tarfile.open(deltaFile, "r:xz") as deltaTar:
+                for member in deltaTar.getmembers():
+                    if not member.isreg() or os.path.isabs(member.name) or ".." in member.name.split("/"):
+                        raise DebDeltaError("{} is not a valid delta file.".format(deltaFile))
+                deltaTar.extractall(tmpFolder)
+
+            with open(os.path.join(tmpFolder, DebDelta.METADATA_FILE)) as fd:
+                metadata = json.load(fd)
+            if metadata.get("version") != DebDelta.FORMAT_VERSION:
+                raise DebDeltaError("{} was created by an unsupported version of pipenv2deb.".format(deltaFile))
+            if fileSHA256(previousDeb) != metadata["previous"]["sha256"]:
+                raise DebDeltaError("{} is not the deb file that {} was created from ({} {}).".format(
+                    previousDeb, deltaFile, metadata["previous"]["package"], metadata["previous"]["version"]))
+
+            # Copy the files that are unchanged from the previous deb file.
+            filesFolder = os.path.join(tmpFolder, DebDelta.FILES_FOLDER)
+            if not os.path.isdir(filesFolder):
+                os.makedirs(filesFolder)
+            requiredDigests = set(entry["sha256"] for entry in metadata["entries"] if entry["type"] == StageEntry.FILE)
+            requiredDigests -= set(os.listdir(filesFolder))
+            with DebReader(previousDeb).openDataTar() as tar:
+                for member in tar:
+                    if not requiredDigests:
+                        break
+                    if member.isreg():
+                        tmpFile = os.path.join(tmpFolder, "previous.tmp")
+                        with open(tmpFile, 'w+b') as tmpFd:
+                            sha256 = self._spoolMember(tar, member, tmpFd)
+                        if sha256 in requiredDigests:
+                            os.rename(tmpFile, os.path.join(filesFolder, sha256))
+                            requiredDigests.discard(sha256)
+
+            entryList = []
+            for entry in metadata["entries"]:
+                if entry["type"] == StageEntry.FILE:
+                    srcFile = os.path.join(filesFolder, entry["sha256"])
+                    if not os.path.isfile(srcFile) or fileSHA256(srcFile) != entry["sha256"]:
+                        raise DebDeltaError("The contents of {} are missing or incorrect.".format(entry["path"]))
+                    entryList.append(StageEntry(entry["path"], StageEntry.FILE, entry["mode"], entry["mtime"], srcFile=srcFile))
+                elif entry["type"] == StageEntry.SYMLINK:
+                    entryList.append(StageEntry(entry["path"], StageEntry.SYMLINK, entry["mode"], entry["mtime"], linkTarget=entry["link"]))
+                else:
+                    entryList.append(StageEntry(entry["path"], StageEntry.FOLDER, entry["mode"], entry["mtime"]))
+
+            controlName = metadata["new"]["control_member"]
+            with open(os.path.join(tmpFolder, DebDelta.CONTROL_FOLDER, controlName), 'rb') as fd:
+                controlData = fd.read()
+
+            debWriter = DebWriter(metadata["new"]["compression"], None, threads)
+            debWriter.write(newDeb, entryList, controlMember=(controlName, controlData))
+        finally:
+            shutil.rmtree(tmpFolder)
+
+        self._uio.info("Created {} ({} {}) from {} and {}".format(
+            newDeb, metadata["new"]["package"], metadata["new"]["version"], previousDeb, deltaFile))
+
+
+def main():
+    # Imported here as pipenv2deb.__main__ imports this module.
+    from pipenv2deb.__main__ import UIO
+
+    uio = UIO()
+    opts = OptionParser(usage="usage: %prog [options] <previous deb file> <delta file> [new deb file]\n"
+                              "Rebuild a deb file from the previous version of the deb file and a delta file created by pipenv2deb (--delta_from).\n"
+                              "If the new deb file is not given then it is created in the current folder.")
+    opts.add_option("--debug", help="Enable debugging.", action="store_true", default=False)
+    opts.add_option("--threads", help="The number of threads used to compress the deb file (default=1).", type="int", default=1)
+
+    try:
+        (options, args) = opts.parse_args()
+        if len(args) not in (2, 3):
+            raise DebDeltaError("The previous deb file and the delta file must be given.")
+        newDeb = args[2] if len(args) == 3 else None
+        if newDeb is None:
+            newDeb = DebDelta.getNewDebFilename(args[1])
+        DebDelta(uio).apply(args[0], args[1], newDeb, options.threads)
+
+    # If the program throws a system exit exception
+    except SystemExit:
+        pass
+    # Don't print error information if CTRL C pressed
+    except KeyboardInterrupt:
+        pass
+    except Exception as ex:
+        if options.debug:
+            raise
+
+        else:
+            uio.error(str(ex))
+            # A non zero exit status allows a script that applies a delta to detect that it failed.
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
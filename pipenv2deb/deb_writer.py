@@ -0,0 +1,342 @@
+import os
+import io
+import time
+import gzip
+import lzma
+import shutil
+import hashlib
+import tarfile
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pipenv2deb.stager import StageEntry
+
+
+class DebWriterError(Exception):
+    pass
+
+
+class CompressorStream(object):
+    """@brief A writable stream that compresses the data written to it and writes the result to
+              an open file. An external compression command is used when multiple threads are
+              required (or for zstd which python does not support) so that the data is compressed
+              on several cores."""
+
+    DEFAULT_LEVELS = {"gzip": 9, "xz": 6, "zstd": 3}
+    ZSTD_MAX_NORMAL_LEVEL = 19
+
+    def __init__(self, outFd, compress, level, threads):
+        """@brief Constructor
+           @param outFd The binary file object to write the compressed data to.
+           @param compress The compression type (gzip, xz, zstd or none).
+           @param level The compression level or None to use the default level.
+           @param threads The number of threads to compress with."""
+        self._outFd = outFd
+        self._proc = None
+        self._gzipFile = None
+        self._lzmaCompressor = None
+
+        if level is None and compress in CompressorStream.DEFAULT_LEVELS:
+            level = CompressorStream.DEFAULT_LEVELS[compress]
+
+        cmd = self._getCompressCmd(compress, level, threads)
+        if cmd:
+            # The command writes straight to the output file at it's current position.
+            self._outFd.flush()
+            self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=self._outFd.fileno())
+
+        elif compress == "gzip":
+            self._gzipFile = gzip.GzipFile(filename="", fileobj=self._outFd, mode='wb', compresslevel=level)
+
+        elif compress == "xz":
+            self._lzmaCompressor = lzma.LZMACompressor(preset=level)
+
+        elif compress == "zstd":
+            raise DebWriterError("The zstd command must be installed to use zstd compression.")
+
+    def _getCompressCmd(self, compress, level, threads):
+        """@brief Get the external command used to compress the data.
+           @param compress The compression type.
+           @param level The compression level.
+           @param threads The number of threads to compress with.
+           @return The command as a list or None if the data should be compressed by python."""
+        if compress == "zstd" and shutil.which("zstd"):
+            cmd = ["zstd", "-q", "-c", "-T{}".format(threads), "-{}".format(level)]
+            if level > CompressorStream.ZSTD_MAX_NORMAL_LEVEL:
+                cmd.append("--ultra")
+            return cmd
+
+        if threads > 1:
+            if compress == "xz" and shutil.which("xz"):
+                return ["xz", "-c", "-T{}".format(threads), "-{}".format(level)]
+
+            if compress == "gzip" and shutil.which("pigz"):
+                return ["pigz", "-c", "-n", "-p", str(threads), "-{}".format(level)]
+
+        return None
+
+    def write(self, data):
+        """@brief Compress data.
+           @param data The bytes to compress."""
+        if self._proc:
+            self._proc.stdin.write(data)
+        elif self._gzipFile:
+            self._gzipFile.write(data)
+        elif self._lzmaCompressor:
+            self._outFd.write(self._lzmaCompressor.compress(data))
+        else:
+            self._outFd.write(data)
+        return len(data)
+
+    def close(self):
+        """@brief Write any remaining compressed data. On return the output file is positioned
+                  at the end of the compressed data."""
+        if self._proc:
+            self._proc.stdin.close()
+            if self._proc.wait() != 0:
+                raise DebWriterError("{} failed (return code = {}).".format(self._proc.args[0], self._proc.returncode))
+            self._outFd.seek(0, os.SEEK_END)
+        elif self._gzipFile:
+            self._gzipFile.close()
+        elif self._lzmaCompressor:
+            self._outFd.write(self._lzmaCompressor.flush())
+
+
+class GzipMemberCache(object):
+    """@brief Responsible for holding the compressed data archive of a deb file as a series of gzip
+              members. A gzip file may hold several members that are decompressed as a single
+              stream. The entries are split into members at each change of folder so when a deb
+              file is written again (E.G in watch mode) only the members that hold changed entries
+              are compressed again. The compression ratio is slightly lower than compressing the
+              archive as a single stream."""
+
+    TAR_FORMAT = tarfile.GNU_FORMAT
+    # A member is started when a member holds this many bytes of the archive.
+    MAX_MEMBER_SIZE = 1024*1024
+
+    def __init__(self):
+        """@brief Constructor"""
+        self._memberDict = {}
+        self._membersCompressed = 0
+        self._membersReused = 0
+
+    def _getEntryKey(self, entry):
+        """@param entry A StageEntry instance.
+           @return A tuple that changes if the archive member of the entry changes."""
+        key = (entry.path, entry.entryType, entry.mode, int(entry.mtime), entry.linkTarget)
+        if entry.entryType == StageEntry.FILE:
+            if entry.srcFile:
+                srcStat = os.stat(entry.srcFile)
+                key += (entry.srcFile, srcStat.st_size, srcStat.st_mtime_ns)
+            else:
+                key += (hashlib.sha256(entry.data).hexdigest(),)
+        return key
+
+    def _getTarBytes(self, entryList, arcNameList):
+        """@brief Get the tar archive blocks of several entries.
+           @param entryList A list of StageEntry instances.
+           @param arcNameList The name of each entry in the archive.
+           @return The bytes."""
+        data = io.BytesIO()
+        for entry, arcName in zip(entryList, arcNameList):
+            data.write(entry.getTarInfo(arcName).tobuf(GzipMemberCache.TAR_FORMAT, tarfile.ENCODING, "surrogateescape"))
+            if entry.entryType == StageEntry.FILE:
+                size = data.write(entry.read())
+                remainder = size % tarfile.BLOCKSIZE
+                if remainder:
+                    data.write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+        return data.getvalue()
+
+    def _compress(self, entryList, arcNameList, level):
+        """@brief Compress a gzip member.
+           @param entryList The StageEntry instances in the member.
+           @param arcNameList The name of each entry in the archive.
+           @param level The compression level.
+           @return A tuple containing the compressed bytes and the size of the tar blocks."""
+        tarBytes = self._getTarBytes(entryList, arcNameList)
+        return (gzip.compress(tarBytes, compresslevel=level, mtime=0), len(tarBytes))
+
+    def _getMemberList(self, entryList, arcNameList):
+        """@brief Split the entries into members.
+           @param entryList A list of StageEntry instances.
+           @param arcNameList The name of each entry in the archive.
+           @return A list of (entry list, archive name list) tuples."""
+        memberList = []
+        folder = None
+        size = 0
+        for entry, arcName in zip(entryList, arcNameList):
+            entryFolder = os.path.dirname(entry.path)
+            if not memberList or entryFolder != folder or size >= GzipMemberCache.MAX_MEMBER_SIZE:
+                memberList.append(([], []))
+                folder = entryFolder
+                size = 0
+            memberList[-1][0].append(entry)
+            memberList[-1][1].append(arcName)
+            size += entry.getSize()
+        return memberList
+
+    def write(self, fd, entryList, arcNameList, level, threads):
+        """@brief Write a gzip compressed tar archive. Members that were compressed by the last call
+                  are used again if their entries have not changed.
+           @param fd The file object to write to.
+           @param entryList A list of StageEntry instances.
+           @param arcNameList The name of each entry in the archive.
+           @param level The compression level.
+           @param threads The number of threads to compress with."""
+        memberList = self._getMemberList(entryList, arcNameList)
+        keyList = [(level,) + tuple(self._getEntryKey(entry) for entry in member[0]) for member in memberList]
+        memberDict = {}
+        futureDict = {}
+        with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+            for key, member in zip(keyList, memberList):
+                if key in self._memberDict:
+                    memberDict[key] = self._memberDict[key]
+                elif key not in futureDict:
+                    futureDict[key] = executor.submit(self._compress, member[0], member[1], level)
+            for key, future in futureDict.items():
+                memberDict[key] = future.result()
+
+        tarSize = 0
+        for key in keyList:
+            compressed, size = memberDict[key]
+            fd.write(compressed)
+            tarSize += size
+        # The end of archive marker (two zero blocks) padded to a whole number of records.
+        trailerSize = 2 * tarfile.BLOCKSIZE
+        trailerSize += -(tarSize + trailerSize) % tarfile.RECORDSIZE
+        fd.write(gzip.compress(tarfile.NUL * trailerSize, compresslevel=level, mtime=0))
+
+        self._membersCompressed = len(futureDict)
+        self._membersReused = len(keyList) - len(futureDict)
+        # Only the members of the last archive are kept.
+        self._memberDict = memberDict
+
+    def getMemberCounts(self):
+        """@return A tuple containing the number of members compressed and reused by the last write()."""
+        return (self._membersCompressed, self._membersReused)
+
+
+class DebWriter(object):
+    """@brief Responsible for writing a deb file from a list of staged entries without running dpkg-deb.
+              The control and data archives are streamed straight from the source files into the
+              deb (ar) container so no build folder is required. All files are recorded as owned
+              by root."""
+
+    AR_MAGIC = b"!<arch>\n"
+    AR_HEADER_SIZE = 60
+    AR_MEMBER_MODE = "100644"
+    DEBIAN_BINARY = b"2.0\n"
+    DEBIAN_FOLDER = "DEBIAN"
+    DATA_EXTENSIONS = {"gzip": ".gz", "xz": ".xz", "zstd": ".zst", "none": ""}
+
+    def __init__(self, compress, level, threads, memberCache=None):
+        """@brief Constructor
+           @param compress The data archive compression type (gzip, xz, zstd or none).
+           @param level The compression level or None to use the default level.
+           @param threads The number of threads to compress with.
+           @param memberCache If not None a GzipMemberCache instance used to write the data
+                  archive if gzip compression is used. The members are kept for the next deb
+                  file written with the same GzipMemberCache instance."""
+        self._compress = compress
+        self._level = level
+        self._threads = threads
+        self._memberCache = memberCache
+        self._mtime = int(time.time())
+
+    def _getArHeader(self, name, size):
+        """@brief Get an ar member header.
+           @param name The member name.
+           @param size The size of the member data in bytes.
+           @return The header bytes."""
+        header = "{:<16}{:<12}{:<6}{:<6}{:<8}{:<10}`\n".format(name, self._mtime, 0, 0, DebWriter.AR_MEMBER_MODE, size)
+        return header.encode()
+
+    def _writeArMember(self, fd, name, data):
+        """@brief Write an ar member.
+           @param fd The deb file object.
+           @param name The member name.
+           @param data The member data (bytes)."""
+        fd.write(self._getArHeader(name, len(data)))
+        fd.write(data)
+        if len(data) % 2:
+            fd.write(b"\n")
+
+    def _isControlEntry(self, entry):
+        """@param entry A StageEntry instance.
+           @return True if the entry is in the DEBIAN folder."""
+        return entry.path == DebWriter.DEBIAN_FOLDER or entry.path.startswith(DebWriter.DEBIAN_FOLDER + os.sep)
+
+    def _getControlTar(self, entryList):
+        """@brief Get the control archive.
+           @param entryList The list of StageEntry instances.
+           @return The control.tar.gz file contents."""
+        controlTar = io.BytesIO()
+        with tarfile.open(fileobj=controlTar, mode="w:gz", format=tarfile.GNU_FORMAT) as tar:
+            StageEntry(os.curdir, StageEntry.FOLDER, 0o755, self._mtime).addToTar(tar, "./")
+            for entry in entryList:
+                if self._isControlEntry(entry) and entry.entryType == StageEntry.FILE:
+                    entry.addToTar(tar, "./{}".format(os.path.relpath(entry.path, DebWriter.DEBIAN_FOLDER)))
+        return controlTar.getvalue()
+
+    def _writeDataTar(self, fd, entryList):
+        """@brief Write the data archive ar member. The archive is compressed as it is written.
+                  As the compressed size is not known until the archive is complete the member
+                  header is written again once the archive has been written.
+           @param fd The deb file object.
+           @param entryList The list of StageEntry instances."""
+        name = "data.tar{}".format(DebWriter.DATA_EXTENSIONS[self._compress])
+        headerOffset = fd.tell()
+        fd.write(self._getArHeader(name, 0))
+
+        if self._memberCache and self._compress == "gzip":
+            dataEntryList = [StageEntry(os.curdir, StageEntry.FOLDER, 0o755, self._mtime)]
+            arcNameList = ["./"]
+            for entry in entryList:
+                if not self._isControlEntry(entry):
+                    dataEntryList.append(entry)
+                    arcNameList.append("./{}".format(entry.path))
+            level = self._level
+            if level is None:
+                level = CompressorStream.DEFAULT_LEVELS[self._compress]
+            self._memberCache.write(fd, dataEntryList, arcNameList, level, self._threads)
+        else:
+            stream = CompressorStream(fd, self._compress, self._level, self._threads)
+            with tarfile.open(fileobj=stream, mode="w|", format=tarfile.GNU_FORMAT) as tar:
+                StageEntry(os.curdir, StageEntry.FOLDER, 0o755, self._mtime).addToTar(tar, "./")
+                for entry in entryList:
+                    if not self._isControlEntry(entry):
+                        entry.addToTar(tar, "./{}".format(entry.path))
+            stream.close()
+
+        endOffset = fd.tell()
+        size = endOffset - headerOffset - DebWriter.AR_HEADER_SIZE
+        fd.seek(headerOffset)
+        fd.write(self._getArHeader(name, size))
+        fd.seek(endOffset)
+        if size % 2:
+            fd.write(b"\n")
+
+    def write(self, debFile, entryList, controlMember=None):
+        """@brief Write the deb file. The file is written under a temporary name and then renamed so an
+                  existing file (which may be linked to the build cache) is never written over.
+           @param debFile The deb file to create.
+           @param entryList A list of StageEntry instances holding the DEBIAN folder (control,
+                  postinst etc) and the files to be installed.
+           @param controlMember If not None a tuple containing the name and contents of an existing
+                  control archive (E.G from another deb file) to be used rather than creating the
+                  control archive from the DEBIAN folder entries."""
+        tmpFile = "{}.tmp{}.{}".format(debFile, os.getpid(), threading.get_ident())
+        try:
+            with open(tmpFile, 'wb') as fd:
+                fd.write(DebWriter.AR_MAGIC)
+                self._writeArMember(fd, "debian-binary", DebWriter.DEBIAN_BINARY)
+                if controlMember:
+                    self._writeArMember(fd, controlMember[0], controlMember[1])
+                else:
+                    self._writeArMember(fd, "control.tar.gz", self._getControlTar(entryList))
+                self._writeDataTar(fd, entryList)
+            os.rename(tmpFile, debFile)
+        finally:
+            if os.path.isfile(tmpFile):
+                os.remove(tmpFile)
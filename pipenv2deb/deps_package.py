@@ -0,0 +1,138 @@
+import os
+import json
+import hashlib
+
+
+class DepsPackage(object):
+    """@brief Responsible for the details of the dependencies package that is built when the python
+              dependencies are placed in a separate package to the application (--split_deps).
+              The name of the dependencies package includes a digest of the Pipfile.lock file so a
+              new dependencies package is only built (and installed) when the locked packages change.
+              The application package depends on the dependencies package and it's .venv folder is
+              a link to the .venv folder in the dependencies package."""
+
+    VERSION = "1.0"
+    DIGEST_LENGTH = 12
+    TARGET_FOLDER_EXTENSION = ".pipenvdeps"
+    # The fields copied from the application package control file.
+    COPIED_FIELDS = ["Section", "Priority", "Architecture", "Maintainer", "Depends", "Homepage"]
+
+    def __init__(self, controlFile, inputFileList, optionDict, baseFolder=None):
+        """@brief Constructor
+           @param controlFile The application package debian/control file.
+           @param inputFileList The files that define the contents of the dependencies package
+                  (E.G the Pipfile.lock file). Files that do not exist are ignored.
+           @param optionDict A dict of the options that change how the dependencies are packaged.
+           @param baseFolder The project folder. If not None the input files are named relative to it in the digest."""
+        self._fieldList = DepsPackage.readControlFields(controlFile)
+        self._digest = DepsPackage.computeDigest(inputFileList, optionDict, baseFolder)
+
+    @staticmethod
+    def readControlFields(controlFile):
+        """@brief Read a debian control file.
+           @param controlFile The control file.
+           @return A list of [name, value] lists in the order they appear in the file. The value
+                   includes any continuation lines."""
+        fieldList = []
+        with open(controlFile) as fd:
+            for line in fd.read().splitlines():
+                if not line.strip():
+                    continue
+                if line[0] in " \t" and fieldList:
+                    fieldList[-1][1] = "{}\n{}".format(fieldList[-1][1], line)
+                elif ":" in line:
+                    name, value = line.split(":", 1)
+                    fieldList.append([name.strip(), value.strip()])
+        return fieldList
+
+    @staticmethod
+    def computeDigest(inputFileList, optionDict, baseFolder=None):
+        """@brief Get the digest that identifies the dependencies package.
+           @param inputFileList The files that define the contents of the dependencies package.
+           @param optionDict A dict of the options that change how the dependencies are packaged.
+           @param baseFolder If not None the input files are named relative to this folder.
+           @return The hex digest string (DIGEST_LENGTH characters)."""
+        sha256 = hashlib.sha256()
+        for inputFile in inputFileList:
+            if os.path.isfile(inputFile):
+                name = inputFile
+                if baseFolder is not None:
+                    name = os.path.relpath(inputFile, baseFolder)
+                sha256.update(name.encode())
+                with open(inputFile, 'rb') as fd:
+                    sha256.update(fd.read())
+        sha256.update(json.dumps(optionDict, sort_keys=True).encode())
+        return sha256.hexdigest()[:DepsPackage.DIGEST_LENGTH]
+
+    def _getField(self, name):
+        """@param name The name of a field in the application package control file.
+           @return The value of the field or None if not present."""
+        for fieldName, value in self._fieldList:
+            if fieldName.lower() == name.lower():
+                return value
+        return None
+
+    def _formatFields(self, fieldList):
+        """@param fieldList A list of [name, value] lists.
+           @return The contents of a control file."""
+        return "".join("{}: {}\n".format(name, value) for name, value in fieldList)
+
+    def getDigest(self):
+        """@return The digest that identifies the dependencies package."""
+        return self._digest
+
+    def getName(self):
+        """@return The name of the dependencies package."""
+        return "{}-deps-{}".format(self._getField("Package"), self._digest)
+
+    def getDebFilename(self):
+        """@return The name of the dependencies package deb file."""
+        return "{}-{}-{}.deb".format(self.getName(), DepsPackage.VERSION, self._getField("Architecture"))
+
+    def getTargetFolder(self, targetBinFolder):
+        """@param targetBinFolder The folder that the application package folder is installed into.
+           @return The folder that the dependencies are installed into."""
+        return os.path.join(targetBinFolder, "{}{}".format(self._getField("Package"), DepsPackage.TARGET_FOLDER_EXTENSION), self._digest)
+
+    def getControl(self):
+        """@return The contents of the dependencies package control file."""
+        fieldList = [["Package", self.getName()],
+                     ["Version", DepsPackage.VERSION]]
+        for name in DepsPackage.COPIED_FIELDS:
+            value = self._getField(name)
+            if value:
+                fieldList.append([name, value])
+        fieldList.append(["Description", "The python packages used by {}.\n"
+                                         " Holds the python packages in the Pipfile.lock file of {} version {} (digest {}).".format(
+                                             self._getField("Package"), self._getField("Package"), self._getField("Version"), self._digest)])
+        return self._formatFields(fieldList)
+
+    def getAppControl(self):
+        """@return The contents of the application package control file with the dependencies
+                   package added to the packages that it depends on."""
+        dependency = "{} (= {})".format(self.getName(), DepsPackage.VERSION)
+        fieldList = [list(field) for field in self._fieldList]
+        for field in fieldList:
+            if field[0].lower() == "depends":
+                field[1] = "{}, {}".format(field[1], dependency) if field[1] else dependency
+                break
+        else:
+            fieldList.append(["Depends", dependency])
+        return self._formatFields(fieldList)
+
+    def getPostRemoveScript(self, targetBinFolder, command=None):
+        """@brief Get the postrm script of the dependencies package. This removes the files created
+                  when the package was installed (E.G the .venv folder and compiled python files).
+           @param targetBinFolder The folder that the application package folder is installed into.
+           @param command If not None command lines that are run before the files are removed.
+           @return The script contents."""
+        targetFolder = self.getTargetFolder(targetBinFolder)
+        lines = ["#!/bin/sh"]
+        if command:
+            lines.append(command.rstrip("\n"))
+        lines += ["# Created by pipenv2deb. Removes the files that were created when {} was installed.".format(self.getName()),
+                  'if [ "$1" = "remove" ] || [ "$1" = "purge" ]; then',
+                  "    rm -rf {}".format(targetFolder),
+                  "    rmdir {} 2>/dev/null || true".format(os.path.dirname(targetFolder)),
+                  "fi"]
+        return "\n".join(lines) + "\n"
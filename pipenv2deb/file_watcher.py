@@ -0,0 +1,260 @@
+import os
+import stat
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+
+class FileWatcher(object):
+    """@brief Responsible for reporting the files that change in a folder tree. The linux inotify
+              interface (accessed through ctypes) is used if available, else the folder tree is
+              polled. Changes are debounced so that a burst of changes (E.G an editor saving
+              several files or a git checkout) is reported once."""
+
+    # inotify event masks (see /usr/include/linux/inotify.h)
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | \
+                 IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+    EVENT_HEADER = struct.Struct("iIII")
+    READ_SIZE = 64*1024
+    POLL_INTERVAL = 0.5
+    DEFAULT_DEBOUNCE = 0.2
+
+    def __init__(self, uio, rootFolder, excludeFunc, usePolling=False):
+        """@brief Constructor
+           @param uio A UIO instance
+           @param rootFolder The folder to watch.
+           @param excludeFunc A function that is called with the path (relative to rootFolder) of
+                  each folder and file and True if the path is a folder. If it returns True the
+                  folder (and all it's contents) or file is not watched.
+           @param usePolling If True the folder tree is polled even if inotify is available."""
+        self._uio = uio
+        self._rootFolder = os.path.abspath(rootFolder)
+        self._excludeFunc = excludeFunc
+        self._usePolling = usePolling
+        self._inotifyFd = None
+        self._libc = None
+        self._watchDict = {}
+        self._snapshot = {}
+
+    def start(self):
+        """@brief Start watching the folder tree."""
+        if not self._usePolling:
+            self._startInotify()
+        if self._inotifyFd is None:
+            self._snapshot = self._getSnapshot()
+            self._uio.info("Polling {} for changes every {} seconds.".format(self._rootFolder, FileWatcher.POLL_INTERVAL))
+        else:
+            self._uio.info("Watching {} folders in {} for changes.".format(len(self._watchDict), self._rootFolder))
+
+    def close(self):
+        """@brief Stop watching the folder tree."""
+        if self._inotifyFd is not None:
+            os.close(self._inotifyFd)
+            self._inotifyFd = None
+        self._watchDict = {}
+
+    def _startInotify(self):
+        """@brief Start watching the folder tree using inotify. If inotify is not available (E.G
+                  not running on Linux or the limit on the number of watches has been reached)
+                  then the folder tree is polled."""
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = self._libc.inotify_init1(FileWatcher.IN_NONBLOCK | FileWatcher.IN_CLOEXEC)
+        except (OSError, AttributeError):
+            self._uio.info("inotify is not available.")
+            return
+        if fd < 0:
+            self._uio.info("inotify_init1() failed: {}".format(os.strerror(ctypes.get_errno())))
+            return
+
+        self._inotifyFd = fd
+        try:
+            self._addWatches(os.curdir)
+        except OSError as ex:
+            self._uio.info("Unable to watch {} using inotify: {}".format(self._rootFolder, ex))
+            self.close()
+
+    def _addWatch(self, relFolder):
+        """@brief Watch a folder.
+           @param relFolder The folder relative to the root folder."""
+        folder = os.path.join(self._rootFolder, relFolder)
+        wd = self._libc.inotify_add_watch(self._inotifyFd, os.fsencode(folder), FileWatcher.WATCH_MASK)
+        if wd < 0:
+            errNo = ctypes.get_errno()
+            # The folder may have been removed since it was found.
+            if errNo in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(errNo, os.strerror(errNo), folder)
+        self._watchDict[wd] = os.path.normpath(relFolder)
+
+    def rescan(self):
+        """@brief Watch any folders that were not watched because they did not exist or were
+                  excluded when the last scan was made. This should be called if the result of
+                  the exclude function may have changed."""
+        if self._inotifyFd is None:
+            return
+        try:
+            self._addWatches(os.curdir)
+        except OSError as ex:
+            self._uio.info("Unable to watch {} using inotify: {}".format(self._rootFolder, ex))
+
+    def _addWatches(self, relFolder):
+        """@brief Watch a folder and all the folders in it that are not excluded.
+           @param relFolder The folder relative to the root folder.
+           @return A list of the files (relative to the root folder) found in the folders."""
+        fileList = []
+        for root, dirs, files in os.walk(os.path.join(self._rootFolder, relFolder)):
+            relRoot = os.path.relpath(root, self._rootFolder)
+            dirs[:] = [_dir for _dir in dirs if not self._isExcluded(os.path.join(relRoot, _dir), True)]
+            self._addWatch(relRoot)
+            for _file in files:
+                relFile = os.path.normpath(os.path.join(relRoot, _file))
+                if not self._isExcluded(relFile, False):
+                    fileList.append(relFile)
+        return fileList
+
+    def _isExcluded(self, relPath, isFolder):
+        """@param relPath A path relative to the root folder.
+           @param isFolder True if the path is a folder.
+           @return True if the path is not watched."""
+        relPath = os.path.normpath(relPath)
+        if relPath == os.curdir:
+            return False
+        return self._excludeFunc(relPath, isFolder)
+
+    def _readInotifyChanges(self, timeout):
+        """@brief Read the inotify events.
+           @param timeout The maximum time to wait for an event in seconds or None to wait until an event occurs.
+           @return A set of the changed paths relative to the root folder."""
+        changedSet = set()
+        readList, _, _ = select.select([self._inotifyFd], [], [], timeout)
+        if not readList:
+            return changedSet
+
+        try:
+            data = os.read(self._inotifyFd, FileWatcher.READ_SIZE)
+        except BlockingIOError:
+            return changedSet
+
+        offset = 0
+        while offset + FileWatcher.EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = FileWatcher.EVENT_HEADER.unpack_from(data, offset)
+            offset += FileWatcher.EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & FileWatcher.IN_Q_OVERFLOW:
+                # Events have been lost so the whole folder tree may have changed.
+                self._uio.info("inotify event queue overflow.")
+                changedSet.add(os.curdir)
+                continue
+
+            relFolder = self._watchDict.get(wd)
+            if relFolder is None:
+                continue
+            if mask & FileWatcher.IN_IGNORED:
+                del self._watchDict[wd]
+                continue
+            if not name:
+                # An event on a watched folder itself (E.G it was removed).
+                if relFolder != os.curdir and mask & (FileWatcher.IN_DELETE_SELF | FileWatcher.IN_MOVE_SELF):
+                    changedSet.add(relFolder)
+                continue
+
+            relPath = os.path.normpath(os.path.join(relFolder, name))
+            isFolder = bool(mask & FileWatcher.IN_ISDIR)
+            if self._isExcluded(relPath, isFolder):
+                continue
+            changedSet.add(relPath)
+            # The files in a new folder may have been created before the folder was watched.
+            if isFolder and mask & (FileWatcher.IN_CREATE | FileWatcher.IN_MOVED_TO):
+                try:
+                    changedSet.update(self._addWatches(relPath))
+                except OSError as ex:
+                    self._uio.info("Unable to watch {}: {}".format(relPath, ex))
+
+        return changedSet
+
+    def _getSnapshot(self):
+        """@brief Get the state of the files in the folder tree.
+           @return A dict keyed by the path (relative to the root folder) of each folder and file. Each
+                   value is a tuple containing the modification time, size and mode."""
+        snapshot = {}
+        for root, dirs, files in os.walk(self._rootFolder):
+            relRoot = os.path.relpath(root, self._rootFolder)
+            dirs[:] = [_dir for _dir in dirs if not self._isExcluded(os.path.join(relRoot, _dir), True)]
+            for name in dirs + [_file for _file in files if not self._isExcluded(os.path.join(relRoot, _file), False)]:
+                path = os.path.join(root, name)
+                try:
+                    pathStat = os.stat(path)
+                except OSError:
+                    continue
+                if stat.S_ISDIR(pathStat.st_mode):
+                    # The modification time of a folder changes when a file in it is added or
+                    # removed. The file is reported so the folder is not.
+                    snapshot[os.path.normpath(os.path.join(relRoot, name))] = (0, 0, pathStat.st_mode)
+                else:
+                    snapshot[os.path.normpath(os.path.join(relRoot, name))] = (pathStat.st_mtime_ns, pathStat.st_size, pathStat.st_mode)
+        return snapshot
+
+    def _readPolledChanges(self, timeout):
+        """@brief Poll the folder tree for changes.
+           @param timeout The maximum time to wait for a change in seconds or None to wait until a change occurs.
+           @return A set of the changed paths relative to the root folder."""
+        endTime = None
+        if timeout is not None:
+            endTime = time.time() + timeout
+        while True:
+            delay = FileWatcher.POLL_INTERVAL
+            if endTime is not None:
+                delay = max(0, min(delay, endTime - time.time()))
+            time.sleep(delay)
+            snapshot = self._getSnapshot()
+            changedSet = set()
+            for path in set(snapshot) | set(self._snapshot):
+                if snapshot.get(path) != self._snapshot.get(path):
+                    changedSet.add(path)
+            self._snapshot = snapshot
+            if changedSet or (endTime is not None and time.time() >= endTime):
+                return changedSet
+
+    def _readChanges(self, timeout):
+        """@param timeout The maximum time to wait for a change in seconds or None to wait until a change occurs.
+           @return A set of the changed paths relative to the root folder."""
+        if self._inotifyFd is None:
+            return self._readPolledChanges(timeout)
+        return self._readInotifyChanges(timeout)
+
+    def waitForChanges(self, debounce=DEFAULT_DEBOUNCE):
+        """@brief Wait for files in the folder tree to change.
+           @param debounce Once a change has been seen, changes are collected until no change
+                  has been seen for this number of seconds.
+           @return A sorted list of the changed paths relative to the root folder. A path may
+                   have been created, changed or removed. If the path is . then any path may
+                   have changed."""
+        changedSet = set()
+        while not changedSet:
+            changedSet = self._readChanges(None)
+        while True:
+            newSet = self._readChanges(debounce)
+            if not newSet:
+                break
+            changedSet |= newSet
+        return sorted(changedSet)
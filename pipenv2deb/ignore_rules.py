@@ -0,0 +1,186 @@
+import os
+import re
+
+
+class IgnorePattern(object):
+    """@brief A single gitignore style pattern compiled to a regular expression."""
+
+    def __init__(self, pattern):
+        """@brief Constructor
+           @param pattern The pattern. As with gitignore a leading ! negates the pattern, a trailing /
+                  only matches folders, a pattern containing a / (other than a trailing /) is matched
+                  against the whole path relative to the project folder and other patterns are matched
+                  against the name at any level. * and ? do not match / while ** matches any number
+                  of folders."""
+        self.pattern = pattern
+        self.negate = False
+        self.folderOnly = False
+        if pattern.startswith("!"):
+            self.negate = True
+            pattern = pattern[1:]
+        elif pattern.startswith("\\!") or pattern.startswith("\\#"):
+            pattern = pattern[1:]
+        if pattern.endswith("/"):
+            self.folderOnly = True
+            pattern = pattern.rstrip("/")
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        regex = IgnorePattern._translate(pattern)
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        self._regex = re.compile("^{}$".format(regex), re.DOTALL)
+
+    @staticmethod
+    def _translate(pattern):
+        """@brief Convert a glob pattern to a regular expression.
+           @param pattern The glob pattern.
+           @return The regular expression string."""
+        regex = ""
+        index = 0
+        while index < len(pattern):
+            char = pattern[index]
+            if pattern.startswith("**/", index):
+                # Zero or more folders.
+                regex += "(?:.*/)?"
+                index += 3
+                continue
+            if pattern.startswith("/**", index) and index + 3 == len(pattern):
+                # Everything in the folder.
+                regex += "/.*"
+                index += 3
+                continue
+            if pattern.startswith("**", index):
+                regex += ".*"
+                index += 2
+                continue
+            if char == "*":
+                regex += "[^/]*"
+            elif char == "?":
+                regex += "[^/]"
+            elif char == "[":
+                end = pattern.find("]", index + 1)
+                if end < 0:
+                    regex += re.escape(char)
+                else:
+                    charClass = pattern[index + 1:end]
+                    if charClass.startswith("!"):
+                        charClass = "^" + charClass[1:]
+                    regex += "[{}]".format(charClass.replace("\\", "\\\\"))
+                    index = end
+            elif char == "\\" and index + 1 < len(pattern):
+                index += 1
+                regex += re.escape(pattern[index])
+            else:
+                regex += re.escape(char)
+            index += 1
+        return regex
+
+    def matches(self, relPath, isFolder):
+        """@param relPath A path relative to the project folder using / separators.
+           @param isFolder True if the path is a folder.
+           @return True if the pattern matches the path."""
+        if self.folderOnly and not isFolder:
+            return False
+        return self._regex.match(relPath) is not None
+
+
+class IgnoreRules(object):
+    """@brief Responsible for deciding which files and folders in a project are not placed in the
+              package using gitignore style patterns. The patterns are compiled once. They are
+              applied as the project folders are walked so a folder that is ignored is never
+              copied. As with gitignore the last pattern that matches a path decides if it is
+              ignored and a file cannot be included again if the folder it is in is ignored."""
+
+    DEFAULT_PATTERNS = ["__pycache__/",
+                        ".pytest_cache/",
+                        ".mypy_cache/",
+                        ".git/"]
+
+    def __init__(self, uio, patternList):
+        """@brief Constructor
+           @param uio A UIO instance
+           @param patternList A list of gitignore style patterns."""
+        self._uio = uio
+        self._patternList = []
+        for pattern in patternList:
+            pattern = pattern.rstrip("\r\n")
+            # As with gitignore trailing spaces are ignored unless escaped.
+            if not pattern.endswith("\\ "):
+                pattern = pattern.rstrip(" ")
+            if not pattern or pattern.startswith("#"):
+                continue
+            self._patternList.append(IgnorePattern(pattern))
+        self._prunedList = []
+
+    @staticmethod
+    def load(uio, ignoreFile):
+        """@brief Create an instance from the default patterns and the patterns in a file.
+           @param uio A UIO instance
+           @param ignoreFile The file holding the patterns, one per line. This need not exist.
+           @return An IgnoreRules instance."""
+        patternList = list(IgnoreRules.DEFAULT_PATTERNS)
+        if os.path.isfile(ignoreFile):
+            with open(ignoreFile) as fd:
+                patternList += fd.readlines()
+            uio.info("Loaded ignore patterns from {}".format(ignoreFile))
+        return IgnoreRules(uio, patternList)
+
+    def isIgnored(self, relPath, isFolder):
+        """@param relPath A path relative to the project folder.
+           @param isFolder True if the path is a folder.
+           @return True if the path is not to be placed in the package."""
+        relPath = os.path.normpath(relPath).replace(os.sep, "/")
+        ignored = False
+        for pattern in self._patternList:
+            if pattern.negate == ignored and pattern.matches(relPath, isFolder):
+                ignored = not pattern.negate
+        return ignored
+
+    def getExcludeFunc(self, srcFolder, relFolder):
+        """@brief Get a function to be passed to Stager.copyTree() to prune the ignored files and folders.
+           @param srcFolder The folder being copied.
+           @param relFolder The path of the folder relative to the project folder.
+           @return A function that is called with a path relative to srcFolder and returns True if the
+                   path is ignored."""
+        def excludeFunc(relPath):
+            srcPath = os.path.normpath(os.path.join(srcFolder, relPath))
+            isFolder = os.path.isdir(srcPath)
+            if self.isIgnored(os.path.join(relFolder, relPath), isFolder):
+                self._prunedList.append((srcPath, isFolder))
+                return True
+            return False
+        return excludeFunc
+
+    def _getSize(self, path):
+        """@param path A file or folder.
+           @return The size of the file or the files in the folder in bytes."""
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+        size = 0
+        for root, dirs, files in os.walk(path):
+            for _file in files:
+                _file = os.path.join(root, _file)
+                if not os.path.islink(_file):
+                    size += os.path.getsize(_file)
+        return size
+
+    def showSummary(self, showSizes=False):
+        """@brief Show the files and folders that were pruned.
+           @param showSizes If True the bytes that were not copied are shown. This reads every
+                  pruned folder so it is not done by default."""
+        if not self._prunedList:
+            return
+        totalBytes = 0
+        for prunedPath, isFolder in self._prunedList:
+            if showSizes:
+                size = self._getSize(prunedPath)
+                totalBytes += size
+                self._uio.info("Pruned {} ({} bytes)".format(prunedPath, size))
+            else:
+                self._uio.info("Pruned {}".format(prunedPath))
+        folders = len([isFolder for _, isFolder in self._prunedList if isFolder])
+        summary = "Pruned {} folders and {} files from the package".format(folders, len(self._prunedList) - folders)
+        if showSizes:
+            summary = "{} ({} bytes)".format(summary, totalBytes)
+        self._uio.info("{}.".format(summary))
+        self._prunedList = []
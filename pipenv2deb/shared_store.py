@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+
+"""@brief Installs the python packages used by pipenvpkg applications into a store that is shared
+          by all the applications on a machine. Each package is installed once under a name made
+          from it's name, version and hashes in the Pipfile.lock file and the virtual environment
+          of each application is made from hard links (or symbolic links if the store is on a
+          different filesystem) to the files in the store. The store records the packages used
+          by each application so that packages no longer used by any application are removed.
+
+          This file is copied into packages built with the pipenv2deb --shared_store option and
+          is run by the package maintainer scripts so it must only use the python standard library."""
+
+import os
+import sys
+import json
+import glob
+import fcntl
+import shutil
+import hashlib
+import platform
+from optparse import OptionParser
+from subprocess import check_call, call, CalledProcessError
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SharedStoreError(Exception):
+    pass
+
+
+class StoreUIO(object):
+    """@brief Responsible for user output"""
+
+    def info(self, line):
+        """@brief Show an info level message
+           @param line The line of text."""
+        print('INFO:  %s' % (line))
+
+    def error(self, line):
+        """@brief Show an error level message
+           @param line The line of text."""
+        print('ERROR: %s' % (line))
+
+
+class SharedStore(object):
+    """@brief Responsible for the packages in the shared store and the virtual environments made from them."""
+
+    DEFAULT_STORE_FOLDER = "/var/lib/pipenv2deb/store"
+    SCRIPT_NAME = "shared_store.py"
+    DISTS_FOLDER = "dists"
+    OWNERS_FOLDER = "owners"
+    LOCK_FILE = ".lock"
+    TMP_PREFIX = ".tmp-"
+    LOCK_SECTION = "default"
+    DIGEST_LENGTH = 16
+    SCRIPTS_FOLDER = "bin"
+
+    def __init__(self, uio, storeFolder):
+        """@brief Constructor
+           @param uio A StoreUIO instance
+           @param storeFolder The store folder."""
+        self._uio = uio
+        self._storeFolder = storeFolder
+        self._distsFolder = os.path.join(storeFolder, SharedStore.DISTS_FOLDER)
+        self._ownersFolder = os.path.join(storeFolder, SharedStore.OWNERS_FOLDER)
+        self._lockFd = None
+
+    def _lock(self):
+        """@brief Create the store folders and lock the store so that only one maintainer script changes it at a time."""
+        for folder in (self._distsFolder, self._ownersFolder):
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+        self._lockFd = open(os.path.join(self._storeFolder, SharedStore.LOCK_FILE), 'w')
+        fcntl.flock(self._lockFd.fileno(), fcntl.LOCK_EX)
+
+    def _unlock(self):
+        """@brief Unlock the store."""
+        if self._lockFd:
+            fcntl.flock(self._lockFd.fileno(), fcntl.LOCK_UN)
+            self._lockFd.close()
+            self._lockFd = None
+
+    @staticmethod
+    def getEntryName(name, version, hashes):
+        """@brief Get the name of the folder in the store that a package is installed into. This includes
+                  the python version and machine type as packages may hold native libraries.
+           @param name The package name.
+           @param version The package version (E.G ==2.31.0).
+           @param hashes The list of hashes of the package files from the Pipfile.lock file.
+           @return The folder name."""
+        digest = hashlib.sha256("\n".join(sorted(hashes)).encode()).hexdigest()[:SharedStore.DIGEST_LENGTH]
+        name = name.lower().replace("_", "-").replace(".", "-")
+        return "{}-{}-{}-{}-{}".format(name, version.lstrip("="), sys.implementation.cache_tag, platform.machine(), digest)
+
+    def _getLockedPackages(self, lockFile):
+        """@brief Get the packages pinned in a Pipfile.lock file.
+           @param lockFile The Pipfile.lock file.
+           @return A list of dicts each with name, version, hashes and markers keys."""
+        try:
+            with open(lockFile) as fd:
+                lockDict = json.load(fd)
+        except ValueError:
+            raise SharedStoreError("{} is not a valid Pipfile.lock file.".format(lockFile))
+
+        packageList = []
+        for name, attrs in sorted(lockDict.get(SharedStore.LOCK_SECTION, {}).items()):
+            version = attrs.get("version")
+            hashes = attrs.get("hashes")
+            if not version or not hashes:
+                raise SharedStoreError("{} in {} is not pinned to a version with hashes (VCS, path and editable packages are not supported).".format(name, lockFile))
+            packageList.append({"name": name,
+                                "version": version,
+                                "hashes": hashes,
+                                "markers": attrs.get("markers")})
+        return packageList
+
+    def _installEntry(self, python, package, wheelhouse):
+        """@brief Install a package into the store.
+           @param python The python interpreter used to run pip.
+           @param package A dict as returned by _getLockedPackages().
+           @param wheelhouse A folder holding the wheels to install from or None to use the package index.
+           @return True if the package was installed, False if it is not required on this machine (E.G
+                   it's markers do not match)."""
+        entryName = SharedStore.getEntryName(package["name"], package["version"], package["hashes"])
+        tmpFolder = os.path.join(self._distsFolder, "{}{}".format(SharedStore.TMP_PREFIX, entryName))
+        if os.path.isdir(tmpFolder):
+            shutil.rmtree(tmpFolder)
+        requirementsFile = "{}.txt".format(tmpFolder)
+        line = "{}{}".format(package["name"], package["version"])
+        if package["markers"]:
+            line = "{} ; {}".format(line, package["markers"])
+        for _hash in package["hashes"]:
+            line = "{} --hash={}".format(line, _hash)
+        with open(requirementsFile, 'w') as fd:
+            fd.write(line + "\n")
+
+        installCmd = [python, "-m", "pip", "install", "--quiet",
+                      "--no-deps",
+                      "--no-cache-dir",
+                      "--disable-pip-version-check",
+                      "--require-hashes",
+                      "--target", tmpFolder,
+                      "-r", requirementsFile]
+        if wheelhouse:
+            installCmd += ["--no-index", "--find-links", wheelhouse]
+        try:
+            check_call(installCmd)
+        except (OSError, CalledProcessError):
+            raise SharedStoreError("Failed to install {}{} into the shared store.".format(package["name"], package["version"]))
+        finally:
+            os.remove(requirementsFile)
+
+        # pip does not install a package whose markers do not match this machine.
+        if not glob.glob(os.path.join(tmpFolder, "*.dist-info")):
+            shutil.rmtree(tmpFolder, ignore_errors=True)
+            return False
+
+        entryFolder = os.path.join(self._distsFolder, entryName)
+        # The compiled files are shared as well.
+        # Files that fail to compile (E.G test data) are left as python files.
+        call([python, "-m", "compileall", "-q", "-d", entryFolder, tmpFolder])
+        os.rename(tmpFolder, entryFolder)
+        self._uio.info("Added {} to the shared store.".format(entryName))
+        return True
+
+    def _expandLink(self, linkPath):
+        """@brief Replace a symbolic link to a folder with a folder holding symbolic links to each of the
+                  entries in the folder so that the entries of another package can be added to it.
+           @param linkPath The symbolic link."""
+        targetFolder = os.readlink(linkPath)
+        os.remove(linkPath)
+        os.makedirs(linkPath)
+        for name in os.listdir(targetFolder):
+            os.symlink(os.path.join(targetFolder, name), os.path.join(linkPath, name))
+
+    def _linkTree(self, srcPath, destPath, hardLink):
+        """@brief Link a file or folder in the store into a virtual environment.
+           @param srcPath The file or folder in the store.
+           @param destPath The path in the virtual environment.
+           @param hardLink If True folders are created and files are hard linked, else a symbolic link
+                  to srcPath is created."""
+        isFolder = os.path.isdir(srcPath) and not os.path.islink(srcPath)
+        if isFolder and os.path.isdir(destPath):
+            # Folders such as __pycache__ and namespace packages hold the files of several packages.
+            if os.path.islink(destPath):
+                self._expandLink(destPath)
+            for name in os.listdir(srcPath):
+                self._linkTree(os.path.join(srcPath, name), os.path.join(destPath, name), hardLink)
+            return
+
+        if os.path.lexists(destPath):
+            if os.path.isdir(destPath) and not os.path.islink(destPath):
+                shutil.rmtree(destPath)
+            else:
+                os.remove(destPath)
+
+        if not hardLink:
+            os.symlink(srcPath, destPath)
+        elif isFolder:
+            os.makedirs(destPath)
+            for name in os.listdir(srcPath):
+                self._linkTree(os.path.join(srcPath, name), os.path.join(destPath, name), hardLink)
+        elif os.path.islink(srcPath):
+            os.symlink(os.readlink(srcPath), destPath)
+        else:
+            os.link(srcPath, destPath)
+
+    def _copyScripts(self, scriptsFolder, venvFolder):
+        """@brief Copy the scripts (E.G console entry points) of a package into a virtual environment.
+                  The scripts are copied rather than linked as their #! line must run the python
+                  interpreter in the virtual environment.
+           @param scriptsFolder The scripts folder of the package in the store.
+           @param venvFolder The virtual environment folder."""
+        binFolder = os.path.join(venvFolder, "bin")
+        for name in os.listdir(scriptsFolder):
+            srcFile = os.path.join(scriptsFolder, name)
+            if not os.path.isfile(srcFile):
+                continue
+            with open(srcFile, 'rb') as fd:
+                content = fd.read()
+            if content.startswith(b"#!") and b"python" in content.split(b"\n", 1)[0]:
+                content = b"#!" + os.path.join(binFolder, "python").encode() + b"\n" + content.split(b"\n", 1)[1]
+            destFile = os.path.join(binFolder, name)
+            if os.path.lexists(destFile):
+                os.remove(destFile)
+            with open(destFile, 'wb') as fd:
+                fd.write(content)
+            os.chmod(destFile, 0o755)
+
+    def _linkEntry(self, entryFolder, venvFolder, sitePackages, hardLink):
+        """@brief Add a package in the store to a virtual environment.
+           @param entryFolder The folder of the package in the store.
+           @param venvFolder The virtual environment folder.
+           @param sitePackages The site-packages folder of the virtual environment.
+           @param hardLink If True the files are hard linked, else the top level files and folders are symbolic links."""
+        for name in os.listdir(entryFolder):
+            srcPath = os.path.join(entryFolder, name)
+            if name == SharedStore.SCRIPTS_FOLDER:
+                self._copyScripts(srcPath, venvFolder)
+            else:
+                self._linkTree(srcPath, os.path.join(sitePackages, name), hardLink)
+
+    def _getOwnerFile(self, owner):
+        """@param owner The name of the debian package that uses the store.
+           @return The file that records the store entries used by the owner."""
+        return os.path.join(self._ownersFolder, "{}.json".format(owner))
+
+    def _getFolderSize(self, folder):
+        """@return The size of the files in a folder in bytes."""
+        size = 0
+        for root, dirs, files in os.walk(folder):
+            for _file in files:
+                _file = os.path.join(root, _file)
+                if not os.path.islink(_file):
+                    size += os.path.getsize(_file)
+        return size
+
+    def _collectGarbage(self):
+        """@brief Remove the packages in the store that are not used by any owner."""
+        usedEntries = set()
+        for ownerFile in glob.glob(os.path.join(self._ownersFolder, "*.json")):
+            try:
+                with open(ownerFile) as fd:
+                    usedEntries.update(json.load(fd).get("entries", []))
+            except ValueError:
+                self._uio.error("{} is not a valid owner file.".format(ownerFile))
+                # Keep everything as the packages used by the owner are unknown.
+                return
+
+        removed = 0
+        removedBytes = 0
+        for entryName in os.listdir(self._distsFolder):
+            entryPath = os.path.join(self._distsFolder, entryName)
+            if entryName in usedEntries:
+                continue
+            if os.path.isdir(entryPath):
+                removedBytes += self._getFolderSize(entryPath)
+                shutil.rmtree(entryPath)
+            else:
+                os.remove(entryPath)
+            removed += 1
+        if removed > 0:
+            self._uio.info("Removed {} unused packages ({} bytes) from the shared store.".format(removed, removedBytes))
+
+    def install(self, owner, lockFile, venvFolder, wheelhouse=None, threads=None):
+        """@brief Create the virtual environment of an application from the packages in a Pipfile.lock
+                  file. Packages not already in the store are installed into it.
+           @param owner The name of the debian package that holds the application.
+           @param lockFile The Pipfile.lock file.
+           @param venvFolder The virtual environment folder to create.
+           @param wheelhouse A folder holding the wheels to install from or None to use the package index.
+           @param threads The number of packages installed into the store at the same time. If None
+                  the number of CPU cores is used."""
+        packageList = self._getLockedPackages(lockFile)
+        venvFolder = os.path.abspath(venvFolder)
+        if wheelhouse:
+            wheelhouse = os.path.abspath(wheelhouse)
+        self._lock()
+        try:
+            if os.path.isdir(venvFolder):
+                shutil.rmtree(venvFolder)
+            check_call([sys.executable, "-m", "venv", venvFolder])
+            python = os.path.join(venvFolder, "bin", "python")
+            sitePackages = glob.glob(os.path.join(venvFolder, "lib", "python*", "site-packages"))[0]
+
+            missingList = []
+            for package in packageList:
+                entryName = SharedStore.getEntryName(package["name"], package["version"], package["hashes"])
+                if not os.path.isdir(os.path.join(self._distsFolder, entryName)):
+                    missingList.append(package)
+            with ThreadPoolExecutor(max_workers=threads or os.cpu_count() or 1) as executor:
+                list(executor.map(lambda package: self._installEntry(python, package, wheelhouse), missingList))
+
+            hardLink = os.stat(self._distsFolder).st_dev == os.stat(sitePackages).st_dev
+            entryList = []
+            for package in packageList:
+                entryName = SharedStore.getEntryName(package["name"], package["version"], package["hashes"])
+                entryFolder = os.path.join(self._distsFolder, entryName)
+                if os.path.isdir(entryFolder):
+                    self._linkEntry(entryFolder, venvFolder, sitePackages, hardLink)
+                    entryList.append(entryName)
+
+            with open(self._getOwnerFile(owner), 'w') as fd:
+                json.dump({"venv": venvFolder, "entries": entryList}, fd, indent=2)
+            self._uio.info("Created {} from {} packages in the shared store ({}).".format(
+                venvFolder, len(entryList), "hard links" if hardLink else "symbolic links"))
+
+            # Keep a copy of this script so that it can be run by the postrm script once the
+            # package that held it has been removed.
+            storeScript = os.path.join(self._storeFolder, SharedStore.SCRIPT_NAME)
+            if os.path.abspath(__file__) != storeScript:
+                shutil.copy(os.path.abspath(__file__), storeScript)
+
+            self._collectGarbage()
+        finally:
+            self._unlock()
+
+    def release(self, owner, venvFolder=None):
+        """@brief Remove the record of the packages used by an application and remove the packages that
+                  are no longer used by any application.
+           @param owner The name of the debian package that held the application.
+           @param venvFolder If not None the virtual environment folder of the application. This is removed."""
+        self._lock()
+        try:
+            ownerFile = self._getOwnerFile(owner)
+            if os.path.isfile(ownerFile):
+                os.remove(ownerFile)
+            if venvFolder and os.path.isdir(venvFolder):
+                shutil.rmtree(venvFolder)
+            self._collectGarbage()
+        finally:
+            self._unlock()
+
+    def gc(self):
+        """@brief Remove the packages that are not used by any application."""
+        self._lock()
+        try:
+            self._collectGarbage()
+        finally:
+            self._unlock()
+
+
+def main():
+    uio = StoreUIO()
+    opts = OptionParser(usage="usage: %prog [options] install|release|gc\n"
+                              "Manage the python packages shared by the pipenvpkg applications on this machine.")
+    opts.add_option("--debug", help="Enable debugging.", action="store_true", default=False)
+    opts.add_option("--store", help="The shared store folder (default={}).".format(SharedStore.DEFAULT_STORE_FOLDER), default=SharedStore.DEFAULT_STORE_FOLDER)
+    opts.add_option("--owner", help="The name of the debian package that holds the application (install and release).", default=None)
+    opts.add_option("--lock", help="The Pipfile.lock file (install).", default="Pipfile.lock")
+    opts.add_option("--venv", help="The virtual environment folder of the application (install and release).", default=None)
+    opts.add_option("--wheelhouse", help="A folder holding the wheels to install (install). If not set the packages are downloaded from the package index.", default=None)
+
+    try:
+        (options, args) = opts.parse_args()
+        if len(args) != 1 or args[0] not in ("install", "release", "gc"):
+            raise SharedStoreError("install, release or gc must be given.")
+        command = args[0]
+        if command in ("install", "release") and not options.owner:
+            raise SharedStoreError("--owner must be set.")
+
+        sharedStore = SharedStore(uio, options.store)
+        if command == "install":
+            if not options.venv:
+                raise SharedStoreError("--venv must be set.")
+            sharedStore.install(options.owner, options.lock, options.venv, options.wheelhouse)
+        elif command == "release":
+            sharedStore.release(options.owner, options.venv)
+        else:
+            sharedStore.gc()
+
+    # If the program throws a system exit exception
+    except SystemExit:
+        pass
+    # Don't print error information if CTRL C pressed
+    except KeyboardInterrupt:
+        pass
+    except Exception as ex:
+        if options.debug:
+            raise
+
+        else:
+            uio.error(str(ex))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
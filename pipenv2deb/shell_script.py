@@ -0,0 +1,23 @@
+def getTimedCommandLines(description, cmdList, exitOnError):
+    """@brief Get the shell script lines that run a list of commands and record how long they took.
+              The commands run in a subshell that stops at the first command that fails. The time
+              taken and the exit status are written to stdout and to syslog (if logger is available)
+              so that install times can be collected from the machines a package is installed on.
+       @param description A description of what the commands do (E.G dependency install). This is
+                          placed in a double quoted shell string so may include $(pwd) etc.
+       @param cmdList A list of the shell commands to run.
+       @param exitOnError If True the script exits with the exit status of the commands if they fail.
+                          If False the script continues after the commands have run.
+       @return A list of the script lines (without line terminators)."""
+    lines = ["PIPENV2DEB_START=$(date +%s)",
+             "(",
+             "set -e"]
+    lines += cmdList
+    lines += [")",
+              "PIPENV2DEB_STATUS=$?",
+              'PIPENV2DEB_MSG="pipenv2deb: {} took $(($(date +%s) - PIPENV2DEB_START)) seconds (exit status $PIPENV2DEB_STATUS)"'.format(description),
+              'echo "$PIPENV2DEB_MSG"',
+              'logger -t pipenv2deb "$PIPENV2DEB_MSG" 2>/dev/null || true']
+    if exitOnError:
+        lines.append('[ "$PIPENV2DEB_STATUS" -eq 0 ] || exit "$PIPENV2DEB_STATUS"')
+    return lines
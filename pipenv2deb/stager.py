@@ -0,0 +1,742 @@
+import os
+import io
+import json
+import stat
+import time
+import fcntl
+import shutil
+import tarfile
+import hashlib
+
+
+def fileSHA256(filename, blockSize=1024*1024):
+    """@brief Get the SHA256 digest of a file's contents.
+       @param filename The file to read.
+       @param blockSize The number of bytes to read at a time.
+       @return The hex digest string."""
+    sha256 = hashlib.sha256()
+    with open(filename, 'rb') as fd:
+        while True:
+            block = fd.read(blockSize)
+            if not block:
+                break
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class StageEntry(object):
+    """@brief Describes a file, folder or symbolic link that is to be placed in a package."""
+
+    FILE = "file"
+    FOLDER = "folder"
+    SYMLINK = "symlink"
+
+    def __init__(self, path, entryType, mode, mtime, srcFile=None, data=None, linkTarget=None):
+        """@brief Constructor
+           @param path The path relative to the root of the build folder (E.G usr/local/bin/app).
+           @param entryType FILE, FOLDER or SYMLINK.
+           @param mode The permission bits.
+           @param mtime The modification time in seconds since the epoch.
+           @param srcFile For a FILE entry the file that holds the contents.
+           @param data For a FILE entry, the contents (bytes) if srcFile is None.
+           @param linkTarget For a SYMLINK entry the target of the link."""
+        self.path = path
+        self.entryType = entryType
+        self.mode = mode
+        self.mtime = mtime
+        self.srcFile = srcFile
+        self.data = data
+        self.linkTarget = linkTarget
+
+    def getSize(self):
+        """@return The size of the file contents in bytes (0 if not a file)."""
+        if self.entryType != StageEntry.FILE:
+            return 0
+        if self.srcFile:
+            return os.path.getsize(self.srcFile)
+        return len(self.data)
+
+    def open(self):
+        """@return A binary file object to read the file contents from."""
+        if self.srcFile:
+            return open(self.srcFile, 'rb')
+        return io.BytesIO(self.data)
+
+    def read(self):
+        """@return The file contents (bytes)."""
+        with self.open() as fd:
+            return fd.read()
+
+    def getTarInfo(self, arcName):
+        """@brief Get a tar archive member for this entry. All members are owned by root.
+           @param arcName The name of the member in the archive.
+           @return A tarfile.TarInfo instance."""
+        tarInfo = tarfile.TarInfo(arcName)
+        tarInfo.mode = self.mode
+        tarInfo.mtime = int(self.mtime)
+        tarInfo.uid = 0
+        tarInfo.gid = 0
+        tarInfo.uname = "root"
+        tarInfo.gname = "root"
+        if self.entryType == StageEntry.FOLDER:
+            tarInfo.type = tarfile.DIRTYPE
+        elif self.entryType == StageEntry.SYMLINK:
+            tarInfo.type = tarfile.SYMTYPE
+            tarInfo.linkname = self.linkTarget
+        else:
+            tarInfo.size = self.getSize()
+        return tarInfo
+
+    def addToTar(self, tar, arcName):
+        """@brief Add this entry to a tar archive.
+           @param tar An open tarfile.TarFile instance.
+           @param arcName The name of the member in the archive."""
+        tarInfo = self.getTarInfo(arcName)
+        if self.entryType == StageEntry.FILE:
+            with self.open() as fd:
+                tar.addfile(tarInfo, fd)
+        else:
+            tar.addfile(tarInfo)
+
+
+class Stager(object):
+    """@brief Responsible for placing files into the build folder.
+              All files that end up in the build folder are copied or written through an instance of this class.
+              When a manifest file is given the build folder is kept between runs and only files whose source
+              has changed since the last build are copied (incremental staging)."""
+
+    MANIFEST_VERSION = 1
+    COPY_BLOCK_SIZE = 1024*1024
+    LINK_MODE_COPY = "copy"
+    LINK_MODE_HARDLINK = "hardlink"
+    LINK_MODE_REFLINK = "reflink"
+    LINK_MODE_AUTO = "auto"
+    LINK_MODES = [LINK_MODE_COPY, LINK_MODE_HARDLINK, LINK_MODE_REFLINK, LINK_MODE_AUTO]
+    # The linux FICLONE ioctl used to create a reflink (copy on write clone) of a file.
+    FICLONE = 0x40049409
+
+    def __init__(self, uio, buildFolder, manifestFile=None, linkMode=LINK_MODE_COPY):
+        """@brief Constructor
+           @param uio A UIO instance
+           @param buildFolder The folder that files are staged into.
+           @param manifestFile The file that holds the state of the last build. If None then
+                  incremental staging is disabled and every file is copied.
+           @param linkMode One of LINK_MODES. Defines how files are staged when the caller
+                  allows files to be linked rather than copied."""
+        self._uio = uio
+        self._buildFolder = buildFolder
+        self._manifestFile = manifestFile
+        self._linkMode = linkMode
+        self._previous = {}
+        self._current = {}
+        self._filesCopied = 0
+        self._bytesCopied = 0
+        self._filesSkipped = 0
+        self._bytesSkipped = 0
+        self._filesRemoved = 0
+        self._filesLinked = 0
+        self._bytesLinked = 0
+
+    def isIncremental(self):
+        """@return True if files are only copied when their source has changed."""
+        return self._manifestFile is not None
+
+    def getBytesCopied(self):
+        """@return The number of bytes copied into the build folder."""
+        return self._bytesCopied
+
+    def getFilesCopied(self):
+        """@return The number of files copied into the build folder."""
+        return self._filesCopied
+
+    def begin(self):
+        """@brief Start staging. If incremental staging is enabled the manifest of the
+                  last build is loaded. If no usable manifest exists then the build folder
+                  is removed as its state is unknown."""
+        self._current = {}
+        self._filesCopied = 0
+        self._bytesCopied = 0
+        self._filesSkipped = 0
+        self._bytesSkipped = 0
+        self._filesRemoved = 0
+        self._filesLinked = 0
+        self._bytesLinked = 0
+        if not self.isIncremental():
+            return
+
+        self._previous = {}
+        if os.path.isfile(self._manifestFile):
+            try:
+                with open(self._manifestFile) as fd:
+                    manifest = json.load(fd)
+                if manifest.get("version") == Stager.MANIFEST_VERSION:
+                    self._previous = manifest.get("entries", {})
+            except ValueError:
+                self._previous = {}
+
+        if not self._previous and os.path.isdir(self._buildFolder):
+            shutil.rmtree(self._buildFolder)
+            self._uio.info("No previous staging manifest. Removed {} path".format(self._buildFolder))
+
+    def resume(self):
+        """@brief Start staging the changes to a build folder that was completed by finish(). Unlike
+                  begin() the files that were staged are kept unless unstageFile() is called, so
+                  only the files that have changed need to be staged again. Incremental staging
+                  must be enabled."""
+        self._previous = dict(self._current)
+        self._filesCopied = 0
+        self._bytesCopied = 0
+        self._filesSkipped = 0
+        self._bytesSkipped = 0
+        self._filesRemoved = 0
+        self._filesLinked = 0
+        self._bytesLinked = 0
+
+    def _getKey(self, destFile):
+        """@brief Get the manifest key for a file in the build folder.
+           @param destFile The path of the file in the build folder.
+           @return The path relative to the build folder."""
+        return os.path.relpath(destFile, self._buildFolder)
+
+    def _isUnchanged(self, key, srcFile, srcStat, destFile):
+        """@brief Determine if a previously staged file is up to date.
+           @param key The manifest key of the file.
+           @param srcFile The source file.
+           @param srcStat The os.stat() result of the source file.
+           @param destFile The staged file.
+           @return The previous manifest entry if the staged file can be kept, else None."""
+        entry = self._previous.get(key)
+        if not entry or entry.get("src") != srcFile:
+            return None
+
+        try:
+            destStat = os.stat(destFile)
+        except OSError:
+            return None
+
+        # The staged file must be exactly as it was left by the last build.
+        if destStat.st_size != entry["dest_size"] or \
+           destStat.st_mtime_ns != entry["dest_mtime_ns"] or \
+           destStat.st_mode != entry["dest_mode"]:
+            return None
+
+        if srcStat.st_size != entry["size"]:
+            return None
+
+        if srcStat.st_mtime_ns == entry["mtime_ns"]:
+            return entry
+
+        # The source has been touched, check if the contents have changed.
+        if entry.get("sha256") and fileSHA256(srcFile) == entry["sha256"]:
+            entry = dict(entry)
+            entry["mtime_ns"] = srcStat.st_mtime_ns
+            return entry
+
+        return None
+
+    def _copyData(self, srcFile, destFile):
+        """@brief Copy the contents of a file and calculate it's SHA256 digest as it is copied.
+           @param srcFile The source file.
+           @param destFile The destination file.
+           @return The hex digest of the file contents."""
+        sha256 = hashlib.sha256()
+        with open(srcFile, 'rb') as srcFd:
+            with open(destFile, 'wb') as destFd:
+                while True:
+                    block = srcFd.read(Stager.COPY_BLOCK_SIZE)
+                    if not block:
+                        break
+                    sha256.update(block)
+                    destFd.write(block)
+        return sha256.hexdigest()
+
+    def _reflink(self, srcFile, destFile):
+        """@brief Create a reflink (copy on write clone) of a file. This is supported by
+                  filesystems such as btrfs and xfs.
+           @param srcFile The source file.
+           @param destFile The destination file.
+           @return True if the reflink was created."""
+        try:
+            with open(srcFile, 'rb') as srcFd:
+                with open(destFile, 'wb') as destFd:
+                    fcntl.ioctl(destFd.fileno(), Stager.FICLONE, srcFd.fileno())
+        except OSError:
+            self._removeFile(destFile)
+            return False
+        shutil.copystat(srcFile, destFile)
+        return True
+
+    def _linkFile(self, srcFile, destFile):
+        """@brief Link a file into the build folder rather than copying it's contents.
+           @param srcFile The source file.
+           @param destFile The destination file.
+           @return True if the file was linked, False if it must be copied. This is the case
+                   if the filesystem does not support the link type or the source and build
+                   folders are on different filesystems."""
+        if self._linkMode in (Stager.LINK_MODE_REFLINK, Stager.LINK_MODE_AUTO):
+            if self._reflink(srcFile, destFile):
+                return True
+
+        if self._linkMode in (Stager.LINK_MODE_HARDLINK, Stager.LINK_MODE_AUTO):
+            try:
+                os.link(srcFile, destFile)
+                return True
+            except OSError:
+                pass
+
+        return False
+
+    def _removeFile(self, destFile):
+        """@brief Remove a file from the build folder if it exists.
+           @param destFile The file to remove."""
+        if os.path.islink(destFile) or os.path.isfile(destFile):
+            os.remove(destFile)
+
+    def copyFile(self, srcFile, destFile, allowLink=False):
+        """@brief Copy a file into the build folder. The file mode and times are copied.
+           @param srcFile The source file.
+           @param destFile The destination file or folder. If a folder then the file
+                  keeps its name.
+           @param allowLink If True the file may be hard linked or reflinked (depending upon
+                  the link mode) rather than copied. This must only be set for files that are
+                  not changed once staged as a hard linked file shares its contents and
+                  attributes with the source file.
+           @return None"""
+        if os.path.isdir(destFile):
+            destFile = os.path.join(destFile, os.path.basename(srcFile))
+
+        srcFile = os.path.abspath(srcFile)
+        key = self._getKey(destFile)
+        srcStat = os.stat(srcFile)
+
+        if self.isIncremental():
+            entry = self._isUnchanged(key, srcFile, srcStat, destFile)
+            if entry:
+                self._current[key] = entry
+                self._filesSkipped += 1
+                self._bytesSkipped += srcStat.st_size
+                return
+
+        destFolder = os.path.dirname(destFile)
+        if destFolder and not os.path.isdir(destFolder):
+            os.makedirs(destFolder)
+
+        self._removeFile(destFile)
+        sha256 = None
+        if allowLink and self._linkMode != Stager.LINK_MODE_COPY and self._linkFile(srcFile, destFile):
+            self._filesLinked += 1
+            self._bytesLinked += srcStat.st_size
+        else:
+            sha256 = self._copyData(srcFile, destFile)
+            shutil.copystat(srcFile, destFile)
+            self._filesCopied += 1
+            self._bytesCopied += srcStat.st_size
+
+        self._current[key] = {"src": srcFile,
+                              "size": srcStat.st_size,
+                              "mtime_ns": srcStat.st_mtime_ns,
+                              "sha256": sha256}
+
+    def copyTree(self, srcFolder, destFolder, allowLink=False, excludeFunc=None):
+        """@brief Copy a folder and all it's contents into the build folder.
+                  As with shutil.copytree() symbolic links are followed.
+           @param srcFolder The source folder.
+           @param destFolder The destination folder. This may already exist in which case
+                  the contents of srcFolder are merged into it.
+           @param allowLink If True files may be linked rather than copied (see copyFile()).
+           @param excludeFunc If not None a function that is called with the path (relative to
+                  srcFolder) of each folder and file. If it returns True the folder (and all
+                  it's contents) or file is not copied.
+           @return None"""
+        for root, dirs, files in os.walk(srcFolder, followlinks=True):
+            relRoot = os.path.relpath(root, srcFolder)
+            if excludeFunc:
+                dirs[:] = [_dir for _dir in dirs if not excludeFunc(os.path.join(relRoot, _dir))]
+                files = [_file for _file in files if not excludeFunc(os.path.join(relRoot, _file))]
+            dirs.sort()
+            destRoot = os.path.normpath(os.path.join(destFolder, relRoot))
+            if not os.path.isdir(destRoot):
+                os.makedirs(destRoot)
+            for _file in sorted(files):
+                self.copyFile(os.path.join(root, _file), os.path.join(destRoot, _file), allowLink=allowLink)
+
+    def writeFile(self, destFile, content):
+        """@brief Create a file in the build folder that is generated by pipenv2deb rather than copied.
+           @param destFile The file to create.
+           @param content The contents of the file (str or bytes)."""
+        destFolder = os.path.dirname(destFile)
+        if destFolder and not os.path.isdir(destFolder):
+            os.makedirs(destFolder)
+
+        self._removeFile(destFile)
+        mode = 'wb' if isinstance(content, bytes) else 'w'
+        with open(destFile, mode) as fd:
+            fd.write(content)
+        self._current[self._getKey(destFile)] = {"generated": True}
+
+    def makeSymlink(self, linkTarget, destFile):
+        """@brief Create a symbolic link in the build folder.
+           @param linkTarget The path that the link points to. This need not exist on the build machine.
+           @param destFile The link to create. A folder (E.G left by an earlier incremental build)
+                  with the same name is removed."""
+        destFolder = os.path.dirname(destFile)
+        if destFolder and not os.path.isdir(destFolder):
+            os.makedirs(destFolder)
+
+        key = self._getKey(destFile)
+        if os.path.isdir(destFile) and not os.path.islink(destFile):
+            shutil.rmtree(destFile)
+            # The files that were in the folder must not be removed through the link by finish().
+            for previousKey in [previousKey for previousKey in self._previous if previousKey.startswith(key + os.sep)]:
+                del self._previous[previousKey]
+        self._removeFile(destFile)
+        os.symlink(linkTarget, destFile)
+        self._current[key] = {"generated": True}
+
+    def replaceFile(self, destFile, newFile):
+        """@brief Replace the contents of a staged file. The staged file keeps its mode and
+                  remains associated with its source file. As the staged file is replaced
+                  rather than written to, a source file that is linked to it is not changed.
+           @param destFile The file in the build folder.
+           @param newFile The file holding the new contents. This file is moved into the
+                  build folder."""
+        shutil.copymode(destFile, newFile)
+        self._removeFile(destFile)
+        shutil.move(newFile, destFile)
+
+    def addGenerated(self, destFile):
+        """@brief Record a file that has been created in the build folder by another tool so that
+                  it is removed by a later incremental build if it is no longer created.
+           @param destFile The file in the build folder."""
+        key = self._getKey(destFile)
+        if key not in self._current:
+            self._current[key] = {"generated": True}
+
+    def isStaged(self, destFile):
+        """@param destFile A path in the build folder.
+           @return True if the file has been staged by the current build."""
+        return self._getKey(destFile) in self._current
+
+    def unstageFile(self, destFile):
+        """@brief Remove a staged file (E.G because it's source file has been removed). The file
+                  is removed from the build folder by finish().
+           @param destFile The file in the build folder."""
+        self._current.pop(self._getKey(destFile), None)
+
+    def makeFolder(self, folder):
+        """@brief Create a folder in the build folder.
+           @param folder The folder to create.
+           @return True if the folder was created, False if it already exists."""
+        if os.path.isdir(folder):
+            return False
+        os.makedirs(folder)
+        return True
+
+    def isFile(self, destFile):
+        """@param destFile A path in the build folder.
+           @return True if the file exists in the build folder."""
+        return os.path.isfile(destFile)
+
+    def listFolder(self, folder):
+        """@param folder A folder in the build folder.
+           @return A list of the names of the entries in the folder."""
+        return os.listdir(folder)
+
+    def setMode(self, destFile, mode):
+        """@brief Set the permission bits of a file in the build folder.
+           @param destFile The file in the build folder.
+           @param mode The permission bits."""
+        os.chmod(destFile, mode)
+
+    def readFile(self, destFile):
+        """@param destFile A file in the build folder.
+           @return The contents of the file (bytes)."""
+        with open(destFile, 'rb') as fd:
+            return fd.read()
+
+    def getEntries(self):
+        """@brief Get all the entries in the build folder.
+           @return A list of StageEntry instances sorted by path. Parent folders
+                   precede the entries that they contain."""
+        entryList = []
+        for root, dirs, files in os.walk(self._buildFolder):
+            for name in dirs + files:
+                path = os.path.join(root, name)
+                relPath = os.path.relpath(path, self._buildFolder)
+                pathStat = os.lstat(path)
+                mode = stat.S_IMODE(pathStat.st_mode)
+                if stat.S_ISLNK(pathStat.st_mode):
+                    entry = StageEntry(relPath, StageEntry.SYMLINK, mode, pathStat.st_mtime, linkTarget=os.readlink(path))
+                elif stat.S_ISDIR(pathStat.st_mode):
+                    entry = StageEntry(relPath, StageEntry.FOLDER, mode, pathStat.st_mtime)
+                else:
+                    entry = StageEntry(relPath, StageEntry.FILE, mode, pathStat.st_mtime, srcFile=path)
+                entryList.append(entry)
+        entryList.sort(key=lambda entry: entry.path.split(os.sep))
+        return entryList
+
+    def getSize(self):
+        """@return The total size of the files in the build folder in bytes."""
+        size = 0
+        for root, dirs, files in os.walk(self._buildFolder):
+            for _file in files:
+                _file = os.path.join(root, _file)
+                if not os.path.islink(_file):
+                    size += os.path.getsize(_file)
+        return size
+
+    def finish(self):
+        """@brief Complete staging. If incremental staging is enabled then staged files whose
+                  source no longer exists are removed and the manifest is saved.
+           @return None"""
+        if self._filesLinked > 0:
+            self._uio.info("Linked {} files ({} bytes) into the build folder.".format(self._filesLinked, self._bytesLinked))
+
+        if self.isIncremental():
+            for key in self._previous:
+                if key not in self._current:
+                    destFile = os.path.join(self._buildFolder, key)
+                    if os.path.lexists(destFile):
+                        self._removeFile(destFile)
+                        self._filesRemoved += 1
+                        self._removeEmptyFolders(os.path.dirname(destFile))
+
+            # Record the state the staged files were left in so that any later change
+            # to a staged file (E.G by a previous build) causes it to be copied again.
+            for key, entry in self._current.items():
+                if entry.get("generated"):
+                    continue
+                destStat = os.stat(os.path.join(self._buildFolder, key))
+                entry["dest_size"] = destStat.st_size
+                entry["dest_mtime_ns"] = destStat.st_mtime_ns
+                entry["dest_mode"] = destStat.st_mode
+
+            manifestFolder = os.path.dirname(self._manifestFile)
+            if manifestFolder and not os.path.isdir(manifestFolder):
+                os.makedirs(manifestFolder)
+            with open(self._manifestFile, 'w') as fd:
+                json.dump({"version": Stager.MANIFEST_VERSION, "entries": self._current}, fd)
+
+            self._uio.info("Incremental staging: copied {} files ({} bytes), skipped {} unchanged files ({} bytes), removed {} stale files.".format(
+                self._filesCopied, self._bytesCopied, self._filesSkipped, self._bytesSkipped, self._filesRemoved))
+        else:
+            self._uio.info("Staged {} files ({} bytes).".format(self._filesCopied, self._bytesCopied))
+
+    def _removeEmptyFolders(self, folder):
+        """@brief Remove empty folders from folder up to (but not including) the build folder.
+           @param folder The folder to start at."""
+        buildFolder = os.path.abspath(self._buildFolder)
+        folder = os.path.abspath(folder)
+        while folder != buildFolder and folder.startswith(buildFolder) and os.path.isdir(folder):
+            if os.listdir(folder):
+                break
+            os.rmdir(folder)
+            folder = os.path.dirname(folder)
+
+
+class ManifestStager(object):
+    """@brief Responsible for building an in memory manifest of the files to be placed in a package.
+              This has the same interface as Stager but no files are copied or written to disk.
+              Each entry refers to the original source file or holds the generated file contents
+              so that the package can be written straight from the source files."""
+
+    FOLDER_MODE = 0o755
+    FILE_MODE = 0o644
+
+    def __init__(self, uio, buildFolder):
+        """@brief Constructor
+           @param uio A UIO instance
+           @param buildFolder The (virtual) build folder. Paths passed to this object are
+                  under this folder as they would be with a Stager instance."""
+        self._uio = uio
+        self._buildFolder = buildFolder
+        self._entries = {}
+
+    def isIncremental(self):
+        """@return False. The manifest is created from scratch on each build."""
+        return False
+
+    def getBytesCopied(self):
+        """@return 0. No bytes are copied."""
+        return 0
+
+    def getFilesCopied(self):
+        """@return 0. No files are copied."""
+        return 0
+
+    def begin(self):
+        """@brief Start staging with an empty manifest."""
+        self._entries = {}
+
+    def resume(self):
+        """@brief Start staging the changes to the manifest. The entries in the manifest are kept."""
+        pass
+
+    def _getKey(self, destFile):
+        """@brief Get the manifest key for a path in the build folder.
+           @param destFile The path in the build folder.
+           @return The path relative to the build folder."""
+        return os.path.normpath(os.path.relpath(destFile, self._buildFolder))
+
+    def _getEntry(self, destFile):
+        """@param destFile A path in the build folder.
+           @return The StageEntry instance for the path or None if not present."""
+        return self._entries.get(self._getKey(destFile))
+
+    def _addParentFolders(self, key):
+        """@brief Ensure that all the folders above an entry exist in the manifest.
+           @param key The manifest key of the entry."""
+        parent = os.path.dirname(key)
+        while parent and parent not in self._entries:
+            self._entries[parent] = StageEntry(parent, StageEntry.FOLDER, ManifestStager.FOLDER_MODE, time.time())
+            parent = os.path.dirname(parent)
+
+    def _addEntry(self, entry):
+        """@brief Add an entry to the manifest, replacing any entry with the same path.
+           @param entry The StageEntry instance."""
+        self._addParentFolders(entry.path)
+        self._entries[entry.path] = entry
+
+    def makeFolder(self, folder):
+        """@brief Add a folder to the manifest.
+           @param folder The folder in the build folder.
+           @return True if the folder was added, False if it already exists."""
+        key = self._getKey(folder)
+        if key == os.curdir or key in self._entries:
+            return False
+        self._addEntry(StageEntry(key, StageEntry.FOLDER, ManifestStager.FOLDER_MODE, time.time()))
+        return True
+
+    def copyFile(self, srcFile, destFile, allowLink=False):
+        """@brief Add a file to the manifest that refers to the source file.
+           @param srcFile The source file.
+           @param destFile The file or folder in the build folder. If a folder then the
+                  file keeps its name.
+           @param allowLink Not used. Source files are always referenced rather than copied."""
+        destEntry = self._getEntry(destFile)
+        if destEntry and destEntry.entryType == StageEntry.FOLDER:
+            destFile = os.path.join(destFile, os.path.basename(srcFile))
+
+        srcFile = os.path.abspath(srcFile)
+        srcStat = os.stat(srcFile)
+        self._addEntry(StageEntry(self._getKey(destFile),
+                                  StageEntry.FILE,
+                                  stat.S_IMODE(srcStat.st_mode),
+                                  srcStat.st_mtime,
+                                  srcFile=srcFile))
+
+    def copyTree(self, srcFolder, destFolder, allowLink=False, excludeFunc=None):
+        """@brief Add a folder and all it's contents to the manifest.
+                  As with shutil.copytree() symbolic links are followed.
+           @param srcFolder The source folder.
+           @param destFolder The folder in the build folder.
+           @param allowLink Not used. Source files are always referenced rather than copied.
+           @param excludeFunc If not None a function that is called with the path (relative to
+                  srcFolder) of each folder and file. If it returns True the folder (and all
+                  it's contents) or file is not added."""
+        for root, dirs, files in os.walk(srcFolder, followlinks=True):
+            relRoot = os.path.relpath(root, srcFolder)
+            if excludeFunc:
+                dirs[:] = [_dir for _dir in dirs if not excludeFunc(os.path.join(relRoot, _dir))]
+                files = [_file for _file in files if not excludeFunc(os.path.join(relRoot, _file))]
+            dirs.sort()
+            destRoot = os.path.normpath(os.path.join(destFolder, relRoot))
+            self.makeFolder(destRoot)
+            for _file in sorted(files):
+                self.copyFile(os.path.join(root, _file), os.path.join(destRoot, _file))
+
+    def writeFile(self, destFile, content):
+        """@brief Add a generated file to the manifest.
+           @param destFile The file in the build folder.
+           @param content The contents of the file (str or bytes)."""
+        if not isinstance(content, bytes):
+            content = content.encode()
+        self._addEntry(StageEntry(self._getKey(destFile),
+                                  StageEntry.FILE,
+                                  ManifestStager.FILE_MODE,
+                                  time.time(),
+                                  data=content))
+
+    def makeSymlink(self, linkTarget, destFile):
+        """@brief Add a symbolic link to the manifest.
+           @param linkTarget The path that the link points to.
+           @param destFile The link in the build folder."""
+        self._addEntry(StageEntry(self._getKey(destFile),
+                                  StageEntry.SYMLINK,
+                                  0o777,
+                                  time.time(),
+                                  linkTarget=linkTarget))
+
+    def replaceFile(self, destFile, newFile):
+        """@brief Replace the contents of a file in the manifest. The contents are read into memory
+                  as the new file may be temporary.
+           @param destFile The file in the build folder.
+           @param newFile The file holding the new contents. This file is removed."""
+        entry = self._getEntry(destFile)
+        if entry is None:
+            raise FileNotFoundError("{} not found.".format(destFile))
+        with open(newFile, 'rb') as fd:
+            entry.data = fd.read()
+        entry.srcFile = None
+        os.remove(newFile)
+
+    def unstageFile(self, destFile):
+        """@brief Remove a file from the manifest.
+           @param destFile The file in the build folder."""
+        self._entries.pop(self._getKey(destFile), None)
+
+    def isFile(self, destFile):
+        """@param destFile A path in the build folder.
+           @return True if the file is in the manifest."""
+        entry = self._getEntry(destFile)
+        return entry is not None and entry.entryType == StageEntry.FILE
+
+    def listFolder(self, folder):
+        """@param folder A folder in the build folder.
+           @return A list of the names of the entries in the folder."""
+        key = self._getKey(folder)
+        nameList = []
+        for entryKey in self._entries:
+            if os.path.dirname(entryKey) == key:
+                nameList.append(os.path.basename(entryKey))
+        return nameList
+
+    def setMode(self, destFile, mode):
+        """@brief Set the permission bits of a file in the manifest.
+           @param destFile The file in the build folder.
+           @param mode The permission bits."""
+        entry = self._getEntry(destFile)
+        if entry is None:
+            raise FileNotFoundError("{} not found.".format(destFile))
+        entry.mode = mode
+
+    def readFile(self, destFile):
+        """@param destFile A file in the build folder.
+           @return The contents of the file (bytes)."""
+        entry = self._getEntry(destFile)
+        if entry is None:
+            raise FileNotFoundError("{} not found.".format(destFile))
+        return entry.read()
+
+    def getEntries(self):
+        """@brief Get all the entries in the manifest.
+           @return A list of StageEntry instances sorted by path. Parent folders
+                   precede the entries that they contain."""
+        entryList = list(self._entries.values())
+        entryList.sort(key=lambda entry: entry.path.split(os.sep))
+        return entryList
+
+    def getSize(self):
+        """@return The total size of the files in the manifest in bytes."""
+        size = 0
+        for entry in self._entries.values():
+            size += entry.getSize()
+        return size
+
+    def finish(self):
+        """@brief Complete staging."""
+        fileCount = 0
+        for entry in self._entries.values():
+            if entry.entryType == StageEntry.FILE:
+                fileCount += 1
+        self._uio.info("Staged {} files ({} bytes) in memory.".format(fileCount, self.getSize()))
@@ -0,0 +1,52 @@
+import os
+import time
+import tarfile
+import threading
+
+from pipenv2deb.stager import StageEntry
+
+
+class TgzWriter(object):
+    """@brief Responsible for writing a Slackware style tgz package (the format produced by
+              'alien --to-tgz --scripts') directly from the staged entries."""
+
+    DEBIAN_FOLDER = "DEBIAN"
+    POST_INST_FILE = os.path.join(DEBIAN_FOLDER, "postinst")
+    INSTALL_FOLDER = "install"
+    INSTALL_SCRIPT = os.path.join(INSTALL_FOLDER, "doinst.sh")
+    COMPRESS_LEVEL = 6
+
+    def __init__(self, entryList):
+        """@brief Constructor
+           @param entryList A list of StageEntry instances (as returned by Stager.getEntries())
+                  containing the files to be installed and the DEBIAN folder."""
+        self._entryList = entryList
+
+    def write(self, tgzFile):
+        """@brief Write the tgz file. The file is written under a temporary name and then renamed so an
+                  existing file (which may be linked to the build cache) is never written over. The
+                  temporary file is removed if the tgz file cannot be written.
+           @param tgzFile The tgz file to create."""
+        tmpFile = "{}.tmp{}.{}".format(tgzFile, os.getpid(), threading.get_ident())
+        try:
+            with tarfile.open(tmpFile, "w:gz", compresslevel=TgzWriter.COMPRESS_LEVEL, format=tarfile.GNU_FORMAT) as tar:
+                rootFolder = StageEntry(os.curdir, StageEntry.FOLDER, 0o755, time.time())
+                rootFolder.addToTar(tar, "./")
+                postInstEntry = None
+                for entry in self._entryList:
+                    if entry.path == TgzWriter.POST_INST_FILE:
+                        postInstEntry = entry
+                    if entry.path == TgzWriter.DEBIAN_FOLDER or entry.path.startswith(TgzWriter.DEBIAN_FOLDER + os.sep):
+                        continue
+                    entry.addToTar(tar, "./{}".format(entry.path))
+
+                # alien places the debian postinst script in the slackware install script.
+                if postInstEntry:
+                    installFolder = StageEntry(TgzWriter.INSTALL_FOLDER, StageEntry.FOLDER, 0o755, postInstEntry.mtime)
+                    installFolder.addToTar(tar, "./{}".format(TgzWriter.INSTALL_FOLDER))
+                    postInstEntry.addToTar(tar, "./{}".format(TgzWriter.INSTALL_SCRIPT))
+
+            os.rename(tmpFile, tgzFile)
+        finally:
+            if os.path.isfile(tmpFile):
+                os.remove(tmpFile)
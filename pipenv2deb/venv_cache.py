@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+from subprocess import check_call, check_output, CalledProcessError
+
+from pipenv2deb.wheelhouse import Wheelhouse, WheelhouseError
+
+
+class VenvCacheError(Exception):
+    pass
+
+
+class VenvCache(object):
+    """@brief Responsible for keeping the virtual environments created from Pipfile.lock files on
+              the build machine. Each virtual environment is held under a digest of the lock file
+              and the python interpreter so that a build (E.G of a fresh CI checkout) whose lock
+              file has not changed does not install the dependencies again. The least recently
+              used virtual environments are removed when the cache is larger than it's maximum size.
+              A virtual environment is not removed while a build (in this or another process) uses it."""
+
+    CACHE_FORMAT = "pipenv2deb-venv-cache-1"
+    VENVS_FOLDER = "venvs"
+    VENV_FOLDER = "venv"
+    ENTRY_FILE = "entry.json"
+    LOCK_EXTENSION = ".lock"
+    USE_LOCK_EXTENSION = ".use"
+    TMP_EXTENSION = ".tmp"
+    PYTHON_VERSION_SCRIPT = "import sys, platform; print(sys.implementation.name, platform.python_version(), platform.machine())"
+
+    def __init__(self, uio, cacheFolder, maxSize):
+        """@brief Constructor
+           @param uio A UIO instance
+           @param cacheFolder The build cache folder. The virtual environments are held in the
+                  venvs folder in this folder.
+           @param maxSize The maximum size of all the virtual environments in bytes."""
+        self._uio = uio
+        self._venvsFolder = os.path.join(cacheFolder, VenvCache.VENVS_FOLDER)
+        self._maxSize = maxSize
+        # The files holding a shared lock on each virtual environment used (see release()).
+        self._useLockFdList = []
+
+    def _getPythonVersion(self, python):
+        """@param python The python interpreter.
+           @return A string holding the implementation, version and machine type of the interpreter."""
+        try:
+            return check_output([python, "-c", VenvCache.PYTHON_VERSION_SCRIPT]).decode().strip()
+        except (OSError, CalledProcessError):
+            raise VenvCacheError("Failed to run {}.".format(python))
+
+    def getKey(self, lockFile, pythonVersion):
+        """@brief Get the digest that identifies a virtual environment.
+           @param lockFile The Pipfile.lock file.
+           @param pythonVersion The string returned by _getPythonVersion().
+           @return The hex digest string."""
+        sha256 = hashlib.sha256()
+        sha256.update(VenvCache.CACHE_FORMAT.encode())
+        sha256.update(pythonVersion.encode())
+        with open(lockFile, 'rb') as fd:
+            sha256.update(fd.read())
+        return sha256.hexdigest()
+
+    def getVenv(self, lockFile, python):
+        """@brief Get the virtual environment for a lock file. If the cache does not hold it, it
+                  is created and added to the cache. The virtual environment is not removed from
+                  the cache until release() is called.
+           @param lockFile The Pipfile.lock file.
+           @param python The python interpreter used to create the virtual environment.
+           @return The virtual environment folder."""
+        if not os.path.isfile(lockFile):
+            raise VenvCacheError("{} file not found.".format(lockFile))
+        pythonVersion = self._getPythonVersion(python)
+        key = self.getKey(lockFile, pythonVersion)
+        entryFolder = os.path.join(self._venvsFolder, key)
+        entryFile = os.path.join(entryFolder, VenvCache.ENTRY_FILE)
+        venvFolder = os.path.join(entryFolder, VenvCache.VENV_FOLDER)
+        if not os.path.isdir(self._venvsFolder):
+            os.makedirs(self._venvsFolder, exist_ok=True)
+
+        # A shared lock is held until release() is called so that the virtual environment is not
+        # removed (see _evict()) while it is copied or linked into a build folder.
+        useLockFd = open(entryFolder + VenvCache.USE_LOCK_EXTENSION, 'w')
+        fcntl.flock(useLockFd, fcntl.LOCK_SH)
+        self._useLockFdList.append(useLockFd)
+
+        # Builds that use the same lock file wait for the first one to create the virtual environment.
+        with open(entryFolder + VenvCache.LOCK_EXTENSION, 'w') as lockFd:
+            fcntl.flock(lockFd, fcntl.LOCK_EX)
+            if os.path.isfile(entryFile):
+                # The modification time of the entry file records when it was last used.
+                os.utime(entryFile)
+                self._uio.info("Venv cache hit ({}): using {}".format(key[:12], venvFolder))
+                return venvFolder
+
+            self._uio.info("Venv cache miss ({}): creating {}".format(key[:12], venvFolder))
+            self._create(lockFile, python, pythonVersion, entryFolder)
+
+        self._evict(key)
+        return venvFolder
+
+    def release(self):
+        """@brief Release the virtual environments returned by getVenv() so that they may be removed
+                  from the cache."""
+        for useLockFd in self._useLockFdList:
+            useLockFd.close()
+        self._useLockFdList = []
+
+    def _create(self, lockFile, python, pythonVersion, entryFolder):
+        """@brief Create a virtual environment and install the packages in a lock file into it.
+                  The virtual environment is created in the cache (rather than moved into it) as
+                  the scripts that pip creates hold the path of the python interpreter.
+           @param lockFile The Pipfile.lock file.
+           @param python The python interpreter used to create the virtual environment.
+           @param pythonVersion The string returned by _getPythonVersion().
+           @param entryFolder The cache entry folder."""
+        startTime = time.time()
+        if os.path.isdir(entryFolder):
+            # Left by a build that did not complete.
+            shutil.rmtree(entryFolder)
+        venvFolder = os.path.join(entryFolder, VenvCache.VENV_FOLDER)
+        try:
+            wheelhouse = Wheelhouse(self._uio, lockFile, None, python)
+            packageCount = len(wheelhouse.getLockedPackages())
+            check_call([python, "-m", "venv", venvFolder])
+            if packageCount > 0:
+                requirementsFile = os.path.join(entryFolder, Wheelhouse.REQUIREMENTS_FILE)
+                with open(requirementsFile, 'w') as fd:
+                    fd.write(wheelhouse.getRequirements())
+                check_call([os.path.join(venvFolder, "bin", "python"), "-m", "pip", "install",
+                            "--no-deps",
+                            "--require-hashes",
+                            "-r", requirementsFile])
+                os.remove(requirementsFile)
+        except WheelhouseError as ex:
+            shutil.rmtree(entryFolder, ignore_errors=True)
+            raise VenvCacheError(str(ex))
+        except (OSError, CalledProcessError):
+            shutil.rmtree(entryFolder, ignore_errors=True)
+            raise VenvCacheError("Failed to create a virtual environment from {}.".format(lockFile))
+
+        size = self._getSize(venvFolder)
+        # The entry file is written last as it marks the virtual environment as complete.
+        tmpFile = os.path.join(entryFolder, VenvCache.ENTRY_FILE + VenvCache.TMP_EXTENSION)
+        with open(tmpFile, 'w') as fd:
+            json.dump({"python": pythonVersion,
+                       "packages": packageCount,
+                       "size": size,
+                       "created": time.time()}, fd, indent=2)
+        os.rename(tmpFile, os.path.join(entryFolder, VenvCache.ENTRY_FILE))
+        self._uio.info("Installed {} packages ({} bytes) into the venv cache in {:.2f} seconds.".format(packageCount, size, time.time() - startTime))
+
+    def _getSize(self, folder):
+        """@param folder A folder.
+           @return The size of the files in the folder in bytes."""
+        size = 0
+        for root, dirs, files in os.walk(folder):
+            for _file in files:
+                size += os.lstat(os.path.join(root, _file)).st_size
+        return size
+
+    def getEntries(self):
+        """@brief Get the virtual environments in the cache.
+           @return A list of (last used time, size, key) tuples sorted with the least recently used first."""
+        entryList = []
+        if not os.path.isdir(self._venvsFolder):
+            return entryList
+        for key in os.listdir(self._venvsFolder):
+            entryFile = os.path.join(self._venvsFolder, key, VenvCache.ENTRY_FILE)
+            if not os.path.isfile(entryFile):
+                continue
+            try:
+                with open(entryFile) as fd:
+                    size = json.load(fd)["size"]
+                lastUsed = os.stat(entryFile).st_mtime
+            except (OSError, ValueError, KeyError):
+                continue
+            entryList.append((lastUsed, size, key))
+        entryList.sort()
+        return entryList
+
+    def _evict(self, keepKey):
+        """@brief Remove the least recently used virtual environments until the cache is no larger
+                  than it's maximum size. Virtual environments used by a build are not removed.
+           @param keepKey The key of the virtual environment used by this build. This is never removed."""
+        entryList = self.getEntries()
+        totalSize = sum([size for _, size, _ in entryList])
+        for _, size, key in entryList:
+            if totalSize <= self._maxSize:
+                break
+            if key == keepKey:
+                continue
+            entryFolder = os.path.join(self._venvsFolder, key)
+            with open(entryFolder + VenvCache.USE_LOCK_EXTENSION, 'w') as useLockFd:
+                try:
+                    fcntl.flock(useLockFd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    self._uio.info("The venv ({}) is in use so it was not removed from the venv cache.".format(key[:12]))
+                    continue
+                with open(entryFolder + VenvCache.LOCK_EXTENSION, 'w') as lockFd:
+                    fcntl.flock(lockFd, fcntl.LOCK_EX)
+                    shutil.rmtree(entryFolder, ignore_errors=True)
+            totalSize -= size
+            self._uio.info("Removed the least recently used venv ({}, {} bytes) from the venv cache.".format(key[:12], size))
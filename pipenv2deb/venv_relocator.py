@@ -0,0 +1,77 @@
+import os
+import re
+import tempfile
+
+from pipenv2deb.stager import StageEntry
+
+
+class VenvRelocatorError(Exception):
+    pass
+
+
+class VenvRelocator(object):
+    """@brief Responsible for changing the paths of the build machine folders in a staged virtual
+              environment to the folders that it is installed into. Scripts created by pip hold
+              the path of the python interpreter in the .venv folder in their first line and the
+              activate scripts and pyvenv.cfg file hold the path of the .venv folder. Without this
+              the console scripts in a .venv folder placed in a package (--venv) fail on the
+              target machine. Files that hold the path of a build machine folder and cannot be
+              changed are reported as an error."""
+
+    BYTECODE_EXTENSION = ".pyc"
+    # A path must not be followed by a character that would make it a different path
+    # (E.G /home/user/app must not match /home/user/app2).
+    PATH_END_PATTERN = rb"(?![\w.-])"
+
+    def __init__(self, uio, pathList):
+        """@brief Constructor
+           @param uio A UIO instance
+           @param pathList A list of (build machine folder, target machine folder) tuples. The
+                  real path of each build machine folder is also changed if it is different."""
+        self._uio = uio
+        self._pathDict = {}
+        for srcFolder, targetFolder in pathList:
+            for _srcFolder in (os.path.abspath(srcFolder), os.path.realpath(srcFolder)):
+                self._pathDict.setdefault(_srcFolder.encode(), targetFolder.encode())
+        # The longest path is matched first so that a .venv folder in the project folder is
+        # changed to the target .venv folder.
+        srcPathList = sorted(self._pathDict, key=len, reverse=True)
+        self._pathRegEx = re.compile(b"|".join([re.escape(srcPath) for srcPath in srcPathList]) + VenvRelocator.PATH_END_PATTERN)
+
+    def _relocate(self, data):
+        """@param data The contents of a file (bytes).
+           @return The contents with the build machine folders changed to the target machine folders."""
+        return self._pathRegEx.sub(lambda match: self._pathDict[match.group(0)], data)
+
+    def relocate(self, stager, buildFolder, stagedVenvFolder):
+        """@brief Change the build machine folders in the text files in a staged virtual environment.
+                  Each changed file replaces the staged file so that a source file that is hard
+                  linked into the build folder is not changed.
+           @param stager The Stager or ManifestStager instance that staged the virtual environment.
+           @param buildFolder The build folder.
+           @param stagedVenvFolder The virtual environment folder in the build folder."""
+        venvKey = os.path.relpath(stagedVenvFolder, buildFolder)
+        unchangedList = []
+        filesChanged = 0
+        for entry in stager.getEntries():
+            if entry.entryType != StageEntry.FILE or not entry.path.startswith(venvKey + os.sep):
+                continue
+            # Python replaces the path of the python file in the bytecode when it is loaded.
+            if entry.path.endswith(VenvRelocator.BYTECODE_EXTENSION):
+                continue
+            data = entry.read()
+            if not self._pathRegEx.search(data):
+                continue
+            # The length of a path in a binary file (E.G a native library) cannot be changed.
+            if b"\0" in data:
+                unchangedList.append(entry.path)
+                continue
+            fd, tmpFile = tempfile.mkstemp(prefix="pipenv2deb_relocate_")
+            with os.fdopen(fd, 'wb') as tmpFd:
+                tmpFd.write(self._relocate(data))
+            stager.replaceFile(os.path.join(buildFolder, entry.path), tmpFile)
+            filesChanged += 1
+
+        if unchangedList:
+            raise VenvRelocatorError("The following files in the .venv folder hold the path of a build machine folder and cannot be changed: {}".format(", ".join(unchangedList)))
+        self._uio.info("Changed the build machine folders in {} files in {}".format(filesChanged, stagedVenvFolder))
@@ -0,0 +1,250 @@
+import os
+import re
+import glob
+import shutil
+import fnmatch
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from pipenv2deb.stager import StageEntry
+from pipenv2deb.ignore_rules import IgnorePattern
+
+
+class SlimRule(object):
+    """@brief A named list of glob patterns that select the files and folders in a virtual
+              environment that are not required when the application runs."""
+
+    def __init__(self, name, patternList, keepPackages=False):
+        """@brief Constructor
+           @param name The name of the rule (shown in the summary).
+           @param patternList A list of gitignore style glob patterns (see IgnorePattern). A
+                  pattern containing a / is matched against the path of a file or folder
+                  relative to the virtual environment folder and other patterns are matched
+                  against the name at any level. * does not match / characters.
+           @param keepPackages If True a folder holding an __init__.py file is not matched as
+                  it may be imported by the application."""
+        self.name = name
+        self.patternList = [IgnorePattern(pattern) for pattern in patternList]
+        self.keepPackages = keepPackages
+        self.files = 0
+        self.bytes = 0
+
+    def matches(self, relPath, path=None):
+        """@param relPath A path relative to the virtual environment folder.
+           @param path The path of the file or folder or None if it is not on disk.
+           @return True if the path matches one of the patterns."""
+        isFolder = path is not None and os.path.isdir(path)
+        if self.keepPackages and isFolder and os.path.isfile(os.path.join(path, "__init__.py")):
+            return False
+        relPath = relPath.replace(os.sep, "/")
+        for pattern in self.patternList:
+            if pattern.matches(relPath, isFolder):
+                return True
+        return False
+
+
+class VenvSlimmer(object):
+    """@brief Responsible for removing the files in a virtual environment that are not required
+              when the application runs (test suites, type stubs, docs, pip, bytecode compiled by
+              other python versions) and for removing the debug symbols from native extensions.
+              This reduces the size of packages that include the .venv folder (--venv)."""
+
+    USER_RULES_FILE = "slim_rules.txt"
+    STRIP_RULE_NAME = "strip debug symbols"
+    SITE_PACKAGES = "lib*/python*/site-packages"
+    # Each rule is a tuple of the name, the patterns and if python package folders are kept. The
+    # test and doc folders at the top of each distribution are only removed if they cannot be
+    # imported (E.G numpy/testing or a package holding a doc module must be kept).
+    DEFAULT_RULES = [("tests", [SITE_PACKAGES + "/*/tests/",
+                                SITE_PACKAGES + "/*/test/"], True),
+                     ("type stubs", ["*.pyi"], False),
+                     ("docs", ["share/doc/",
+                               "share/man/",
+                               SITE_PACKAGES + "/*/docs/",
+                               SITE_PACKAGES + "/*/doc/"], True),
+                     ("pip", ["bin/pip",
+                              "bin/pip3*",
+                              SITE_PACKAGES + "/pip/",
+                              SITE_PACKAGES + "/pip-*.dist-info/"], False)]
+    NATIVE_LIBRARY_PATTERNS = ["*.so", "*.so.*"]
+
+    def __init__(self, uio, venvFolder, userRulesFile=None):
+        """@brief Constructor
+           @param uio A UIO instance
+           @param venvFolder The virtual environment folder to be slimmed.
+           @param userRulesFile A file holding additional rules or None. Each line holds a
+                  gitignore style glob pattern. Lines starting with ! hold a pattern for files and
+                  folders that must be kept even if they match another rule. Lines starting with #
+                  are comments."""
+        self._uio = uio
+        self._venvFolder = venvFolder
+        self._keepPatternList = []
+        self._pycFilename = None
+        self._ruleList = []
+        for name, patternList, keepPackages in VenvSlimmer.DEFAULT_RULES:
+            self._ruleList.append(SlimRule(name, patternList, keepPackages))
+
+        bytecodeRule = self._getBytecodeRule()
+        if bytecodeRule:
+            self._ruleList.append(bytecodeRule)
+
+        if userRulesFile and os.path.isfile(userRulesFile):
+            self._loadUserRules(userRulesFile)
+
+        self._stripRule = SlimRule(VenvSlimmer.STRIP_RULE_NAME, VenvSlimmer.NATIVE_LIBRARY_PATTERNS)
+
+    def _getPythonVersion(self):
+        """@brief Get the version of the python interpreter that the virtual environment was created with.
+           @return A tuple containing the major and minor version or None if unknown."""
+        pyvenvCfg = os.path.join(self._venvFolder, "pyvenv.cfg")
+        if os.path.isfile(pyvenvCfg):
+            with open(pyvenvCfg) as fd:
+                for line in fd:
+                    # E.G version = 3.11.4 or version_info = 3.11.4.final.0
+                    match = re.match(r"\s*version(_info)?\s*=\s*(\d+)\.(\d+)", line)
+                    if match:
+                        return (int(match.group(2)), int(match.group(3)))
+
+        libFolderList = glob.glob(os.path.join(self._venvFolder, "lib", "python*.*"))
+        if len(libFolderList) == 1:
+            match = re.match(r"python(\d+)\.(\d+)$", os.path.basename(libFolderList[0]))
+            if match:
+                return (int(match.group(1)), int(match.group(2)))
+
+        return None
+
+    def _getBytecodeRule(self):
+        """@brief Get the rule that removes the compiled python files that will not be used by the
+                  python interpreter in the virtual environment. These are files compiled by
+                  other python versions and optimised (python -O) files.
+           @return A SlimRule instance or None if the python version is unknown."""
+        version = self._getPythonVersion()
+        if version is None:
+            self._uio.info("Unable to determine the python version of {}. Compiled python files are not removed.".format(self._venvFolder))
+            return None
+        self._pycFilename = "*.cpython-{}{}.pyc".format(version[0], version[1])
+        return SlimRule("unused bytecode", ["**/__pycache__/*.pyc"])
+
+    def _loadUserRules(self, userRulesFile):
+        """@brief Load the rules in a user rules file.
+           @param userRulesFile The rules file."""
+        with open(userRulesFile) as fd:
+            for line in fd:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("!"):
+                    self._keepPatternList.append(IgnorePattern(line[1:]))
+                else:
+                    self._ruleList.append(SlimRule(line, [line]))
+        self._uio.info("Loaded slim rules from {}".format(userRulesFile))
+
+    def _isKept(self, relPath, isFolder):
+        """@param relPath A path relative to the virtual environment folder.
+           @param isFolder True if the path is a folder.
+           @return True if the path must be kept."""
+        for pattern in self._keepPatternList:
+            if pattern.matches(relPath.replace(os.sep, "/"), isFolder):
+                return True
+        # Compiled files are kept if they are used by the python interpreter in the virtual environment.
+        return self._pycFilename is not None and fnmatch.fnmatchcase(os.path.basename(relPath), self._pycFilename)
+
+    def _getSize(self, path):
+        """@param path A file or folder.
+           @return A tuple containing the number of files and the size of the files in bytes."""
+        if not os.path.isdir(path):
+            return (1, os.path.getsize(path))
+        files = 0
+        size = 0
+        for root, dirs, fileList in os.walk(path, followlinks=True):
+            for _file in fileList:
+                files += 1
+                size += os.path.getsize(os.path.join(root, _file))
+        return (files, size)
+
+    def isExcluded(self, relPath):
+        """@brief Determine if a file or folder in the virtual environment is removed. This is
+                  called for each folder and file as the virtual environment is staged. When a
+                  folder is removed its contents are not checked so a ! pattern cannot keep a
+                  file in a folder that is removed.
+           @param relPath A path relative to the virtual environment folder.
+           @return True if the file or folder is not to be staged."""
+        relPath = os.path.normpath(relPath)
+        path = os.path.join(self._venvFolder, relPath)
+        if self._isKept(relPath, os.path.isdir(path)):
+            return False
+        for rule in self._ruleList:
+            if rule.matches(relPath, path):
+                files, size = self._getSize(path)
+                rule.files += files
+                rule.bytes += size
+                return True
+        return False
+
+    def _stripFile(self, srcFile, tmpFile):
+        """@brief Write a copy of a native library without it's debug symbols.
+           @param srcFile The library file.
+           @param tmpFile The file to write the stripped library to.
+           @return True if the stripped library is smaller than the library."""
+        try:
+            subprocess.check_call(["strip", "--strip-debug", "-o", tmpFile, srcFile],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except (OSError, subprocess.CalledProcessError):
+            # E.G the file is not an ELF file.
+            return False
+        return os.path.getsize(tmpFile) < os.path.getsize(srcFile)
+
+    def stripLibraries(self, stager, buildFolder, stagedVenvFolder, threads):
+        """@brief Remove the debug symbols from the native libraries in the staged virtual environment.
+                  Each library is stripped to a temporary file which then replaces the staged file
+                  so that a source file that is hard linked into the build folder is not changed.
+           @param stager The Stager or ManifestStager instance that staged the virtual environment.
+           @param buildFolder The build folder.
+           @param stagedVenvFolder The virtual environment folder in the build folder.
+           @param threads The number of libraries to strip at the same time."""
+        if not shutil.which("strip"):
+            self._uio.info("The strip command is not installed. Debug symbols are not removed from native libraries.")
+            return
+
+        venvKey = os.path.relpath(stagedVenvFolder, buildFolder)
+        libraryList = []
+        for entry in stager.getEntries():
+            if entry.entryType != StageEntry.FILE or not entry.path.startswith(venvKey + os.sep):
+                continue
+            if self._stripRule.matches(os.path.basename(entry.path)):
+                libraryList.append(entry)
+
+        tmpFolder = tempfile.mkdtemp(prefix="pipenv2deb_strip_")
+        try:
+            tmpFileList = [os.path.join(tmpFolder, str(index)) for index in range(len(libraryList))]
+            srcFileList = []
+            for entry, tmpFile in zip(libraryList, tmpFileList):
+                srcFile = entry.srcFile
+                if srcFile is None:
+                    # The library contents are held in memory.
+                    srcFile = "{}.src".format(tmpFile)
+                    with open(srcFile, 'wb') as fd:
+                        fd.write(entry.data)
+                srcFileList.append(srcFile)
+
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                strippedList = list(executor.map(self._stripFile, srcFileList, tmpFileList))
+
+            for entry, srcFile, tmpFile, stripped in zip(libraryList, srcFileList, tmpFileList, strippedList):
+                if not stripped:
+                    continue
+                self._stripRule.files += 1
+                self._stripRule.bytes += os.path.getsize(srcFile) - os.path.getsize(tmpFile)
+                stager.replaceFile(os.path.join(buildFolder, entry.path), tmpFile)
+        finally:
+            shutil.rmtree(tmpFolder)
+
+    def showSummary(self):
+        """@brief Show the number of files and bytes removed by each rule."""
+        totalBytes = 0
+        for rule in self._ruleList + [self._stripRule]:
+            if rule.files > 0:
+                self._uio.info("Slim: {}: {} files, {} bytes removed.".format(rule.name, rule.files, rule.bytes))
+                totalBytes += rule.bytes
+        self._uio.info("Slim: {} bytes removed from {} in total.".format(totalBytes, self._venvFolder))
@@ -0,0 +1,174 @@
+import os
+import json
+from subprocess import check_call, CalledProcessError
+
+from pipenv2deb.stager import fileSHA256
+from pipenv2deb.shell_script import getTimedCommandLines
+
+
+class WheelhouseError(Exception):
+    pass
+
+
+class Wheelhouse(object):
+    """@brief Responsible for downloading the wheels for the packages pinned in a Pipfile.lock file
+              so that they can be installed on the target machine without a package index."""
+
+    LOCK_SECTION = "default"
+    REQUIREMENTS_FILE = "requirements.txt"
+    SHA256SUMS_FILE = "SHA256SUMS"
+    WHEEL_EXTENSION = ".whl"
+
+    def __init__(self, uio, lockFile, downloadFolder, python, platformList=None):
+        """@brief Constructor
+           @param uio A UIO instance
+           @param lockFile The Pipfile.lock file.
+           @param downloadFolder The folder that wheels are downloaded to. This is kept between
+                  builds so that wheels are only downloaded once.
+           @param python The python interpreter used to run pip.
+           @param platformList A list of the pip platform tags (E.G manylinux2014_aarch64) of the
+                  target machine. If None the wheels are downloaded for the platform of the
+                  build machine."""
+        self._uio = uio
+        self._lockFile = lockFile
+        self._downloadFolder = downloadFolder
+        self._python = python
+        self._platformList = platformList
+
+    def _loadLockFile(self):
+        """@return The contents of the lock file as a dict."""
+        try:
+            with open(self._lockFile) as fd:
+                return json.load(fd)
+        except ValueError:
+            raise WheelhouseError("{} is not a valid Pipfile.lock file.".format(self._lockFile))
+
+    def getPythonVersion(self):
+        """@brief Get the python version that the Pipfile requires (copied to the Pipfile.lock file
+                  by pipenv). This is the version of the python interpreter on the target machine.
+           @return The major.minor version (E.G 3.11) or None if the Pipfile does not require a
+                   major.minor version."""
+        requiresDict = self._loadLockFile().get("_meta", {}).get("requires", {})
+        version = requiresDict.get("python_version") or requiresDict.get("python_full_version")
+        if not version:
+            return None
+        versionList = version.split(".")
+        if len(versionList) < 2:
+            return None
+        return ".".join(versionList[:2])
+
+    def getLockedPackages(self):
+        """@brief Get the packages pinned in the lock file.
+           @return A list of dicts each with name, version, hashes and markers keys.
+                   The version includes the == prefix and markers is None if not present."""
+        lockDict = self._loadLockFile()
+
+        packageList = []
+        for name, attrs in sorted(lockDict.get(Wheelhouse.LOCK_SECTION, {}).items()):
+            version = attrs.get("version")
+            hashes = attrs.get("hashes")
+            if not version or not hashes:
+                raise WheelhouseError("{} in {} is not pinned to a version with hashes (VCS, path and editable packages are not supported).".format(name, self._lockFile))
+            packageList.append({"name": name,
+                                "version": version,
+                                "hashes": hashes,
+                                "markers": attrs.get("markers")})
+        return packageList
+
+    def getRequirements(self):
+        """@brief Get the contents of a pip requirements file that pins every package to the
+                  version and hashes in the lock file.
+           @return The requirements file contents."""
+        lines = []
+        for package in self.getLockedPackages():
+            line = "{}{}".format(package["name"], package["version"])
+            if package["markers"]:
+                line = "{} ; {}".format(line, package["markers"])
+            for _hash in package["hashes"]:
+                line = "{} --hash={}".format(line, _hash)
+            lines.append(line)
+        return "\n".join(lines) + "\n"
+
+    def download(self):
+        """@brief Download the wheels for the locked packages. pip checks each wheel against
+                  the hashes in the lock file. Wheels in the download folder that are not in
+                  the lock file (E.G from an earlier version of the lock file) are removed.
+                  The wheels are for the python version required by the Pipfile and the target
+                  platforms if given, else for the python interpreter and platform of the
+                  build machine.
+           @return A sorted list of the wheel files."""
+        if not os.path.isdir(self._downloadFolder):
+            os.makedirs(self._downloadFolder)
+
+        requirementsFile = os.path.join(self._downloadFolder, Wheelhouse.REQUIREMENTS_FILE)
+        with open(requirementsFile, 'w') as fd:
+            fd.write(self.getRequirements())
+
+        downloadCmd = [self._python, "-m", "pip", "download",
+                       "--no-deps",
+                       "--only-binary=:all:",
+                       "--require-hashes",
+                       "--dest", self._downloadFolder,
+                       "-r", requirementsFile]
+        pythonVersion = self.getPythonVersion()
+        if pythonVersion:
+            downloadCmd += ["--python-version", pythonVersion]
+        else:
+            self._uio.info("The Pipfile does not require a python version (E.G python_version = \"3.11\") so the wheels are for the build machine python interpreter.")
+        if self._platformList:
+            for platform in self._platformList:
+                downloadCmd += ["--platform", platform]
+        else:
+            self._uio.info("No target platform was given so the wheels are for the build machine platform.")
+        self._uio.info("Executing: {}".format(" ".join(downloadCmd)))
+        try:
+            check_call(downloadCmd)
+        except (OSError, CalledProcessError):
+            raise WheelhouseError("Failed to download the wheels for {}. All packages must be available as wheels.".format(self._lockFile))
+
+        lockedHashes = set()
+        for package in self.getLockedPackages():
+            lockedHashes.update(package["hashes"])
+
+        wheelList = []
+        for entry in sorted(os.listdir(self._downloadFolder)):
+            wheelFile = os.path.join(self._downloadFolder, entry)
+            if not entry.endswith(Wheelhouse.WHEEL_EXTENSION):
+                continue
+            if "sha256:{}".format(fileSHA256(wheelFile)) in lockedHashes:
+                wheelList.append(wheelFile)
+            else:
+                os.remove(wheelFile)
+        return wheelList
+
+    def getSHA256Sums(self, wheelList):
+        """@brief Get the contents of a file that can be checked with 'sha256sum -c'.
+           @param wheelList The list of wheel files.
+           @return The file contents."""
+        lines = []
+        for wheelFile in wheelList:
+            lines.append("{}  {}".format(fileSHA256(wheelFile), os.path.basename(wheelFile)))
+        return "\n".join(lines) + "\n"
+
+    def getInstallScript(self, wheelhouseFolder, venvFolder):
+        """@brief Get a shell script that creates a virtual environment from the wheelhouse folder.
+                  All the wheels are installed by a single pip command (pip must not install
+                  into the same virtual environment from several processes at the same time)
+                  that checks each wheel against the hashes in the requirements file and does
+                  not access a package index. Dependencies are not resolved as the wheelhouse
+                  holds every locked package.
+           @param wheelhouseFolder The name of the wheelhouse folder (relative to the script). This
+                  holds the wheels, the SHA256SUMS file and the requirements file (see getRequirements()).
+           @param venvFolder The name of the virtual environment folder (relative to the script).
+           @return The script contents."""
+        lines = ["#!/bin/sh",
+                 "# Created by pipenv2deb. Creates the {} folder from the wheels in the {} folder.".format(venvFolder, wheelhouseFolder),
+                 'cd "$(dirname "$0")" || exit 1']
+        lines += getTimedCommandLines("wheelhouse install in $(pwd)",
+                                      ["(cd {} && sha256sum --check --quiet {})".format(wheelhouseFolder, Wheelhouse.SHA256SUMS_FILE),
+                                       "rm -rf {}".format(venvFolder),
+                                       "python3 -m venv {}".format(venvFolder),
+                                       "{}/bin/python -m pip install --quiet --no-index --find-links {} --no-deps --require-hashes --no-cache-dir -r {}".format(
+                                           venvFolder, wheelhouseFolder, os.path.join(wheelhouseFolder, Wheelhouse.REQUIREMENTS_FILE))],
+                                      True)
+        return "\n".join(lines) + "\n"
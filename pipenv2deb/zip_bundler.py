@@ -0,0 +1,154 @@
+import os
+import io
+import json
+import zipfile
+import tempfile
+from subprocess import run, PIPE
+
+
+class ZipBundlerError(Exception):
+    pass
+
+
+class ZipBundler(object):
+    """@brief Responsible for packing pure python package folders into a single zip file that
+              is placed on sys.path and imported by zipimport. Importing from one zip file
+              replaces the stat/open calls made for each module file and folder and the package
+              holds one file rather than a file for each module. Each python file is stored with
+              it's bytecode so that the modules are not compiled when they are imported."""
+
+    ZIP_FILENAME = "app_packages.zip"
+    PYTHON_EXTENSION = ".py"
+    BYTECODE_EXTENSION = ".pyc"
+    PYCACHE_FOLDER = "__pycache__"
+    # Each zip entry holds this date so that the zip file only changes when the files in it change.
+    ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+    # Run by the project python interpreter so that the bytecode matches the interpreter that
+    # imports it. Unchecked hash based pyc files are used as zipimport cannot check the modification
+    # time of a python file against the time recorded in the pyc file once both are in a zip file.
+    COMPILE_SCRIPT = "\n".join(["import sys, json, py_compile",
+                                "for srcFile, pycFile, displayFile in json.load(sys.stdin):",
+                                "    try:",
+                                "        py_compile.compile(srcFile, pycFile, displayFile, doraise=True,",
+                                "                           invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)",
+                                "    except py_compile.PyCompileError as ex:",
+                                "        print(ex.msg)"])
+
+    def __init__(self, uio, python):
+        """@brief Constructor
+           @param uio A UIO instance
+           @param python The python interpreter that the application runs with."""
+        self._uio = uio
+        self._python = python
+
+    @staticmethod
+    def _walk(srcFolder, excludeFunc):
+        """@brief Get the files in a folder that would be copied into the package.
+           @param srcFolder The folder.
+           @param excludeFunc If not None a function that is called with the path (relative to
+                  srcFolder) of each folder and file and returns True if it is not packaged
+                  (see Stager.copyTree()).
+           @return A sorted list of the paths of the files relative to srcFolder. Bytecode
+                   files are not included."""
+        relFileList = []
+        for root, dirs, files in os.walk(srcFolder, followlinks=True):
+            relRoot = os.path.relpath(root, srcFolder)
+            dirs[:] = [_dir for _dir in dirs if _dir != ZipBundler.PYCACHE_FOLDER]
+            if excludeFunc:
+                dirs[:] = [_dir for _dir in dirs if not excludeFunc(os.path.join(relRoot, _dir))]
+                files = [_file for _file in files if not excludeFunc(os.path.join(relRoot, _file))]
+            for _file in files:
+                if not _file.endswith(ZipBundler.BYTECODE_EXTENSION):
+                    relFileList.append(os.path.normpath(os.path.join(relRoot, _file)))
+        relFileList.sort()
+        return relFileList
+
+    @staticmethod
+    def isPureFolder(srcFolder, excludeFunc=None):
+        """@brief Determine if a folder can be imported from a zip file. Folders holding data
+                  files (which a module may open using a path made from it's __file__ attribute)
+                  or native extensions (which zipimport cannot load) must be installed as files.
+           @param srcFolder The folder.
+           @param excludeFunc If not None the function used to exclude files from the package.
+           @return True if all the packaged files in the folder are python files."""
+        relFileList = ZipBundler._walk(srcFolder, excludeFunc)
+        if not relFileList:
+            return False
+        for relFile in relFileList:
+            if not relFile.endswith(ZipBundler.PYTHON_EXTENSION):
+                return False
+        return True
+
+    def getZipData(self, folderList, targetZipFile):
+        """@brief Create the zip file containing the python files in a list of folders and the
+                  bytecode compiled from them.
+           @param folderList A list of tuples containing the source folder, the name of the folder
+                  in the zip file and the exclude function (or None) for the folder.
+           @param targetZipFile The path of the zip file when the package is installed. Tracebacks
+                  show the path of each python file in this file.
+           @return The contents of the zip file (bytes)."""
+        entryList = []
+        for srcFolder, name, excludeFunc in folderList:
+            for relFile in ZipBundler._walk(srcFolder, excludeFunc):
+                entryList.append((os.path.join(srcFolder, relFile), os.path.join(name, relFile)))
+        entryList.sort(key=lambda entry: entry[1])
+
+        with tempfile.TemporaryDirectory(prefix="pipenv2deb_zip_") as tmpFolder:
+            compileList = []
+            for index, (srcFile, arcName) in enumerate(entryList):
+                compileList.append((srcFile, os.path.join(tmpFolder, "{}.pyc".format(index)), os.path.join(targetZipFile, arcName)))
+            self._compile(compileList)
+
+            zipData = io.BytesIO()
+            # The files are stored rather than compressed as the package compresses the zip file.
+            with zipfile.ZipFile(zipData, 'w', zipfile.ZIP_STORED) as zipFd:
+                # zipimport only finds namespace packages (folders without an __init__.py file) if
+                # the zip file holds an entry for the folder.
+                for folder in self._getFolders([arcName for _, arcName in entryList]):
+                    zipInfo = zipfile.ZipInfo(folder + "/", ZipBundler.ZIP_DATE_TIME)
+                    zipInfo.external_attr = 0o40755 << 16
+                    zipFd.writestr(zipInfo, b"")
+                for (srcFile, arcName), (_, pycFile, _) in zip(entryList, compileList):
+                    self._addFile(zipFd, srcFile, arcName)
+                    # zipimport loads module.pyc from the same folder as module.py.
+                    if os.path.isfile(pycFile):
+                        self._addFile(zipFd, pycFile, arcName + "c")
+
+        self._uio.info("Created {} holding {} python files from {}.".format(
+            ZipBundler.ZIP_FILENAME, len(entryList), ", ".join([name for _, name, _ in folderList])))
+        return zipData.getvalue()
+
+    def _getFolders(self, arcNameList):
+        """@param arcNameList A list of the names of the files in the zip file.
+           @return A sorted list of the folders that hold the files."""
+        folderSet = set()
+        for arcName in arcNameList:
+            folder = os.path.dirname(arcName)
+            while folder:
+                folderSet.add(folder)
+                folder = os.path.dirname(folder)
+        return sorted(folderSet)
+
+    def _compile(self, compileList):
+        """@brief Compile python files. Files that cannot be compiled are stored without bytecode.
+           @param compileList A list of tuples containing the python file, the pyc file to create
+                  and the path of the python file shown in tracebacks."""
+        compileCmd = [self._python, "-c", ZipBundler.COMPILE_SCRIPT]
+        try:
+            result = run(compileCmd, input=json.dumps(compileList).encode(), stdout=PIPE)
+        except OSError as ex:
+            raise ZipBundlerError("Failed to run {} to compile the python files: {}".format(self._python, ex))
+        if result.returncode != 0:
+            raise ZipBundlerError("Failed to compile the python files using {}.".format(self._python))
+        for line in result.stdout.decode().splitlines():
+            self._uio.info(line)
+
+    def _addFile(self, zipFd, srcFile, arcName):
+        """@brief Add a file to the zip file.
+           @param zipFd The ZipFile instance.
+           @param srcFile The file to add.
+           @param arcName The name of the file in the zip file."""
+        zipInfo = zipfile.ZipInfo(arcName, ZipBundler.ZIP_DATE_TIME)
+        zipInfo.external_attr = 0o644 << 16
+        with open(srcFile, 'rb') as fd:
+            zipFd.writestr(zipInfo, fd.read())
@@ -21,7 +21,7 @@ setuptools.setup(
     description=DESCRIPTION,
     long_description=_long_description,                                         #This will be read from the README.md file
     long_description_content_type="text/markdown",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=["tests", "tests.*"]),
     url=URL,
     classifiers=[
         "Programming Language :: Python :: 3",
@@ -0,0 +1,27 @@
+import pytest
+
+from pipenv2deb.__main__ import buildPackage, getBuildOptions
+from tests.util import BuiltPackage, QuietUIO, createProject, createVenv
+
+
+@pytest.fixture
+def project(tmp_path):
+    """@brief A project folder holding a python file, a package folder and a debian control file."""
+    return createProject(str(tmp_path / "project"))
+
+
+@pytest.fixture
+def venv(project):
+    """@brief The .venv folder of the project."""
+    return createVenv(project)
+
+
+@pytest.fixture
+def build(project):
+    """@brief A function that builds the project. It is called with the options that differ from
+              the defaults and optionally the outputFolder and uio arguments of buildPackage().
+              It returns a BuiltPackage instance."""
+    def _build(outputFolder=None, uio=None, **optionDict):
+        fileList = buildPackage(project, outputFolder=outputFolder, options=getBuildOptions(**optionDict), uio=uio or QuietUIO())
+        return BuiltPackage(fileList)
+    return _build
@@ -0,0 +1,41 @@
+import os
+import sys
+import json
+
+import pytest
+
+from pipenv2deb.__main__ import buildProjects, getBuildOptions
+from pipenv2deb.batch_builder import _buildProject
+from tests.util import QuietUIO, createProject
+
+
+@pytest.mark.skipif(os.geteuid() != 0, reason="Building project folders given on the command line requires root")
+def test_build_projects(tmp_path, monkeypatch):
+    """@brief Each project is built in its own folder. Relative paths in the options are relative to
+              the working directory rather than each project folder."""
+    projectFolderList = [createProject(str(tmp_path / name)) for name in ("project1", "project2")]
+    monkeypatch.chdir(str(tmp_path))
+    buildProjects(QuietUIO(), getBuildOptions(jobs=1, report_jsonl="report.jsonl", stageless=True), projectFolderList)
+    for projectFolder in projectFolderList:
+        assert os.listdir(os.path.join(projectFolder, "packages")) == ["test-app-1.0-all.deb"]
+        assert not os.path.exists(os.path.join(projectFolder, "report.jsonl"))
+    with open(str(tmp_path / "report.jsonl")) as fd:
+        recordList = [json.loads(line) for line in fd]
+    assert len([record for record in recordList if record["event"] == "build"]) == 2
+
+
+def test_build_project_restores_output(tmp_path):
+    """@brief The working directory and the stdout and stderr file descriptors are restored after a
+              project is built so that a worker process may build another project."""
+    def buildFunc(options):
+        print("building {}".format(os.getcwd()))
+        return []
+
+    cwd = os.getcwd()
+    stdoutIno = os.fstat(sys.stdout.fileno()).st_ino
+    result = _buildProject(buildFunc, None, str(tmp_path), "logs/build.log")
+    assert result.ok
+    assert os.getcwd() == cwd
+    assert os.fstat(sys.stdout.fileno()).st_ino == stdoutIno
+    with open(str(tmp_path / "logs" / "build.log")) as fd:
+        assert fd.read() == "building {}\n".format(tmp_path)
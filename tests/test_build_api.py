@@ -0,0 +1,26 @@
+import pytest
+
+from pipenv2deb.__main__ import DebBuilder, DebBuilderError
+
+
+def test_venv_oip_requires_sudo_user(build, monkeypatch):
+    """@brief --venv_oip fails with a DebBuilderError when the SUDO_USER environment variable is
+              not set rather than a KeyError."""
+    monkeypatch.delenv("SUDO_USER", raising=False)
+    with pytest.raises(DebBuilderError, match="SUDO_USER"):
+        build(venv_oip=True)
+
+
+def test_venv_oip_postinst_runs_as_sudo_user(build, monkeypatch):
+    """@brief With --venv_oip the .venv folder is created by the user that ran sudo."""
+    monkeypatch.setenv("SUDO_USER", "builder")
+    postInst = build(venv_oip=True).getControlFiles()["postinst"]
+    assert b"/usr/bin/sudo -u builder pipenv sync" in postInst
+
+
+def test_rpm_requires_root(build, monkeypatch):
+    """@brief The rpm package is built by sudo alien so it cannot be built through the python API
+              without root."""
+    monkeypatch.setattr(DebBuilder, "_isRootUser", lambda self: False)
+    with pytest.raises(DebBuilderError, match="--rpm"):
+        build(rpm=True)
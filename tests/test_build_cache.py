@@ -0,0 +1,65 @@
+import os
+
+from pipenv2deb.__main__ import getCacheKeyOptions, getOptionParser
+from pipenv2deb.build_cache import BuildCache
+from tests.util import QuietUIO, RecordingUIO
+
+
+def test_every_option_sets_cache_key():
+    """@brief Each option must say if it changes the packages built."""
+    for option in getOptionParser().option_list:
+        if option.dest:
+            assert option.cache_key in (True, False), option.dest
+
+
+def isCacheHit(build, cacheFolder, **optionDict):
+    """@brief Build the project with the build cache.
+       @param build The build fixture.
+       @param cacheFolder The build cache folder.
+       @param optionDict The options that differ from the defaults.
+       @return True if the packages were restored from the build cache."""
+    uio = RecordingUIO()
+    build(uio=uio, cache=True, cache_folder=cacheFolder, **optionDict)
+    return any(line.startswith("Build cache hit") for line in uio.lines)
+
+
+def test_cache_key_options(build, tmp_path):
+    """@brief Options that do not change the packages reuse the cached packages. Options that
+              change the packages do not."""
+    cacheFolder = str(tmp_path / "cache")
+    assert "compress" in getCacheKeyOptions()
+    assert "report" not in getCacheKeyOptions()
+    assert not isCacheHit(build, cacheFolder)
+    assert isCacheHit(build, cacheFolder, report=True, lbp=True)
+    assert not isCacheHit(build, cacheFolder, compress="xz")
+
+
+def test_cache_key_environment(build, tmp_path, monkeypatch):
+    """@brief The version of pipenv2deb and the user placed in the postinst script (--venv_oip) are
+              build inputs. The number of compression threads is not."""
+    cacheFolder = str(tmp_path / "cache")
+    monkeypatch.setenv("SUDO_USER", "builder1")
+    assert not isCacheHit(build, cacheFolder, venv_oip=True)
+    assert isCacheHit(build, cacheFolder, venv_oip=True, threads=1)
+    monkeypatch.setenv("SUDO_USER", "builder2")
+    assert not isCacheHit(build, cacheFolder, venv_oip=True)
+    monkeypatch.setattr(BuildCache, "_toolVersion", "0.0.0-upgraded")
+    assert not isCacheHit(build, cacheFolder, venv_oip=True)
+
+
+def test_evict_least_recently_used(tmp_path):
+    """@brief The packages of the least recently used builds are removed when the cache is larger
+              than its maximum size."""
+    cacheFolder = str(tmp_path / "cache")
+    buildCache = BuildCache(QuietUIO(), cacheFolder, 2500)
+    packageFile = str(tmp_path / "app.deb")
+    with open(packageFile, 'wb') as fd:
+        fd.write(b"\0" * 1000)
+    for digest in ("a", "b"):
+        buildCache.store(digest, [packageFile])
+    # Restoring a build records that it was used so b is now the least recently used build.
+    os.utime(os.path.join(cacheFolder, BuildCache.BUILDS_FOLDER, "b", BuildCache.OUTPUTS_FILE), (1, 1))
+    assert buildCache.restore("a", str(tmp_path / "output")) is not None
+    buildCache.store("c", [packageFile])
+    assert [digest for _, _, digest in buildCache.getEntries()] == ["a", "c"]
+    assert buildCache.restore("b", str(tmp_path / "output")) is None
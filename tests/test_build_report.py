@@ -0,0 +1,109 @@
+import os
+import json
+
+import pytest
+
+from pipenv2deb.build_report import BuildReport
+
+PHASE_KEYS = {"name", "start", "wall_time", "cpu_time", "subprocess_time", "files_copied", "bytes_copied", "status"}
+REPORT_KEYS = {"version", "start_time", "wall_time", "phases", "subprocess_times",
+               "package", "package_version", "architecture", "project_folder", "options", "output_files"}
+
+
+def _readJsonLines(jsonLinesFile):
+    """@return The list of objects in a JSON lines file."""
+    with open(jsonLinesFile) as fd:
+        return [json.loads(line) for line in fd.read().splitlines()]
+
+
+def test_report_file(project, build):
+    """@brief The build report is written next to the deb file."""
+    package = build(report=True)
+    reportFile = os.path.join(project, "packages", "test-app-1.0-all.build.json")
+    with open(reportFile) as fd:
+        report = json.load(fd)
+
+    assert set(report) == REPORT_KEYS
+    assert report["version"] == BuildReport.VERSION
+    assert report["package"] == "test-app"
+    assert report["package_version"] == "1.0"
+    assert report["architecture"] == "all"
+    assert report["project_folder"] == project
+    assert report["output_files"] == package.fileList
+    assert report["options"]["report"] is True
+    for phase in report["phases"]:
+        assert set(phase) == PHASE_KEYS
+        assert phase["status"] == "ok"
+        assert phase["wall_time"] >= 0
+    assert [phase["start"] for phase in report["phases"]] == sorted(phase["start"] for phase in report["phases"])
+    phaseNames = [phase["name"] for phase in report["phases"]]
+    for name in ("copy_files", "finish_staging", "deb"):
+        assert name in phaseNames
+    assert sum(phase["files_copied"] for phase in report["phases"]) > 0
+    assert sum(phase["bytes_copied"] for phase in report["phases"]) > 0
+
+
+def test_no_report_by_default(project, build):
+    """@brief No build report is written unless it is required."""
+    build()
+    assert not [name for name in os.listdir(os.path.join(project, "packages")) if name.endswith(".build.json")]
+
+
+def test_report_json_lines(tmp_path, build):
+    """@brief A phase record is appended to the JSON lines file as each phase completes followed by a
+              build record that holds the report. Each build appends to the file."""
+    jsonLinesFile = str(tmp_path / "report.jsonl")
+    build(report_jsonl=jsonLinesFile)
+    recordList = _readJsonLines(jsonLinesFile)
+    assert [record["event"] for record in recordList[:-1]] == ["phase"] * (len(recordList) - 1)
+    buildRecord = recordList[-1]
+    assert buildRecord["event"] == "build"
+    assert set(buildRecord) == REPORT_KEYS | {"event"}
+    for record in recordList[:-1]:
+        assert set(record) == PHASE_KEYS | {"event"}
+    assert sorted(record["name"] for record in recordList[:-1]) == sorted(phase["name"] for phase in buildRecord["phases"])
+
+    build(report_jsonl=jsonLinesFile)
+    assert [record["event"] for record in _readJsonLines(jsonLinesFile)].count("build") == 2
+
+
+def test_report_json_lines_stdout(capsys):
+    """@brief The JSON lines are written to stdout if the file is -."""
+    report = BuildReport("-")
+    with report.phase("test"):
+        pass
+    report.write(None)
+    recordList = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [record["event"] for record in recordList] == ["phase", "build"]
+    assert recordList[0]["name"] == "test"
+
+
+def test_failed_phase(tmp_path):
+    """@brief A phase that raises an error is recorded as failed and the error is not caught."""
+    jsonLinesFile = str(tmp_path / "report.jsonl")
+    report = BuildReport(jsonLinesFile)
+    with pytest.raises(ValueError):
+        with report.phase("test"):
+            raise ValueError("failed")
+    assert _readJsonLines(jsonLinesFile)[0]["status"] == "failed"
+    assert report.getReport()["phases"][0]["status"] == "failed"
+
+
+def test_command_times():
+    """@brief The time taken by external commands is added to the phase that runs them and to the
+              total for each command."""
+    report = BuildReport(counterFunc=lambda: (1, 10))
+    with report.phase("test"):
+        with report.command("tool"):
+            pass
+        with report.command("tool"):
+            pass
+    with report.command("tool"):
+        pass
+    result = report.getReport({"package": "test-app"})
+    phase = result["phases"][0]
+    assert 0 < phase["subprocess_time"] <= phase["wall_time"]
+    assert result["subprocess_times"]["tool"] >= phase["subprocess_time"]
+    assert phase["files_copied"] == 0
+    assert phase["bytes_copied"] == 0
+    assert result["package"] == "test-app"
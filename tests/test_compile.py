@@ -0,0 +1,54 @@
+import os
+import sys
+import marshal
+
+import pytest
+
+from pipenv2deb.__main__ import DebBuilderError
+from tests.util import PACKAGE_FOLDER
+
+CACHE_TAG = sys.implementation.cache_tag
+# The header that precedes the code object in a pyc file (magic, flags, mtime or hash, size).
+PYC_HEADER_SIZE = 16
+
+
+def _getPycFile(*relPath):
+    """@param relPath The path of a python file relative to the package folder.
+       @return The path of its compiled file in the data archive."""
+    folder = os.path.join(PACKAGE_FOLDER, *relPath[:-1])
+    name = os.path.splitext(relPath[-1])[0]
+    return os.path.join(folder, "__pycache__", "{}.{}.pyc".format(name, CACHE_TAG))
+
+
+def test_compiled_files_staged(venv, build):
+    """@brief The python files in the package are compiled (by the interpreter in the .venv folder)
+              and the compiled files refer to the python files where the package is installed."""
+    dataFiles = build(compile=True).getDataFiles()
+    for relPath, pythonFile in ((("app.py",), "app.py"),
+                                (("mylib", "values.py"), os.path.join("mylib", "values.py"))):
+        pycFile = _getPycFile(*relPath)
+        assert pycFile in dataFiles
+        entryType, mode, content = dataFiles[pycFile]
+        code = marshal.loads(content[PYC_HEADER_SIZE:])
+        assert code.co_filename == os.path.join("/", PACKAGE_FOLDER, pythonFile)
+
+
+def test_not_compiled_by_default(build):
+    """@brief No compiled files are added to the package unless --compile is used."""
+    assert not [path for path in build().getDataFiles() if path.endswith(".pyc")]
+
+
+def test_compiled_file_removed_with_python_file(project, venv, build):
+    """@brief An incremental build does not keep the compiled file of a python file that has been removed."""
+    pycFile = _getPycFile("mylib", "values.py")
+    assert pycFile in build(compile=True, incremental=True).getDataFiles()
+    os.remove(os.path.join(project, "mylib", "values.py"))
+    dataFiles = build(compile=True, incremental=True).getDataFiles()
+    assert pycFile not in dataFiles
+    assert _getPycFile("mylib", "__init__.py") in dataFiles
+
+
+def test_compile_stageless(build):
+    """@brief Compiled files are created in the build folder so --compile cannot be used with --stageless."""
+    with pytest.raises(DebBuilderError, match="--compile"):
+        build(compile=True, stageless=True)
@@ -0,0 +1,24 @@
+import os
+import json
+
+import pytest
+
+from pipenv2deb.__main__ import DebBuilderError
+
+
+def test_failed_growth_check_keeps_baseline(project, build):
+    """@brief A build that fails the --max_growth check must not replace the baseline report so
+              that building again (E.G a CI job run again) also fails."""
+    debFile = build(composition=True).debFile
+    reportFile = os.path.splitext(debFile)[0] + ".composition.json"
+    with open(reportFile) as fd:
+        baseline = json.load(fd)
+
+    with open(os.path.join(project, "mylib", "large.txt"), 'wb') as fd:
+        fd.write(os.urandom(256 * 1024))
+    for _ in range(2):
+        with pytest.raises(DebBuilderError, match="increased"):
+            build(composition=True, max_growth=10.0)
+        with open(reportFile) as fd:
+            assert json.load(fd) == baseline
+    assert os.path.isfile(os.path.splitext(debFile)[0] + ".composition.failed.json")
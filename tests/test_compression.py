@@ -0,0 +1,68 @@
+import pytest
+
+from pipenv2deb import __main__ as mainModule
+from pipenv2deb.__main__ import DebBuilder, DebBuilderError, getBuildOptions
+from pipenv2deb.deb_delta import DebReader
+from tests.util import DPKG_DEB_REQUIRED, QuietUIO
+
+
+@pytest.mark.parametrize("compress, expected", [("gzip", ("gzip", None)),
+                                                ("gzip:1", ("gzip", 1)),
+                                                ("gzip:9", ("gzip", 9)),
+                                                ("xz:0", ("xz", 0)),
+                                                ("zstd:22", ("zstd", 22)),
+                                                ("none", ("none", None)),
+                                                ("gzip:0", None),
+                                                ("gzip:10", None),
+                                                ("xz:10", None),
+                                                ("zstd:0", None),
+                                                ("zstd:23", None),
+                                                ("none:1", None),
+                                                ("xz:fast", None),
+                                                ("bzip2", None)])
+def test_compress_option(project, compress, expected):
+    """@brief The --compress option holds a compression type and an optional level that must be in
+              the range supported by the compression type."""
+    debBuilder = DebBuilder(QuietUIO(), getBuildOptions(compress=compress), project)
+    if expected is None:
+        with pytest.raises(DebBuilderError):
+            debBuilder._getCompression()
+    else:
+        assert debBuilder._getCompression() == expected
+
+
+@pytest.mark.parametrize("dpkgDebVersion, compress, expected", [((1, 21, 22), "xz:6", "dpkg-deb -Zxz -z6 --threads-max=2 --root-owner-group -b"),
+                                                                ((1, 21, 22), "zstd", "dpkg-deb -Zzstd --threads-max=2 --root-owner-group -b"),
+                                                                ((1, 19, 0), "gzip:9", "dpkg-deb -Zgzip -z9 --root-owner-group -b"),
+                                                                ((1, 18, 0), "none", "dpkg-deb -Znone -b")])
+def test_dpkg_deb_arguments(build, monkeypatch, dpkgDebVersion, compress, expected):
+    """@brief The compression type and level are passed to dpkg-deb with the arguments supported by
+              the installed dpkg-deb version."""
+    cmdList = []
+
+    def fakeCheckCall(cmd, cwd=None):
+        cmdList.append(cmd)
+        open(cmd[-1], 'wb').close()
+
+    monkeypatch.setattr(mainModule, "check_call", fakeCheckCall)
+    monkeypatch.setattr(DebBuilder, "_isRootUser", lambda self: True)
+    monkeypatch.setattr(DebBuilder, "_getDpkgDebVersion", lambda self: dpkgDebVersion)
+    build(compress=compress, threads=2)
+    assert " ".join(cmdList[0]).startswith(expected + " ")
+
+
+@pytest.mark.parametrize("compress, memberName", [("gzip", "data.tar.gz"),
+                                                  ("xz:1", "data.tar.xz"),
+                                                  ("none", "data.tar")])
+def test_stageless_compression(build, compress, memberName):
+    """@brief The deb file written without dpkg-deb holds the data archive compressed as selected."""
+    package = build(stageless=True, compress=compress)
+    assert DebReader(package.debFile).getDataMemberName() == memberName
+    assert package.getDataFiles()
+
+
+@DPKG_DEB_REQUIRED
+def test_dpkg_deb_compression(build):
+    """@brief The deb file built by dpkg-deb holds the data archive compressed as selected."""
+    package = build(compress="xz:1")
+    assert DebReader(package.debFile).getDataMemberName() == "data.tar.xz"
@@ -0,0 +1,74 @@
+import io
+import os
+import sys
+import json
+import shutil
+import tarfile
+import subprocess
+
+import pytest
+
+from pipenv2deb.deb_delta import DebDelta, DebDeltaError
+from tests.util import CONTROL, QuietUIO, readControlFiles, readDataFiles, writeFile
+
+REPO_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_apply_failure_exit_status(tmp_path):
+    """@brief The deb_delta command must exit with a non zero status if the deb file cannot be rebuilt."""
+    result = subprocess.run([sys.executable, "-m", "pipenv2deb.deb_delta",
+                             str(tmp_path / "missing.deb"), str(tmp_path / "missing.debdelta"), str(tmp_path / "new.deb")],
+                            cwd=REPO_FOLDER, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    assert result.returncode == 1
+    assert b"ERROR" in result.stdout
+
+
+@pytest.mark.parametrize("stageless", [False, True])
+def test_delta_round_trip(project, build, tmp_path, stageless):
+    """@brief A delta file created from two versions of a package must rebuild the new deb file
+              from the previous deb file. The archives in the rebuilt deb file are compressed
+              again so the files, links, folders and modes are compared rather than the bytes."""
+    previousDeb = str(tmp_path / "previous.deb")
+    shutil.copyfile(build(stageless=stageless).debFile, previousDeb)
+
+    writeFile(os.path.join(project, "mylib", "values.py"), "VALUE = 2\n")
+    writeFile(os.path.join(project, "debian", "control"), CONTROL.replace("Version: 1.0", "Version: 1.1"))
+    package = build(stageless=stageless, delta_from=previousDeb)
+    deltaFile = DebDelta.getDeltaFilename(package.debFile, "1.0")
+    assert deltaFile in package.fileList
+
+    rebuiltDeb = str(tmp_path / "rebuilt.deb")
+    DebDelta(QuietUIO()).apply(previousDeb, deltaFile, rebuiltDeb)
+    assert readDataFiles(rebuiltDeb) == package.getDataFiles()
+    assert readControlFiles(rebuiltDeb) == package.getControlFiles()
+    assert package.getPackageFile("mylib", "values.py")[2] == b"VALUE = 2\n"
+
+
+def writeDeltaFile(deltaFile, newFilename):
+    """@brief Write a delta file that only holds the metadata file.
+       @param deltaFile The delta file to write.
+       @param newFilename The name of the new deb file recorded in the metadata."""
+    metadataBytes = json.dumps({"version": DebDelta.FORMAT_VERSION, "new": {"filename": newFilename}}).encode()
+    with tarfile.open(deltaFile, "w:xz") as deltaTar:
+        metadataInfo = tarfile.TarInfo(DebDelta.METADATA_FILE)
+        metadataInfo.size = len(metadataBytes)
+        deltaTar.addfile(metadataInfo, io.BytesIO(metadataBytes))
+
+
+@pytest.mark.parametrize("newFilename, expected", [("app_1.1_all.deb", "app_1.1_all.deb"),
+                                                   ("../../tmp/app_1.1_all.deb", "app_1.1_all.deb"),
+                                                   ("/etc/app_1.1_all.deb", "app_1.1_all.deb"),
+                                                   ("../../etc/passwd", None),
+                                                   ("", None),
+                                                   ("../.deb", None),
+                                                   (None, None)])
+def test_new_deb_filename(tmp_path, newFilename, expected):
+    """@brief The deb file rebuilt from a delta file when no deb file is given is created in the
+              current folder whatever name the delta file holds."""
+    deltaFile = str(tmp_path / "app.delta")
+    writeDeltaFile(deltaFile, newFilename)
+    if expected is None:
+        with pytest.raises(DebDeltaError):
+            DebDelta.getNewDebFilename(deltaFile)
+    else:
+        assert DebDelta.getNewDebFilename(deltaFile) == expected
@@ -0,0 +1,38 @@
+import os
+import json
+import subprocess
+
+from pipenv2deb.__main__ import getStartupScript
+from tests.util import PACKAGE_FOLDER, writeFile
+
+ARGS_FILE = """import sys
+import json
+
+print(json.dumps(sys.argv[1:]))
+"""
+
+
+def test_fast_launcher_script(build):
+    """@brief The startup script created with --fast_launcher runs the python file with the python
+              interpreter in the installed .venv folder."""
+    startupScript = build(fast_launcher=True).getDataFiles()[os.path.join("usr", "local", "bin", "app")]
+    assert startupScript[2] == '#!/bin/sh\nexec /{}/.venv/bin/python /{}/app.py "$@"\n'.format(PACKAGE_FOLDER, PACKAGE_FOLDER).encode()
+    assert startupScript[1] & 0o111
+
+
+def test_fast_launcher_not_used_with_venv_oip():
+    """@brief The .venv folder is not in the install path with --venv_oip so pipenv runs the python file."""
+    startupScript = getStartupScript("/usr/local/bin/app.pipenvpkg", "app.py", fastLauncher=True, venvOip=True)
+    assert "pipenv run /usr/local/bin/app.pipenvpkg/app.py" in startupScript
+    assert ".venv/bin/python" not in startupScript
+
+
+def test_fast_launcher_passes_arguments(project, venv, tmp_path):
+    """@brief The arguments of the startup script are passed to the python file unchanged."""
+    writeFile(os.path.join(project, "args.py"), ARGS_FILE)
+    launcherFile = str(tmp_path / "launcher")
+    writeFile(launcherFile, getStartupScript(project, "args.py", fastLauncher=True))
+    os.chmod(launcherFile, 0o755)
+    argList = ["two words", "", "*", "$HOME", "-x"]
+    output = subprocess.check_output([launcherFile] + argList, cwd=str(tmp_path))
+    assert json.loads(output) == argList
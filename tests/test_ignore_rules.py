@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from pipenv2deb.__main__ import DebBuilder, getBuildOptions
+from pipenv2deb.ignore_rules import IgnoreRules
+from tests.util import PACKAGE_FOLDER, QuietUIO, RecordingUIO, writeFile
+
+
+@pytest.mark.parametrize("relPath, isFolder, ignored", [("data", True, False),
+                                                       ("data/big.csv", False, True),
+                                                       ("data/keep.csv", False, False),
+                                                       ("data/sub/big.csv", False, True),
+                                                       ("lib/node_modules", True, True),
+                                                       ("lib/node_modules.txt", False, False),
+                                                       ("lib/cache", True, True),
+                                                       ("cache", True, False),
+                                                       ("lib/cache.py", False, False),
+                                                       ("lib/sub/__pycache__", True, True)])
+def test_patterns(relPath, isFolder, ignored):
+    """@brief Negated, folder only, nested path and ** patterns."""
+    ignoreRules = IgnoreRules(QuietUIO(), IgnoreRules.DEFAULT_PATTERNS + ["data/**/*.csv",
+                                                                          "!data/keep.csv",
+                                                                          "node_modules/",
+                                                                          "lib/cache/"])
+    assert ignoreRules.isIgnored(relPath, isFolder) == ignored
+
+
+def test_pruned_folders_not_read(project, build, monkeypatch):
+    """@brief An ignored folder is not copied or read unless --verbose is used to show the bytes saved."""
+    writeFile(os.path.join(project, ".pipenv2debignore"), "node_modules/\n*.csv\n!keep.csv\n")
+    writeFile(os.path.join(project, "mylib", "sub", "node_modules", "lib.js"), "x" * 100)
+    writeFile(os.path.join(project, "mylib", "table.csv"), "1,2\n")
+    writeFile(os.path.join(project, "mylib", "keep.csv"), "3,4\n")
+
+    def failGetSize(self, path):
+        raise AssertionError("The pruned folder {} was read.".format(path))
+    monkeypatch.setattr(IgnoreRules, "_getSize", failGetSize)
+    uio = RecordingUIO()
+    dataFiles = build(uio=uio).getDataFiles()
+    assert os.path.join(PACKAGE_FOLDER, "mylib", "keep.csv") in dataFiles
+    assert os.path.join(PACKAGE_FOLDER, "mylib", "table.csv") not in dataFiles
+    assert not [path for path in dataFiles if "node_modules" in path]
+    assert "Pruned 1 folders and 1 files from the package." in uio.lines
+
+    monkeypatch.undo()
+    uio = RecordingUIO()
+    build(uio=uio, verbose=True)
+    assert "Pruned 1 folders and 1 files from the package (104 bytes)." in uio.lines
+
+
+def test_exclude_folder_list_not_shared(project):
+    """@brief The folders in the exclude_folder_list.txt file of a project are not added to the
+              folders excluded by later builds in the same process."""
+    writeFile(os.path.join(project, "exclude_folder_list.txt"), "mylib\n")
+    excludeFolderList = list(DebBuilder.EXCLUDE_FOLDER_LIST)
+    for _ in range(2):
+        debBuilder = DebBuilder(QuietUIO(), getBuildOptions(), project)
+        debBuilder.build()
+        assert debBuilder._excludeFolderList == excludeFolderList + ["mylib"]
+    assert DebBuilder.EXCLUDE_FOLDER_LIST == excludeFolderList
@@ -0,0 +1,34 @@
+import os
+import shutil
+import filecmp
+
+from tests.util import DPKG_DEB_REQUIRED, writeFile
+
+
+def test_incremental_build_postinst_unchanged(build):
+    """@brief The postinst script created when the debian folder does not hold one must be the
+              same after each incremental build."""
+    firstPostInst = build(incremental=True).getControlFiles()["postinst"]
+    assert build(incremental=True).getControlFiles()["postinst"] == firstPostInst
+    assert firstPostInst.count(b"create_pip_env.sh") == 1
+
+
+def test_incremental_build_postinst_from_debian_folder(project, build):
+    """@brief The commands in the postinst script in the debian folder are kept and the generated
+              command is only inserted once."""
+    writeFile(os.path.join(project, "debian", "postinst"), "#!/bin/sh\necho installed\n")
+    for _ in range(2):
+        postInst = build(incremental=True).getControlFiles()["postinst"]
+        assert postInst.startswith(b"#!/bin/sh\n")
+        assert postInst.endswith(b"echo installed\n")
+        assert postInst.count(b"create_pip_env.sh") == 1
+
+
+@DPKG_DEB_REQUIRED
+def test_incremental_build_reproducible(build, tmp_path, monkeypatch):
+    """@brief A second incremental build of an unchanged project must produce the same deb file."""
+    # dpkg-deb uses this time for the files in the deb file rather than the time of the build.
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1600000000")
+    savedDeb = str(tmp_path / "first.deb")
+    shutil.copyfile(build(incremental=True).debFile, savedDeb)
+    assert filecmp.cmp(savedDeb, build(incremental=True).debFile, shallow=False)
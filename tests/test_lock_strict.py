@@ -0,0 +1,94 @@
+import os
+import subprocess
+
+import pytest
+
+from pipenv2deb.__main__ import DebBuilderError
+from pipenv2deb.shell_script import getTimedCommandLines
+from tests.util import writeFile
+
+
+@pytest.fixture
+def runScript(tmp_path):
+    """@brief A function that runs a shell script with pipenv and logger commands that record their
+              arguments. It returns (exit status, stdout, list of pipenv command lines, list of logger command lines)."""
+    binFolder = str(tmp_path / "fakebin")
+    recordFile = str(tmp_path / "record")
+    for command in ("pipenv", "logger"):
+        fakeFile = os.path.join(binFolder, command)
+        writeFile(fakeFile, '#!/bin/sh\necho "{} $PIPENV_VENV_IN_PROJECT $*" >> {}\nexit ${{FAKE_STATUS:-0}}\n'.format(command, recordFile))
+        os.chmod(fakeFile, 0o755)
+
+    def _runScript(script, pipenvStatus=0):
+        scriptFile = str(tmp_path / "script.sh")
+        writeFile(scriptFile, script)
+        env = dict(os.environ, PATH="{}:{}".format(binFolder, os.environ["PATH"]), FAKE_STATUS=str(pipenvStatus))
+        env.pop("PIPENV_VENV_IN_PROJECT", None)
+        result = subprocess.run(["sh", scriptFile], cwd=str(tmp_path), env=env, stdout=subprocess.PIPE, universal_newlines=True)
+        recordLines = []
+        if os.path.isfile(recordFile):
+            with open(recordFile) as fd:
+                recordLines = fd.read().splitlines()
+            os.remove(recordFile)
+        return (result.returncode,
+                result.stdout,
+                [line for line in recordLines if line.startswith("pipenv ")],
+                [line for line in recordLines if line.startswith("logger ")])
+    return _runScript
+
+
+def test_create_pip_env_script_syncs(build, runScript):
+    """@brief The script that creates the .venv folder when the package is installed installs the
+              packages in Pipfile.lock with pipenv sync, which never locks again."""
+    package = build()
+    assert package.getControlFiles()["postinst"].endswith(b"&& ./create_pip_env.sh\n")
+    entryType, mode, content = package.getPackageFile("create_pip_env.sh")
+    assert mode & 0o111
+    returnCode, stdout, pipenvLines, loggerLines = runScript(content.decode())
+    assert returnCode == 0
+    assert pipenvLines == ["pipenv enabled sync"]
+    assert "dependency install in" in stdout
+    assert "(exit status 0)" in stdout
+    assert len(loggerLines) == 1
+    assert "-t pipenv2deb pipenv2deb: dependency install in " in loggerLines[0]
+
+
+def test_create_pip_env_script_fails(build, runScript):
+    """@brief The exit status of pipenv sync is returned if it fails so that the package install fails."""
+    content = build().getPackageFile("create_pip_env.sh")[2]
+    returnCode, stdout, pipenvLines, loggerLines = runScript(content.decode(), pipenvStatus=3)
+    assert returnCode == 3
+    assert "(exit status 3)" in stdout
+
+
+def test_venv_oip_postinst_syncs(build, monkeypatch):
+    """@brief With --venv_oip the postinst script runs pipenv sync as the user that ran the build."""
+    monkeypatch.setenv("SUDO_USER", "builder")
+    postInst = build(venv_oip=True).getControlFiles()["postinst"].decode()
+    assert "/usr/bin/sudo -u builder pipenv sync\n" in postInst
+    assert "pipenv install" not in postInst
+
+
+def test_venv_oip_without_sudo_user(build, monkeypatch):
+    """@brief The user that creates the .venv folder with --venv_oip is unknown without sudo."""
+    monkeypatch.delenv("SUDO_USER", raising=False)
+    with pytest.raises(DebBuilderError, match="SUDO_USER"):
+        build(venv_oip=True)
+
+
+@pytest.mark.parametrize("exitOnError", [True, False])
+def test_timed_commands_stop_at_first_failure(runScript, exitOnError):
+    """@brief The timed commands stop at the first command that fails. The script only exits with its
+              exit status if exitOnError is set."""
+    lines = getTimedCommandLines("test", ["pipenv first", "pipenv second"], exitOnError)
+    lines.append("echo done")
+    returnCode, stdout, pipenvLines, loggerLines = runScript("\n".join(lines) + "\n", pipenvStatus=2)
+    assert pipenvLines == ["pipenv  first"]
+    assert "pipenv2deb: test took " in stdout
+    assert "(exit status 2)" in stdout
+    if exitOnError:
+        assert returnCode == 2
+        assert "done" not in stdout
+    else:
+        assert returnCode == 0
+        assert stdout.endswith("done\n")
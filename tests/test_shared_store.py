@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import glob
+import subprocess
+
+import pytest
+
+import pipenv2deb.shared_store as sharedStoreModule
+from pipenv2deb.shared_store import SharedStore, SharedStoreError
+from tests.util import QuietUIO, writeFile
+
+HASH = "sha256:{}".format("0" * 64)
+
+
+def _writeLockFile(lockFile, packageDict):
+    """@brief Write a Pipfile.lock file.
+       @param lockFile The file to write.
+       @param packageDict A dict of the locked attributes of each package keyed by name."""
+    writeFile(lockFile, json.dumps({"_meta": {}, "default": packageDict, "develop": {}}, indent=4))
+
+
+def _locked(version, markers=None):
+    """@return The locked attributes of a package."""
+    attrs = {"version": "=={}".format(version), "hashes": [HASH]}
+    if markers:
+        attrs["markers"] = markers
+    return attrs
+
+
+@pytest.fixture
+def pipInstalls(monkeypatch):
+    """@brief Runs the shared store with a pip that installs a package made from the requirement
+              rather than downloading it. Virtual environments are created without pip.
+              This is the list of the requirement lines that were installed."""
+    installList = []
+
+    def _checkCall(cmd):
+        if cmd[1:3] == ["-m", "venv"]:
+            subprocess.run([sys.executable, "-m", "venv", "--without-pip", cmd[-1]], check=True)
+            return
+        assert cmd[1:4] == ["-m", "pip", "install"]
+        assert "--require-hashes" in cmd
+        targetFolder = cmd[cmd.index("--target") + 1]
+        with open(cmd[cmd.index("-r") + 1]) as fd:
+            line = fd.read().strip()
+        installList.append(line)
+        name, version = line.split(" ")[0].split("==")
+        os.makedirs(targetFolder)
+        # The markers of the packages in the tests never match this machine.
+        if " ; " in line:
+            return
+        writeFile(os.path.join(targetFolder, name, "__init__.py"), "VERSION = '{}'\n".format(version))
+        writeFile(os.path.join(targetFolder, "{}-{}.dist-info".format(name, version), "METADATA"), "Name: {}\n".format(name))
+        writeFile(os.path.join(targetFolder, "bin", "{}-tool".format(name)), "#!/usr/bin/python3\nimport {}\n".format(name))
+
+    monkeypatch.setattr(sharedStoreModule, "check_call", _checkCall)
+    return installList
+
+
+@pytest.fixture
+def store(tmp_path):
+    """@brief A SharedStore instance using a store folder in the test folder."""
+    return SharedStore(QuietUIO(), str(tmp_path / "store"))
+
+
+def _install(store, tmp_path, owner, packageDict):
+    """@brief Install the virtual environment of an application.
+       @return The virtual environment folder."""
+    lockFile = str(tmp_path / owner / "Pipfile.lock")
+    _writeLockFile(lockFile, packageDict)
+    venvFolder = str(tmp_path / owner / ".venv")
+    store.install(owner, lockFile, venvFolder, threads=2)
+    return venvFolder
+
+
+def _getSitePackages(venvFolder):
+    """@return The site-packages folder of a virtual environment."""
+    return glob.glob(os.path.join(venvFolder, "lib", "python*", "site-packages"))[0]
+
+
+def _getEntries(tmp_path):
+    """@return The names of the packages in the store."""
+    return sorted(os.listdir(str(tmp_path / "store" / SharedStore.DISTS_FOLDER)))
+
+
+def _readOwnerFile(tmp_path, owner):
+    """@return The contents of the owner file of an application."""
+    with open(str(tmp_path / "store" / SharedStore.OWNERS_FOLDER / "{}.json".format(owner))) as fd:
+        return json.load(fd)
+
+
+def test_install(store, tmp_path, pipInstalls):
+    """@brief The packages are installed into the store once and the virtual environment of each
+              application holds hard links to them."""
+    venvFolder = _install(store, tmp_path, "app1", {"alpha": _locked("1.0")})
+    entryName = SharedStore.getEntryName("alpha", "==1.0", [HASH])
+    assert _getEntries(tmp_path) == [entryName]
+    assert pipInstalls == ["alpha==1.0 --hash={}".format(HASH)]
+
+    storeFile = str(tmp_path / "store" / SharedStore.DISTS_FOLDER / entryName / "alpha" / "__init__.py")
+    venvFile = os.path.join(_getSitePackages(venvFolder), "alpha", "__init__.py")
+    assert os.stat(storeFile).st_ino == os.stat(venvFile).st_ino
+    # The compiled files are installed in the store and shared.
+    assert glob.glob(os.path.join(_getSitePackages(venvFolder), "alpha", "__pycache__", "*.pyc"))
+    # Scripts are copied so that they run the python interpreter in the virtual environment.
+    with open(os.path.join(venvFolder, "bin", "alpha-tool")) as fd:
+        assert fd.readline() == "#!{}\n".format(os.path.join(venvFolder, "bin", "python"))
+    assert os.path.isfile(str(tmp_path / "store" / SharedStore.SCRIPT_NAME))
+    assert _readOwnerFile(tmp_path, "app1") == {"venv": venvFolder, "entries": [entryName]}
+
+    # A second application using the same package does not install it again.
+    _install(store, tmp_path, "app2", {"alpha": _locked("1.0")})
+    assert len(pipInstalls) == 1
+    assert _readOwnerFile(tmp_path, "app2")["entries"] == [entryName]
+
+
+def test_markers_not_matched(store, tmp_path, pipInstalls):
+    """@brief A package that pip does not install as it's markers do not match this machine is not used."""
+    _install(store, tmp_path, "app1", {"alpha": _locked("1.0"), "beta": _locked("2.0", markers="sys_platform == 'win32'")})
+    assert pipInstalls[-1] == "beta==2.0 ; sys_platform == 'win32' --hash={}".format(HASH)
+    assert _readOwnerFile(tmp_path, "app1")["entries"] == [SharedStore.getEntryName("alpha", "==1.0", [HASH])]
+    assert _getEntries(tmp_path) == [SharedStore.getEntryName("alpha", "==1.0", [HASH])]
+
+
+def test_unpinned_package(store, tmp_path, pipInstalls):
+    """@brief Packages without a version and hashes (E.G VCS packages) cannot be placed in the store."""
+    with pytest.raises(SharedStoreError, match="gamma"):
+        _install(store, tmp_path, "app1", {"gamma": {"git": "https://example.com/gamma.git"}})
+    assert not pipInstalls
+
+
+def test_upgrade_removes_unused_package(store, tmp_path, pipInstalls):
+    """@brief A package that is no longer used by an application that is installed again is removed."""
+    _install(store, tmp_path, "app1", {"alpha": _locked("1.0")})
+    _install(store, tmp_path, "app1", {"alpha": _locked("1.1")})
+    assert _getEntries(tmp_path) == [SharedStore.getEntryName("alpha", "==1.1", [HASH])]
+
+
+def test_release(store, tmp_path, pipInstalls):
+    """@brief Releasing an application removes it's owner file and virtual environment and the
+              packages that no other application uses."""
+    venvFolder = _install(store, tmp_path, "app1", {"alpha": _locked("1.0"), "beta": _locked("2.0")})
+    _install(store, tmp_path, "app2", {"beta": _locked("2.0")})
+    store.release("app1", venvFolder)
+    assert not os.path.exists(venvFolder)
+    assert not os.path.exists(str(tmp_path / "store" / SharedStore.OWNERS_FOLDER / "app1.json"))
+    assert _getEntries(tmp_path) == [SharedStore.getEntryName("beta", "==2.0", [HASH])]
+
+    store.release("app2")
+    assert _getEntries(tmp_path) == []
+
+
+def test_gc_keeps_packages_with_invalid_owner_file(store, tmp_path, pipInstalls):
+    """@brief No packages are removed if the packages used by an owner are unknown."""
+    _install(store, tmp_path, "app1", {"alpha": _locked("1.0")})
+    writeFile(str(tmp_path / "store" / SharedStore.OWNERS_FOLDER / "app1.json"), "{")
+    store.gc()
+    assert _getEntries(tmp_path) == [SharedStore.getEntryName("alpha", "==1.0", [HASH])]
+
+
+def test_shared_store_package(build):
+    """@brief The package holds the shared store script which the maintainer scripts run to install
+              and release the packages used by the application."""
+    package = build(shared_store=True)
+    entryType, mode, content = package.getPackageFile(SharedStore.SCRIPT_NAME)
+    assert mode & 0o111
+    with open(sharedStoreModule.__file__, 'rb') as fd:
+        assert content == fd.read()
+    controlFiles = package.getControlFiles()
+    assert b"python3 ./shared_store.py install --owner test-app --lock Pipfile.lock --venv .venv\n" in controlFiles["postinst"]
+    assert b"shared_store.py release --owner test-app --venv /usr/local/bin/test-app.pipenvpkg/.venv" in controlFiles["postrm"]
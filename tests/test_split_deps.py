@@ -0,0 +1,100 @@
+import os
+import shutil
+
+import pytest
+
+from pipenv2deb.__main__ import DebBuilderError, buildPackage, getBuildOptions
+from tests.util import CONTROL, PACKAGE_FOLDER, PACKAGE_NAME, BuiltPackage, QuietUIO, readControlFiles, readDataFiles, writeFile
+
+
+def _getDebFiles(package):
+    """@param package A BuiltPackage instance built with --split_deps.
+       @return A tuple containing the application and dependencies deb files."""
+    depsPrefix = "{}-deps-".format(PACKAGE_NAME)
+    depsDebFileList = [_file for _file in package.fileList if os.path.basename(_file).startswith(depsPrefix)]
+    appDebFileList = [_file for _file in package.fileList if _file.endswith(".deb") and _file not in depsDebFileList]
+    assert len(depsDebFileList) == 1
+    assert len(appDebFileList) == 1
+    return appDebFileList[0], depsDebFileList[0]
+
+
+def _getControlFields(debFile):
+    """@return A dict of the fields in the control file of a deb file."""
+    control = readControlFiles(debFile)["control"].decode()
+    return dict(line.split(": ", 1) for line in control.splitlines() if not line.startswith(" "))
+
+
+def _getDigest(package):
+    """@return The lock file digest in the name of the dependencies package."""
+    appDebFile, depsDebFile = _getDebFiles(package)
+    return _getControlFields(depsDebFile)["Package"].split("-deps-")[1]
+
+
+def test_deps_package(build):
+    """@brief The dependencies package is named after the lock digest and the application package
+              depends on it and links to it's .venv folder."""
+    appDebFile, depsDebFile = _getDebFiles(build(split_deps=True))
+    depsFields = _getControlFields(depsDebFile)
+    depsName = depsFields["Package"]
+    digest = depsName.split("-deps-")[1]
+    assert len(digest) == 12
+    assert os.path.basename(depsDebFile) == "{}-1.0-all.deb".format(depsName)
+    assert depsFields["Architecture"] == "all"
+    assert depsFields["Maintainer"] == "Test <test@example.com>"
+
+    targetDepsFolder = "usr/local/bin/{}.pipenvdeps/{}".format(PACKAGE_NAME, digest)
+    depsDataFiles = readDataFiles(depsDebFile)
+    for name in ("Pipfile", "Pipfile.lock", "create_pip_env.sh"):
+        assert os.path.join(targetDepsFolder, name) in depsDataFiles
+    depsControlFiles = readControlFiles(depsDebFile)
+    assert depsControlFiles["postinst"].endswith("cd /{} && ./create_pip_env.sh\n".format(targetDepsFolder).encode())
+    assert "rm -rf /{}\n".format(targetDepsFolder).encode() in depsControlFiles["postrm"]
+
+    assert _getControlFields(appDebFile)["Depends"] == "{} (= 1.0)".format(depsName)
+    appDataFiles = readDataFiles(appDebFile)
+    assert appDataFiles[os.path.join(PACKAGE_FOLDER, ".venv")] == ("symlink", 0o777, "/{}/.venv".format(targetDepsFolder))
+    assert not [path for path in appDataFiles if ".pipenvdeps" in path]
+
+
+def test_depends_appended(project, build):
+    """@brief The dependencies package is added to the packages that the application already depends on."""
+    writeFile(os.path.join(project, "debian", "control"), CONTROL + "Depends: python3\n")
+    appDebFile, depsDebFile = _getDebFiles(build(split_deps=True))
+    assert _getControlFields(appDebFile)["Depends"] == "python3, {} (= 1.0)".format(_getControlFields(depsDebFile)["Package"])
+    assert _getControlFields(depsDebFile)["Depends"] == "python3"
+
+
+def test_digest_follows_lock_file(project, build):
+    """@brief The digest only changes when the locked packages change."""
+    digest = _getDigest(build(split_deps=True))
+    writeFile(os.path.join(project, "app.py"), "print('changed')\n")
+    assert _getDigest(build(split_deps=True)) == digest
+
+    with open(os.path.join(project, "Pipfile.lock")) as fd:
+        lock = fd.read()
+    writeFile(os.path.join(project, "Pipfile.lock"), lock.replace('"default": {}', '"default": {"six": {"version": "==1.16.0"}}'))
+    assert _getDigest(build(split_deps=True)) != digest
+
+
+def test_digest_independent_of_project_folder(project, tmp_path, build):
+    """@brief The same lock file in a different project folder gives the same dependencies package."""
+    digest = _getDigest(build(split_deps=True))
+    movedProject = str(tmp_path / "moved")
+    shutil.copytree(project, movedProject, ignore=shutil.ignore_patterns("packages", "build", "build_deps"))
+    package = BuiltPackage(buildPackage(movedProject, options=getBuildOptions(split_deps=True), uio=QuietUIO()))
+    assert _getDigest(package) == digest
+
+
+def test_existing_deps_package_reused(build):
+    """@brief The dependencies package is not built again when the lock file has not changed."""
+    appDebFile, depsDebFile = _getDebFiles(build(split_deps=True))
+    os.utime(depsDebFile, (0, 0))
+    assert _getDebFiles(build(split_deps=True))[1] == depsDebFile
+    assert os.stat(depsDebFile).st_mtime == 0
+
+
+@pytest.mark.parametrize("optionDict", [{"tgz": True}, {"rpm": True}, {"venv_oip": True}])
+def test_split_deps_incompatible_options(build, optionDict):
+    """@brief The options that cannot be used with --split_deps are rejected."""
+    with pytest.raises(DebBuilderError, match="--split_deps"):
+        build(split_deps=True, **optionDict)
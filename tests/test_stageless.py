@@ -0,0 +1,11 @@
+from tests.util import DPKG_DEB_REQUIRED
+
+
+@DPKG_DEB_REQUIRED
+def test_stageless_deb_matches_dpkg_deb(build, tmp_path):
+    """@brief A deb file written from the manifest (--stageless) must hold the same files, links,
+              folders and modes as the deb file built by dpkg-deb from the build folder."""
+    dpkgPackage = build(outputFolder=str(tmp_path / "dpkg"))
+    stagelessPackage = build(outputFolder=str(tmp_path / "stageless"), stageless=True)
+    assert stagelessPackage.getDataFiles() == dpkgPackage.getDataFiles()
+    assert stagelessPackage.getControlFiles() == dpkgPackage.getControlFiles()
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from pipenv2deb.stager import Stager
+from tests.util import PACKAGE_FOLDER, QuietUIO, writeFile
+
+
+def _failLink(srcFile, destFile):
+    raise OSError("Invalid cross-device link")
+
+
+def _failReflink(self, srcFile, destFile):
+    return False
+
+
+@pytest.fixture
+def stageFiles(tmp_path):
+    """@brief A function that stages a source file with a link mode and returns the source and staged files."""
+    srcFile = str(tmp_path / "src" / "lib.py")
+    writeFile(srcFile, "VALUE = 1\n")
+    buildFolder = str(tmp_path / "build")
+
+    def _stageFiles(linkMode, allowLink=True):
+        stager = Stager(QuietUIO(), buildFolder, linkMode=linkMode)
+        stager.begin()
+        destFile = os.path.join(buildFolder, "lib.py")
+        stager.copyFile(srcFile, destFile, allowLink=allowLink)
+        return srcFile, destFile
+    return _stageFiles
+
+
+def _isLinked(srcFile, destFile):
+    """@return True if both paths refer to the same file."""
+    return os.stat(srcFile).st_ino == os.stat(destFile).st_ino
+
+
+@pytest.mark.parametrize("linkMode", [Stager.LINK_MODE_HARDLINK, Stager.LINK_MODE_AUTO])
+def test_hardlink(stageFiles, monkeypatch, linkMode):
+    """@brief A file is hard linked if reflinks are not supported."""
+    monkeypatch.setattr(Stager, "_reflink", _failReflink)
+    srcFile, destFile = stageFiles(linkMode)
+    assert _isLinked(srcFile, destFile)
+
+
+@pytest.mark.parametrize("linkMode", [Stager.LINK_MODE_COPY, Stager.LINK_MODE_HARDLINK, Stager.LINK_MODE_AUTO])
+def test_link_not_allowed(stageFiles, linkMode):
+    """@brief A file is always copied if the caller does not allow it to be linked."""
+    srcFile, destFile = stageFiles(linkMode, allowLink=False)
+    assert not _isLinked(srcFile, destFile)
+
+
+@pytest.mark.parametrize("linkMode", Stager.LINK_MODES)
+def test_link_fallback_to_copy(stageFiles, monkeypatch, linkMode):
+    """@brief A file that cannot be linked (E.G the build folder is on a different filesystem) is copied."""
+    monkeypatch.setattr(Stager, "_reflink", _failReflink)
+    monkeypatch.setattr(os, "link", _failLink)
+    srcFile, destFile = stageFiles(linkMode)
+    assert not _isLinked(srcFile, destFile)
+    with open(destFile) as fd:
+        assert fd.read() == "VALUE = 1\n"
+    assert os.stat(destFile).st_mtime_ns == os.stat(srcFile).st_mtime_ns
+
+
+def test_reflink_failure_leaves_no_file(stageFiles, monkeypatch):
+    """@brief A failed reflink does not leave an empty file that stops the file being copied."""
+    def _failIoctl(fd, request, arg):
+        raise OSError("Operation not supported")
+    monkeypatch.setattr("pipenv2deb.stager.fcntl.ioctl", _failIoctl)
+    srcFile, destFile = stageFiles(Stager.LINK_MODE_REFLINK)
+    assert not _isLinked(srcFile, destFile)
+    with open(destFile) as fd:
+        assert fd.read() == "VALUE = 1\n"
+
+
+def test_linked_venv_not_changed(project, venv, build, monkeypatch):
+    """@brief The .venv files that are changed in the build folder are replaced rather than written
+              to so the hard linked source files in the .venv folder are not changed."""
+    monkeypatch.setattr(Stager, "_reflink", _failReflink)
+    dataFile = os.path.join(venv, "lib", "data.bin")
+    writeFile(dataFile, "data")
+    scriptFile = os.path.join(venv, "bin", "app-tool")
+    with open(scriptFile) as fd:
+        script = fd.read()
+    scriptMode = os.stat(scriptFile).st_mode
+
+    package = build(venv=True, link=Stager.LINK_MODE_HARDLINK, incremental=True)
+
+    stagedVenv = os.path.join(project, "build", PACKAGE_FOLDER, ".venv")
+    assert _isLinked(dataFile, os.path.join(stagedVenv, "lib", "data.bin"))
+    assert not _isLinked(scriptFile, os.path.join(stagedVenv, "bin", "app-tool"))
+    with open(scriptFile) as fd:
+        assert fd.read() == script
+    assert os.stat(scriptFile).st_mode == scriptMode
+    assert not package.getPackageFile(".venv", "bin", "app-tool")[2].startswith("#!{}".format(venv).encode())
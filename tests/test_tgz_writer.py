@@ -0,0 +1,68 @@
+import os
+import tarfile
+import threading
+
+import pytest
+
+from pipenv2deb import __main__ as mainModule
+from pipenv2deb.__main__ import DebBuilder, getBuildOptions
+from pipenv2deb.stager import StageEntry
+from pipenv2deb.tgz_writer import TgzWriter
+from tests.util import QuietUIO, getDebFile
+
+
+def test_tgz_matches_deb(build):
+    """@brief The tgz package must hold the files in the deb package and the postinst script as
+              the slackware install script."""
+    package = build(tgz=True)
+    tgzFile = [_file for _file in package.fileList if _file.endswith(".tgz")][0]
+    fileDict = {}
+    with tarfile.open(tgzFile) as tar:
+        for member in tar.getmembers():
+            if member.isfile():
+                fileDict[os.path.normpath(member.name)] = (member.mode, tar.extractfile(member).read())
+    for path, (entryType, mode, content) in package.getDataFiles().items():
+        if entryType == "file":
+            assert fileDict.pop(path) == (mode, content), path
+    assert fileDict.pop(TgzWriter.INSTALL_SCRIPT)[1] == package.getControlFiles()["postinst"]
+    assert not fileDict
+
+
+def test_failed_write_removes_temporary_file(tmp_path):
+    """@brief A tgz file that cannot be written must not leave a temporary file or replace the
+              existing tgz file."""
+    tgzFile = tmp_path / "app.tgz"
+    tgzFile.write_bytes(b"previous")
+    missingFile = StageEntry("usr/bin/app", StageEntry.FILE, 0o755, 0, srcFile=str(tmp_path / "missing"))
+    with pytest.raises(OSError):
+        TgzWriter([missingFile]).write(str(tgzFile))
+    assert os.listdir(str(tmp_path)) == ["app.tgz"]
+    assert tgzFile.read_bytes() == b"previous"
+
+
+def test_rpm_built_with_delta(project, tmp_path, monkeypatch):
+    """@brief The rpm package is converted from the deb file at the same time as the delta file is
+              created."""
+    rpmStarted = threading.Event()
+
+    def fakeCheckCall(cmdList, cwd=None):
+        # Stands in for sudo alien --to-rpm.
+        assert cmdList[:3] == ["sudo", "alien", "--to-rpm"]
+        assert os.path.isfile(os.path.join(cwd, cmdList[-1]))
+        rpmStarted.set()
+        open(os.path.join(cwd, "test-app-1.0-2.noarch.rpm"), 'w').close()
+
+    def fakeCreateDelta(self):
+        # The delta file is only created once the rpm package has started.
+        assert rpmStarted.wait(10)
+
+    previousDeb = tmp_path / "previous.deb"
+    previousDeb.write_bytes(b"")
+    monkeypatch.setattr(mainModule, "check_call", fakeCheckCall)
+    monkeypatch.setattr(DebBuilder, "_createDelta", fakeCreateDelta)
+    # The rpm package can only be built as root.
+    monkeypatch.setattr(DebBuilder, "_isRootUser", lambda self: True)
+    options = getBuildOptions(rpm=True, stageless=True, delta_from=str(previousDeb))
+    fileList = DebBuilder(QuietUIO(), options, project).build()
+    assert os.path.isfile(getDebFile(fileList))
+    assert [_file for _file in fileList if _file.endswith(".rpm")]
@@ -0,0 +1,45 @@
+import os
+import sys
+import json
+
+from pipenv2deb.venv_cache import VenvCache
+from tests.util import QuietUIO, writeFile
+
+
+def addEntry(cacheFolder, lockFile, size):
+    """@brief Add a virtual environment to the venv cache without running pip.
+       @param cacheFolder The build cache folder.
+       @param lockFile The Pipfile.lock file of the virtual environment.
+       @param size The size recorded for the virtual environment in bytes.
+       @return The key of the virtual environment."""
+    venvCache = VenvCache(QuietUIO(), cacheFolder, size)
+    key = venvCache.getKey(lockFile, venvCache._getPythonVersion(sys.executable))
+    entryFolder = os.path.join(cacheFolder, VenvCache.VENVS_FOLDER, key)
+    os.makedirs(os.path.join(entryFolder, VenvCache.VENV_FOLDER))
+    writeFile(os.path.join(entryFolder, VenvCache.ENTRY_FILE), json.dumps({"size": size}))
+    return key
+
+
+def test_evict_skips_venv_in_use(tmp_path):
+    """@brief A virtual environment that a build is using must not be removed from the cache until
+              it is released."""
+    cacheFolder = str(tmp_path / "cache")
+    lockFileList = []
+    for name in ("a", "b"):
+        lockFile = str(tmp_path / name / "Pipfile.lock")
+        writeFile(lockFile, json.dumps({"default": {"{}pkg".format(name): {}}}))
+        lockFileList.append(lockFile)
+    usedKey = addEntry(cacheFolder, lockFileList[0], 1000)
+    otherKey = addEntry(cacheFolder, lockFileList[1], 1000)
+    usedFolder = os.path.join(cacheFolder, VenvCache.VENVS_FOLDER, usedKey)
+
+    usingCache = VenvCache(QuietUIO(), cacheFolder, 1000)
+    assert usingCache.getVenv(lockFileList[0], sys.executable) == os.path.join(usedFolder, VenvCache.VENV_FOLDER)
+    evictingCache = VenvCache(QuietUIO(), cacheFolder, 1000)
+    evictingCache._evict(otherKey)
+    assert os.path.isdir(usedFolder)
+
+    usingCache.release()
+    evictingCache._evict(otherKey)
+    assert not os.path.isdir(usedFolder)
+    assert os.path.isdir(os.path.join(cacheFolder, VenvCache.VENVS_FOLDER, otherKey))
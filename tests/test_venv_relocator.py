@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from pipenv2deb.__main__ import DebBuilderError
+from tests.util import PACKAGE_FOLDER
+
+TARGET_PACKAGE_FOLDER = "/" + PACKAGE_FOLDER
+
+
+@pytest.mark.parametrize("stageless", [False, True])
+def test_relocated_venv_holds_no_build_paths(project, venv, build, stageless):
+    """@brief The files in the .venv folder in the package must refer to the folders that the
+              package is installed into rather than the folders on the build machine."""
+    package = build(venv=True, stageless=stageless)
+    for path, (entryType, mode, content) in package.getDataFiles().items():
+        if entryType == "file":
+            assert project.encode() not in content, path
+        elif entryType == "symlink":
+            assert not content.startswith(project), path
+
+    entryType, mode, content = package.getPackageFile(".venv", "bin", "app-tool")
+    assert content.startswith("#!{}/.venv/bin/python\n".format(TARGET_PACKAGE_FOLDER).encode())
+    assert mode & 0o111
+    assert os.path.realpath(venv).encode() not in package.getPackageFile(".venv", "pyvenv.cfg")[2]
+    # The source files are not changed when the staged files are changed.
+    with open(os.path.join(venv, "bin", "app-tool")) as fd:
+        assert fd.readline() == "#!{}/bin/python\n".format(venv)
+
+
+def test_build_path_in_binary_file(venv, build):
+    """@brief A binary file in the .venv folder that holds the path of a build machine folder
+              cannot be changed so the build fails."""
+    with open(os.path.join(venv, "lib", "native.so"), 'wb') as fd:
+        fd.write(b"\0ELF\0" + venv.encode() + b"\0")
+    with pytest.raises(DebBuilderError, match="native.so"):
+        build(venv=True)
@@ -0,0 +1,53 @@
+import os
+import glob
+
+from tests.util import PACKAGE_FOLDER, writeFile
+
+
+def getSitePackages(venv):
+    """@param venv The .venv folder.
+       @return The site-packages folder relative to the .venv folder."""
+    return os.path.relpath(glob.glob(os.path.join(venv, "lib", "python*", "site-packages"))[0], venv)
+
+
+def test_slim_keeps_importable_folders(venv, build):
+    """@brief --slim must only remove the test and doc folders at the top of each distribution that
+              cannot be imported. A test or doc module package deeper in a distribution is kept."""
+    sitePackages = getSitePackages(venv)
+    fileList = [os.path.join("pkg", "__init__.py"),
+                os.path.join("pkg", "sub", "__init__.py"),
+                os.path.join("pkg", "sub", "test", "__init__.py"),
+                os.path.join("pkg", "sub", "doc", "__init__.py"),
+                os.path.join("pkg", "testing", "__init__.py"),
+                os.path.join("pkg", "tests", "__init__.py"),
+                os.path.join("pkg", "docs", "index.rst"),
+                os.path.join("other", "test", "test_other.py"),
+                os.path.join("pkg", "sub", "types.pyi")]
+    for _file in fileList:
+        writeFile(os.path.join(venv, sitePackages, _file), "\n")
+
+    dataFiles = build(venv=True, slim=True).getDataFiles()
+    stagedSitePackages = os.path.join(PACKAGE_FOLDER, ".venv", sitePackages)
+    stagedFiles = set(os.path.relpath(path, stagedSitePackages) for path in dataFiles if path.startswith(stagedSitePackages + os.sep))
+    assert os.path.join("pkg", "sub", "test", "__init__.py") in stagedFiles
+    assert os.path.join("pkg", "sub", "doc", "__init__.py") in stagedFiles
+    assert os.path.join("pkg", "testing", "__init__.py") in stagedFiles
+    assert os.path.join("pkg", "tests", "__init__.py") in stagedFiles
+    assert os.path.join("pkg", "docs", "index.rst") not in stagedFiles
+    assert os.path.join("other", "test", "test_other.py") not in stagedFiles
+    assert os.path.join("pkg", "sub", "types.pyi") not in stagedFiles
+
+
+def test_slim_user_rules(project, venv, build):
+    """@brief The patterns in the slim_rules.txt file do not match across folders and a ! pattern
+              keeps a file that another rule removes."""
+    sitePackages = getSitePackages(venv)
+    for _file in (os.path.join("pkg", "data.bin"), os.path.join("pkg", "sub", "data.bin"), os.path.join("pkg", "keep.pyi")):
+        writeFile(os.path.join(venv, sitePackages, _file), "\n")
+    writeFile(os.path.join(project, "slim_rules.txt"), "# Comment\n{}/pkg/*.bin\n!keep.pyi\n".format(sitePackages))
+
+    dataFiles = build(venv=True, slim=True).getDataFiles()
+    stagedSitePackages = os.path.join(PACKAGE_FOLDER, ".venv", sitePackages)
+    assert os.path.join(stagedSitePackages, "pkg", "data.bin") not in dataFiles
+    assert os.path.join(stagedSitePackages, "pkg", "sub", "data.bin") in dataFiles
+    assert os.path.join(stagedSitePackages, "pkg", "keep.pyi") in dataFiles
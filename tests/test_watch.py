@@ -0,0 +1,42 @@
+import os
+import stat
+
+import pytest
+
+from pipenv2deb.__main__ import DebBuilder, getBuildOptions
+from pipenv2deb.deb_writer import GzipMemberCache
+from tests.util import PACKAGE_FOLDER, QuietUIO, getDebFile, readDataFiles, writeFile
+
+
+class FakeWatcher(object):
+    """@brief Stands in for the FileWatcher as the changes are passed to the builder by the test."""
+
+    def rescan(self):
+        pass
+
+
+@pytest.mark.parametrize("stageless", [False, True])
+def test_watch_rebuild_keeps_file_modes(project, stageless):
+    """@brief A python file changed in watch mode must still be executable in the package built
+              again and the files in the package folders must keep their modes."""
+    builder = DebBuilder(QuietUIO(), getBuildOptions(watch=True, stageless=stageless, debug=True), project)
+    watcher = FakeWatcher()
+    if stageless:
+        # As in _watch() the gzip members are kept so that the deb file is written again quickly.
+        builder._memberCache = GzipMemberCache()
+    builder._watchBuild(watcher, None)
+    firstEntryDict = readDataFiles(getDebFile(builder.getOutputFiles()))
+
+    writeFile(os.path.join(project, "app.py"), "print('changed')\n")
+    writeFile(os.path.join(project, "mylib", "values.py"), "VALUE = 2\n")
+    builder._watchBuild(watcher, ["app.py", os.path.join("mylib", "values.py")])
+    entryDict = readDataFiles(getDebFile(builder.getOutputFiles()))
+
+    # Only the changed files are staged again rather than running a full build.
+    assert not builder._watchFullBuild
+    appEntry = entryDict[os.path.join(PACKAGE_FOLDER, "app.py")]
+    assert appEntry[2] == b"print('changed')\n"
+    assert appEntry[1] & stat.S_IXUSR
+    assert entryDict[os.path.join(PACKAGE_FOLDER, "mylib", "values.py")][2] == b"VALUE = 2\n"
+    for path, (entryType, mode, _) in firstEntryDict.items():
+        assert entryDict[path][:2] == (entryType, mode), path
@@ -0,0 +1,75 @@
+import os
+import json
+import zipfile
+import hashlib
+import subprocess
+
+from pipenv2deb import wheelhouse as wheelhouseModule
+from pipenv2deb.wheelhouse import Wheelhouse
+from tests.util import QuietUIO, writeFile
+
+WHEEL_NAME = "tinypkg-1.0-py3-none-any.whl"
+
+
+def createWheel(folder):
+    """@brief Create a pure python wheel holding the tinypkg package.
+       @param folder The folder to create the wheel in.
+       @return The sha256 hash of the wheel (sha256:<hex digest>)."""
+    fileDict = {"tinypkg/__init__.py": "VALUE = 42\n",
+                "tinypkg-1.0.dist-info/METADATA": "Metadata-Version: 2.1\nName: tinypkg\nVersion: 1.0\n",
+                "tinypkg-1.0.dist-info/WHEEL": "Wheel-Version: 1.0\nGenerator: test\nRoot-Is-Purelib: true\nTag: py3-none-any\n"}
+    recordLines = ["{},,".format(name) for name in fileDict] + ["tinypkg-1.0.dist-info/RECORD,,"]
+    fileDict["tinypkg-1.0.dist-info/RECORD"] = "\n".join(recordLines) + "\n"
+    wheelFile = os.path.join(folder, WHEEL_NAME)
+    with zipfile.ZipFile(wheelFile, 'w') as zipFd:
+        for name, content in fileDict.items():
+            zipFd.writestr(name, content)
+    with open(wheelFile, 'rb') as fd:
+        return "sha256:{}".format(hashlib.sha256(fd.read()).hexdigest())
+
+
+def writeLockFile(lockFile, packageDict, pythonVersion="3.11"):
+    """@brief Write a Pipfile.lock file.
+       @param lockFile The file to write.
+       @param packageDict The packages in the default section.
+       @param pythonVersion The python version required by the Pipfile."""
+    writeFile(lockFile, json.dumps({"_meta": {"requires": {"python_version": pythonVersion}},
+                                    "default": packageDict,
+                                    "develop": {}}))
+
+
+def test_download_targets_python_version_and_platform(tmp_path, monkeypatch):
+    """@brief The wheels are downloaded for the python version in the Pipfile.lock file and the
+              target platforms."""
+    lockFile = str(tmp_path / "Pipfile.lock")
+    writeLockFile(lockFile, {"six": {"version": "==1.16.0", "hashes": ["sha256:00"]}}, "3.9")
+    cmdList = []
+    monkeypatch.setattr(wheelhouseModule, "check_call", cmdList.append)
+    Wheelhouse(QuietUIO(), lockFile, str(tmp_path / "wheels"), "python3", ["manylinux2014_aarch64", "linux_aarch64"]).download()
+    downloadCmd = " ".join(cmdList[0])
+    assert "--python-version 3.9" in downloadCmd
+    assert "--platform manylinux2014_aarch64 --platform linux_aarch64" in downloadCmd
+    assert "--only-binary=:all:" in downloadCmd
+
+
+def test_install_script_installs_wheelhouse(tmp_path):
+    """@brief The install script creates the virtual environment from the wheels using a single
+              pip command that checks the hashes in the requirements file."""
+    packageFolder = str(tmp_path)
+    wheelhouseFolder = os.path.join(packageFolder, "wheelhouse")
+    os.makedirs(wheelhouseFolder)
+    wheelHash = createWheel(wheelhouseFolder)
+    lockFile = os.path.join(packageFolder, "Pipfile.lock")
+    writeLockFile(lockFile, {"tinypkg": {"version": "==1.0", "hashes": [wheelHash]}})
+    wheelhouse = Wheelhouse(QuietUIO(), lockFile, None, "python3")
+    writeFile(os.path.join(wheelhouseFolder, Wheelhouse.REQUIREMENTS_FILE), wheelhouse.getRequirements())
+    writeFile(os.path.join(wheelhouseFolder, Wheelhouse.SHA256SUMS_FILE), wheelhouse.getSHA256Sums([os.path.join(wheelhouseFolder, WHEEL_NAME)]))
+    installScript = os.path.join(packageFolder, "install_wheelhouse.sh")
+    script = wheelhouse.getInstallScript("wheelhouse", ".venv")
+    assert "xargs" not in script
+    assert script.count("pip install") == 1
+    writeFile(installScript, script)
+
+    subprocess.check_call(["sh", installScript], stdout=subprocess.DEVNULL)
+    venvPython = os.path.join(packageFolder, ".venv", "bin", "python")
+    assert subprocess.check_output([venvPython, "-c", "import tinypkg; print(tinypkg.VALUE)"]).strip() == b"42"
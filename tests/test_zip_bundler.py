@@ -0,0 +1,36 @@
+import os
+import sys
+import subprocess
+
+from pipenv2deb.zip_bundler import ZipBundler
+from tests.util import PACKAGE_FOLDER
+
+
+def test_zip_bundle_imports(project, build, tmp_path):
+    """@brief A pure python package folder placed in the zip file (--zip_packages) must be
+              imported from the zip file by the application."""
+    # A package folder that holds a file other than a python file is not placed in the zip file.
+    os.remove(os.path.join(project, "mylib", "data.txt"))
+    package = build(zip_packages=True)
+    assert not [path for path in package.getDataFiles() if path.startswith(os.path.join(PACKAGE_FOLDER, "mylib"))]
+
+    zipFile = tmp_path / ZipBundler.ZIP_FILENAME
+    zipFile.write_bytes(package.getPackageFile(ZipBundler.ZIP_FILENAME)[2])
+    appFile = tmp_path / "app.py"
+    appFile.write_bytes(package.getPackageFile("app.py")[2])
+    env = dict(os.environ, PYTHONPATH=str(zipFile))
+    result = subprocess.run([sys.executable, str(appFile)], cwd=str(tmp_path), env=env, stdout=subprocess.PIPE, check=True)
+    assert result.stdout == b"1\n"
+    result = subprocess.run([sys.executable, "-c", "import mylib.values; print(mylib.values.__file__)"],
+                            cwd=str(tmp_path), env=env, stdout=subprocess.PIPE, check=True)
+    assert result.stdout.decode().startswith(os.path.join(str(zipFile), "mylib"))
+    # The startup script adds the installed zip file to the python path.
+    zipPathLine = "PYTHONPATH=/{}/{}".format(PACKAGE_FOLDER, ZipBundler.ZIP_FILENAME).encode()
+    assert zipPathLine in package.getDataFiles()["usr/local/bin/app"][2]
+
+
+def test_impure_package_not_zipped(build):
+    """@brief A package folder that holds a data file is copied into the package."""
+    dataFiles = build(zip_packages=True).getDataFiles()
+    assert os.path.join(PACKAGE_FOLDER, "mylib", "data.txt") in dataFiles
+    assert os.path.join(PACKAGE_FOLDER, ZipBundler.ZIP_FILENAME) not in dataFiles
@@ -0,0 +1,176 @@
+"""@brief Functions used by the pipenv2deb tests to create projects and read the packages built."""
+
+import io
+import os
+import sys
+import shutil
+import tarfile
+import subprocess
+
+import pytest
+
+from pipenv2deb.__main__ import UIO
+from pipenv2deb.deb_delta import DebReader
+
+PACKAGE_NAME = "test-app"
+CONTROL = """Package: {}
+Version: 1.0
+Section: Python
+Priority: optional
+Architecture: all
+Maintainer: Test <test@example.com>
+Description: pipenv2deb test application.
+""".format(PACKAGE_NAME)
+# The folder in the data archive that holds the files in the project folder.
+PACKAGE_FOLDER = os.path.join("usr", "local", "bin", "{}.pipenvpkg".format(PACKAGE_NAME))
+# dpkg-deb only builds a package with files owned by root when run as root.
+DPKG_DEB_REQUIRED = pytest.mark.skipif(not shutil.which("dpkg-deb") or os.geteuid() != 0,
+                                       reason="dpkg-deb builds require dpkg-deb and root")
+PIPFILE = """[[source]]
+url = "https://pypi.org/simple"
+verify_ssl = true
+name = "pypi"
+
+[packages]
+
+[requires]
+python_version = "3"
+"""
+PIPFILE_LOCK = """{
+    "_meta": {
+        "hash": {"sha256": "0000000000000000000000000000000000000000000000000000000000000000"},
+        "pipfile-spec": 6,
+        "requires": {"python_version": "3"},
+        "sources": [{"name": "pypi", "url": "https://pypi.org/simple", "verify_ssl": true}]
+    },
+    "default": {},
+    "develop": {}
+}
+"""
+APP_FILE = """import mylib
+
+
+def main():
+    print(mylib.VALUE)
+
+
+if __name__ == '__main__':
+    main()
+"""
+
+
+class QuietUIO(UIO):
+    """@brief Discards the build output."""
+
+    def info(self, line):
+        pass
+
+
+class RecordingUIO(UIO):
+    """@brief Records the build output rather than printing it."""
+
+    def __init__(self):
+        self.lines = []
+
+    def info(self, line):
+        self.lines.append(line)
+
+
+def writeFile(filename, content):
+    """@brief Write a file, creating the folder that holds it if required.
+       @param filename The file to write.
+       @param content The contents of the file (str)."""
+    folder = os.path.dirname(filename)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    with open(filename, 'w') as fd:
+        fd.write(content)
+
+
+def createProject(projectFolder):
+    """@brief Create a project holding a python file, a package folder, the Pipfile and Pipfile.lock
+              files and a debian control file.
+       @param projectFolder The folder to create the project in.
+       @return The project folder."""
+    writeFile(os.path.join(projectFolder, "Pipfile"), PIPFILE)
+    writeFile(os.path.join(projectFolder, "Pipfile.lock"), PIPFILE_LOCK)
+    writeFile(os.path.join(projectFolder, "debian", "control"), CONTROL)
+    writeFile(os.path.join(projectFolder, "app.py"), APP_FILE)
+    writeFile(os.path.join(projectFolder, "mylib", "__init__.py"), "from mylib.values import VALUE\n")
+    writeFile(os.path.join(projectFolder, "mylib", "values.py"), "VALUE = 1\n")
+    writeFile(os.path.join(projectFolder, "mylib", "data.txt"), "data\n")
+    return projectFolder
+
+
+def createVenv(projectFolder):
+    """@brief Create the .venv folder of a project holding a console script that runs the
+              python interpreter in the .venv folder, as pip creates it.
+       @param projectFolder The project folder.
+       @return The .venv folder."""
+    venvFolder = os.path.join(projectFolder, ".venv")
+    subprocess.run([sys.executable, "-m", "venv", "--without-pip", venvFolder], check=True)
+    scriptFile = os.path.join(venvFolder, "bin", "app-tool")
+    writeFile(scriptFile, "#!{}/bin/python\nimport app\napp.main()\n".format(venvFolder))
+    os.chmod(scriptFile, 0o755)
+    return venvFolder
+
+
+def getDebFile(fileList):
+    """@param fileList The files returned by a build.
+       @return The deb file in the list."""
+    return [_file for _file in fileList if _file.endswith(".deb")][0]
+
+
+def readControlFiles(debFile):
+    """@param debFile A deb file.
+           @return A dict of the contents (bytes) of the files in the control archive keyed by name."""
+    name, data = DebReader(debFile).readControlMember()
+    fileDict = {}
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as tar:
+        for member in tar.getmembers():
+            if member.isfile():
+                fileDict[os.path.normpath(member.name)] = tar.extractfile(member).read()
+    return fileDict
+
+
+def readDataFiles(debFile):
+    """@param debFile A deb file.
+       @return A dict of (type, mode, contents or link target) tuples keyed by the path of each
+               entry in the data archive."""
+    entryDict = {}
+    with DebReader(debFile).openDataTar() as tar:
+        for member in tar:
+            path = os.path.normpath(member.name)
+            if member.isfile():
+                entryDict[path] = ("file", member.mode, tar.extractfile(member).read())
+            elif member.issym():
+                entryDict[path] = ("symlink", member.mode, member.linkname)
+            elif member.isdir():
+                entryDict[path] = ("folder", member.mode, None)
+    return entryDict
+
+
+class BuiltPackage(object):
+    """@brief The packages built from a project."""
+
+    def __init__(self, fileList):
+        """@brief Constructor
+           @param fileList The files returned by the build."""
+        self.fileList = fileList
+        self.debFile = getDebFile(fileList)
+        self._dataFiles = None
+
+    def getDataFiles(self):
+        """@return The entries in the data archive of the deb file (see readDataFiles())."""
+        if self._dataFiles is None:
+            self._dataFiles = readDataFiles(self.debFile)
+        return self._dataFiles
+
+    def getControlFiles(self):
+        """@return The files in the control archive of the deb file (see readControlFiles())."""
+        return readControlFiles(self.debFile)
+
+    def getPackageFile(self, *relPath):
+        """@param relPath The path of a file relative to the package folder.
+           @return The (type, mode, contents or link target) tuple of the file."""
+        return self.getDataFiles()[os.path.join(PACKAGE_FOLDER, *relPath)]